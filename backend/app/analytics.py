@@ -40,7 +40,11 @@ def build_similarity_matrix(
             left = members[pair.a]
             right = members[pair.b]
             combined_bytes = left.total_bytes + right.total_bytes
-            reclaimable = min(left.total_bytes, right.total_bytes)
+            # Bytes hard-linked from elsewhere are not freed by deleting a copy.
+            reclaimable = min(
+                left.total_bytes - left.hardlinked_bytes,
+                right.total_bytes - right.hardlinked_bytes,
+            )
             if label == FolderLabel.NEAR_DUPLICATE:
                 reclaimable = int(reclaimable * pair.similarity)
             chunk.append(
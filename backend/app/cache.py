@@ -10,7 +10,12 @@ FileCacheKey = Tuple[int, int, int, float]
 
 
 class FileHashCache:
-    """Thread-safe SQLite-backed cache for file hashes."""
+    """Thread-safe SQLite-backed cache for file hashes.
+
+    Digests are stored per algorithm tag (see ``hashing.digest_tag``), so
+    scans using different algorithms or digest lengths never see each
+    other's values.
+    """
 
     def __init__(self, db_path: Path):
         self.db_path = db_path
@@ -22,16 +27,29 @@ class FileHashCache:
         with self._connect() as conn:
             conn.execute(
                 """
-                CREATE TABLE IF NOT EXISTS file_hashes (
+                CREATE TABLE IF NOT EXISTS file_digests (
                     device INTEGER NOT NULL,
                     inode INTEGER NOT NULL,
                     size INTEGER NOT NULL,
                     mtime REAL NOT NULL,
-                    sha256 TEXT NOT NULL,
-                    PRIMARY KEY (device, inode, size, mtime)
+                    algorithm TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    PRIMARY KEY (device, inode, size, mtime, algorithm)
                 )
                 """
             )
+            legacy = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='file_hashes'"
+            ).fetchone()
+            if legacy:
+                # Caches written before digests were tagged only held sha256.
+                conn.execute(
+                    """
+                    INSERT OR IGNORE INTO file_digests (device, inode, size, mtime, algorithm, digest)
+                    SELECT device, inode, size, mtime, 'sha256', sha256 FROM file_hashes
+                    """
+                )
+                conn.execute("DROP TABLE file_hashes")
             conn.commit()
 
     def _connect(self) -> sqlite3.Connection:
@@ -40,25 +58,28 @@ class FileHashCache:
         conn.execute("PRAGMA synchronous=NORMAL;")
         return conn
 
-    def get(self, key: FileCacheKey) -> Optional[str]:
+    def get(self, key: FileCacheKey, algorithm: str = "sha256") -> Optional[str]:
         with self._lock, self._connect() as conn:
             cur = conn.execute(
-                "SELECT sha256 FROM file_hashes WHERE device=? AND inode=? AND size=? AND mtime=?",
-                key,
+                """
+                SELECT digest FROM file_digests
+                WHERE device=? AND inode=? AND size=? AND mtime=? AND algorithm=?
+                """,
+                (*key, algorithm),
             )
             row = cur.fetchone()
         if row:
             return row[0]
         return None
 
-    def set(self, key: FileCacheKey, value: str) -> None:
+    def set(self, key: FileCacheKey, value: str, algorithm: str = "sha256") -> None:
         with self._lock, self._connect() as conn:
             conn.execute(
                 """
-                INSERT OR REPLACE INTO file_hashes (device, inode, size, mtime, sha256)
-                VALUES (?, ?, ?, ?, ?)
+                INSERT OR REPLACE INTO file_digests (device, inode, size, mtime, algorithm, digest)
+                VALUES (?, ?, ?, ?, ?, ?)
                 """,
-                (*key, value),
+                (*key, algorithm, value),
             )
             conn.commit()
 
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import json
+import os
+import pickle
+import shutil
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .models import CheckpointInfo, ScanRequest
+from .snapshots import DirectorySnapshot
+
+
+REQUEST_FILE = "request.json"
+STATE_FILE = "state.json"
+LOG_FILE = "folders.log"
+
+# Checkpoints are spaced so that writing them takes at most this share of
+# the scan's wall time, however slow the config volume is.
+MAX_CHECKPOINT_OVERHEAD = 0.05
+
+_RECORD_HEADER = struct.Struct("<Q")
+
+PendingCallback = Callable[[], List[str]]
+
+
+class ScanCheckpoint:
+    """Crash-safe progress of one scan under ``<base>/<scan_id>/``.
+
+    Finished folders are buffered as :class:`DirectorySnapshot` objects and
+    appended to ``folders.log`` as length-prefixed pickle records, so each
+    checkpoint costs only the folders finished since the previous one. A
+    record cut short by a crash is dropped on load. ``state.json``, holding
+    the folders still pending when it was written, is replaced atomically.
+
+    The pending list only feeds :meth:`info`. A resumed scan walks again
+    from the root; each checkpointed folder whose directory is unchanged
+    costs one stat and is reused without being listed or read.
+    """
+
+    def __init__(self, directory: Path, interval_seconds: float) -> None:
+        self.directory = directory
+        self.interval_seconds = interval_seconds
+        self.scan_id = directory.name
+        self.checkpoints_written = 0
+        self.seconds = 0.0
+        self.bytes_written = 0
+        self.first_written_at: Optional[datetime] = None
+        self._buffer: List[Tuple[str, DirectorySnapshot]] = []
+        self._restored: Dict[str, DirectorySnapshot] = {}
+        self._folders = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._next_due = time.monotonic() + interval_seconds
+
+    @classmethod
+    def create(cls, base_dir: Path, scan_id: str, request: ScanRequest) -> "ScanCheckpoint":
+        directory = base_dir / scan_id
+        directory.mkdir(parents=True, exist_ok=True)
+        _write_atomic(directory / REQUEST_FILE, request.json())
+        (directory / LOG_FILE).write_bytes(b"")
+        checkpoint = cls(directory, request.checkpoint_interval_seconds or 0.0)
+        checkpoint._write_state([])
+        return checkpoint
+
+    @classmethod
+    def open(cls, base_dir: Path, scan_id: str) -> "ScanCheckpoint":
+        directory = base_dir / scan_id
+        if not (directory / REQUEST_FILE).is_file():
+            raise FileNotFoundError(f"No checkpoint for scan {scan_id}")
+        request = ScanRequest.parse_file(directory / REQUEST_FILE)
+        return cls(directory, request.checkpoint_interval_seconds or 0.0)
+
+    def request(self) -> ScanRequest:
+        return ScanRequest.parse_file(self.directory / REQUEST_FILE)
+
+    def load(self) -> Dict[str, DirectorySnapshot]:
+        """Return every checkpointed folder and drop any torn tail record."""
+        restored: Dict[str, DirectorySnapshot] = {}
+        path = self.directory / LOG_FILE
+        valid_end = 0
+        try:
+            with open(path, "rb") as log:
+                while True:
+                    header = log.read(_RECORD_HEADER.size)
+                    if len(header) < _RECORD_HEADER.size:
+                        break
+                    (length,) = _RECORD_HEADER.unpack(header)
+                    payload = log.read(length)
+                    if len(payload) < length:
+                        break
+                    try:
+                        restored.update(pickle.loads(payload))
+                    except Exception:  # pylint: disable=broad-except
+                        break
+                    valid_end = log.tell()
+        except FileNotFoundError:
+            return {}
+        if path.stat().st_size != valid_end:
+            # Later appends must follow the last complete record.
+            os.truncate(path, valid_end)
+        self._restored = restored
+        self._folders = len(restored)
+        return restored
+
+    def add(self, key: str, snapshot: DirectorySnapshot) -> None:
+        if self._restored.get(key) is snapshot:
+            return
+        with self._lock:
+            self._buffer.append((key, snapshot))
+
+    def maybe_flush(self, pending: PendingCallback) -> bool:
+        """Write a checkpoint if one is due; never blocks on another writer."""
+        if time.monotonic() < self._next_due:
+            return False
+        if not self._write_lock.acquire(blocking=False):
+            return False
+        try:
+            if time.monotonic() < self._next_due:
+                return False
+            self._flush(pending)
+            return True
+        finally:
+            self._write_lock.release()
+
+    def flush(self, pending: PendingCallback) -> None:
+        with self._write_lock:
+            self._flush(pending)
+
+    def remove(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def info(self) -> CheckpointInfo:
+        request = self.request()
+        state = json.loads((self.directory / STATE_FILE).read_text(encoding="utf-8"))
+        return CheckpointInfo(
+            scan_id=self.scan_id,
+            root_path=request.root_path,
+            created_at=state["created_at"],
+            updated_at=state["updated_at"],
+            folders_completed=state["folders_completed"],
+            folders_pending=len(state["pending"]),
+        )
+
+    def _flush(self, pending: PendingCallback) -> None:
+        started = time.monotonic()
+        if self.first_written_at is None:
+            self.first_written_at = datetime.now(timezone.utc)
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            payload = pickle.dumps(batch, protocol=pickle.HIGHEST_PROTOCOL)
+            with open(self.directory / LOG_FILE, "ab") as log:
+                log.write(_RECORD_HEADER.pack(len(payload)))
+                log.write(payload)
+                log.flush()
+                os.fsync(log.fileno())
+            self.bytes_written += _RECORD_HEADER.size + len(payload)
+            self._folders += len(batch)
+        self._write_state(pending())
+        elapsed = time.monotonic() - started
+        self.checkpoints_written += 1
+        self.seconds += elapsed
+        self._next_due = time.monotonic() + max(self.interval_seconds, elapsed / MAX_CHECKPOINT_OVERHEAD)
+
+    def _write_state(self, pending: List[str]) -> None:
+        now = datetime.now(timezone.utc).isoformat()
+        state_path = self.directory / STATE_FILE
+        created = now
+        if state_path.is_file():
+            created = json.loads(state_path.read_text(encoding="utf-8")).get("created_at", now)
+        state = {
+            "scan_id": self.scan_id,
+            "created_at": created,
+            "updated_at": now,
+            "folders_completed": self._folders,
+            "pending": sorted(pending),
+        }
+        _write_atomic(state_path, json.dumps(state))
+
+
+def list_checkpoints(base_dir: Path) -> List[CheckpointInfo]:
+    if not base_dir.is_dir():
+        return []
+    checkpoints: List[CheckpointInfo] = []
+    for directory in sorted(base_dir.iterdir()):
+        if not (directory / REQUEST_FILE).is_file() or not (directory / STATE_FILE).is_file():
+            continue
+        try:
+            checkpoints.append(ScanCheckpoint(directory, 0.0).info())
+        except (OSError, ValueError, KeyError):
+            continue
+    return checkpoints
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        handle.write(text)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
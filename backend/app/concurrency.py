@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Tuple
+
+
+# Seconds of observations per adjustment.
+DEFAULT_WINDOW_SECONDS = 0.25
+# Fewer completions than this in a window is too noisy to act on.
+MIN_WINDOW_OPERATIONS = 16
+# Relative throughput change treated as noise.
+THROUGHPUT_TOLERANCE = 0.05
+GROWTH_FACTOR = 1.5
+
+# (stage name, new limit, throughput per second, mean latency in seconds)
+LimitCallback = Callable[[str, int, float, float], None]
+
+
+class ConcurrencyController:
+    """A resizable concurrency gate that hill-climbs toward peak throughput.
+
+    Callers wrap each filesystem operation in :meth:`slot`. At most
+    ``limit`` slots are held at once; the owning stage simply runs more
+    threads than that and lets the rest wait. Every window the controller
+    compares throughput (bytes/s when operations report bytes, otherwise
+    operations/s) with the previous window:
+
+    - a clear gain keeps moving the limit in the same direction,
+    - a clear loss reverses direction,
+    - a plateau shrinks, since the same throughput with fewer in-flight
+      operations means the device is already saturated.
+
+    The limit only grows while the gate is actually contended, so a stage
+    starved by its producer does not drift upward.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        on_change: Optional[LimitCallback] = None,
+        window_seconds: float = DEFAULT_WINDOW_SECONDS,
+    ) -> None:
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self._limit = min(self.maximum, max(self.minimum, initial))
+        self._on_change = on_change
+        self._window_seconds = window_seconds
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._direction = 1
+        self._previous_score: Optional[float] = None
+        self._reset_window(time.perf_counter())
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @contextmanager
+    def slot(self, nbytes: int = 0) -> Iterator[None]:
+        self._acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(time.perf_counter() - started, nbytes)
+
+    def _reset_window(self, now: float) -> None:
+        self._window_started = now
+        self._window_ops = 0
+        self._window_bytes = 0
+        self._window_latency = 0.0
+        self._window_contended = False
+
+    def _acquire(self) -> None:
+        with self._condition:
+            self._waiting += 1
+            while self._active >= self._limit:
+                self._window_contended = True
+                self._condition.wait()
+            self._waiting -= 1
+            self._active += 1
+
+    def _release(self, latency: float, nbytes: int) -> None:
+        with self._condition:
+            self._active -= 1
+            if self._waiting:
+                self._window_contended = True
+            self._window_ops += 1
+            self._window_bytes += nbytes
+            self._window_latency += latency
+            now = time.perf_counter()
+            elapsed = now - self._window_started
+            changed = None
+            if elapsed >= self._window_seconds and self._window_ops >= MIN_WINDOW_OPERATIONS:
+                changed = self._adjust(elapsed)
+                self._reset_window(now)
+            self._condition.notify_all()
+        if changed is not None and self._on_change is not None:
+            self._on_change(self.name, *changed)
+
+    def _adjust(self, elapsed: float) -> Tuple[int, float, float]:
+        units = self._window_bytes or self._window_ops
+        score = units / elapsed
+        latency = self._window_latency / self._window_ops
+        previous = self._previous_score
+        if previous is not None:
+            if score > previous * (1 + THROUGHPUT_TOLERANCE):
+                pass
+            elif score < previous * (1 - THROUGHPUT_TOLERANCE):
+                self._direction = -self._direction
+            else:
+                self._direction = -1
+        if self._direction > 0 and not self._window_contended:
+            # Nothing was waiting for a slot; more slots would not be used.
+            self._direction = 0
+        self._previous_score = score
+        if self._direction > 0:
+            target = max(self._limit + 1, int(self._limit * GROWTH_FACTOR))
+        elif self._direction < 0:
+            target = min(self._limit - 1, int(self._limit / GROWTH_FACTOR))
+        else:
+            target = self._limit
+            self._direction = 1
+        self._limit = min(self.maximum, max(self.minimum, target))
+        return self._limit, score, latency
@@ -19,10 +19,10 @@ class ScannerSettings(BaseModel):
         ".DS_Store",
     ])
     similarity_threshold: float = Field(default=0.80, ge=0.0, le=1.0)
-    file_equality: str = Field(default="name_size", pattern="^(name_size|sha256)$")
+    file_equality: str = Field(default="name_size", pattern="^(name_size|sha256|sampled|chunks)$")
     force_case_insensitive: bool = False
-    structure_policy: str = Field(default="relative", pattern="^(relative|bag_of_files)$")
-    concurrency: int | None = Field(default=None, ge=1, le=32)
+    structure_policy: str = Field(default="relative", pattern="^(relative|bag_of_files|content)$")
+    concurrency: int | None = Field(default=None, ge=1, le=256)
     deletion_enabled: bool = False
 
     @validator("root_path", pre=True)
@@ -55,6 +55,10 @@ class AppConfig(BaseModel):
     matrix_max_entries: int = Field(default=1000, ge=0)
     matrix_min_reclaim_bytes: int = Field(default=0, ge=0)
     matrix_include_identical: bool = Field(default=False)
+    # Serve /api/worker/shards for other instances' distributed scans, for
+    # paths under worker_roots only.
+    worker_enabled: bool = Field(default=False)
+    worker_roots: List[Path] = Field(default_factory=list)
 
     @classmethod
     def from_env(cls) -> "AppConfig":
@@ -66,6 +70,10 @@ class AppConfig(BaseModel):
         matrix_max = int(os.getenv("XFS_MATRIX_MAX_ENTRIES", "1000"))
         matrix_min_reclaim = int(os.getenv("XFS_MATRIX_MIN_RECLAIM_BYTES", "0"))
         matrix_include_identical = os.getenv("XFS_MATRIX_INCLUDE_IDENTICAL", "0") in {"1", "true", "TRUE"}
+        worker_enabled = os.getenv("XFS_WORKER_ENABLED", "0") in {"1", "true", "TRUE"}
+        worker_roots = [
+            Path(entry).expanduser().resolve() for entry in os.getenv("XFS_WORKER_ROOTS", "").split(os.pathsep) if entry
+        ]
         return cls(
             listen_host=os.getenv("XFS_LISTEN_HOST", "0.0.0.0"),
             listen_port=int(os.getenv("XFS_LISTEN_PORT", "8080")),
@@ -77,4 +85,6 @@ class AppConfig(BaseModel):
             matrix_max_entries=matrix_max,
             matrix_min_reclaim_bytes=matrix_min_reclaim,
             matrix_include_identical=matrix_include_identical,
+            worker_enabled=worker_enabled,
+            worker_roots=worker_roots,
         )
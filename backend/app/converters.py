@@ -11,6 +11,7 @@ def folder_info_to_record(info: FolderInfo) -> FolderRecord:
         total_bytes=info.total_bytes,
         file_count=info.file_count,
         unstable=info.unstable,
+        hardlinked_bytes=info.hardlinked_bytes,
     )
 
 
@@ -0,0 +1,451 @@
+from __future__ import annotations
+
+import glob
+import gzip
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .cache import FileHashCache
+from .domain import FolderInfo
+from .models import (
+    DirectoryFingerprint,
+    LocationTree,
+    RemoteShard,
+    ScanRequest,
+    ScanStatus,
+    ShardAssignment,
+    ShardStatus,
+    StructurePolicy,
+    WarningRecord,
+)
+from .scanner import (
+    FolderScanner,
+    ScanResult,
+    _parent_from_relative_path,
+    account_hardlinks,
+    aggregate_fingerprints,
+)
+from .sharding import is_gauge_stat
+
+
+# Seconds between status polls of running remote shards, and the timeout
+# of a single request to a worker.
+REMOTE_POLL_SECONDS = 1.0
+REMOTE_TIMEOUT_SECONDS = 30.0
+# Seconds between checks for cancellation and the end of the local scan.
+LOCAL_WATCH_SECONDS = 0.2
+# Seconds a finished shard's result is kept for a coordinator that never
+# released it; expired results are dropped when the next shard starts.
+SHARD_RESULT_TTL_SECONDS = 3600.0
+
+# Live stats summed over the local scan and every worker.
+_PROGRESS_STATS = ("files_scanned", "folders_scanned", "folders_discovered", "bytes_scanned", "bytes_hashed")
+
+_ACTIVE = (ScanStatus.PENDING, ScanStatus.RUNNING)
+
+
+def encode_shard(subtree: str, result: ScanResult) -> bytes:
+    """Serialize a worker's per-folder fingerprints as gzip'd JSON.
+
+    Only each folder's own files are shipped; the coordinator aggregates,
+    so no identity is sent more than once. Hard-link sites travel along
+    for the coordinator to account on the merged tree.
+    """
+    folders = [
+        [
+            key,
+            fingerprint.folder.total_bytes,
+            fingerprint.folder.file_count,
+            fingerprint.folder.unstable,
+            fingerprint.file_weights,
+            fingerprint.locations.own if fingerprint.locations is not None else None,
+        ]
+        for key, fingerprint in result.fingerprints.items()
+    ]
+    payload = {
+        "subtree": subtree,
+        "folders": folders,
+        "hardlink_sites": result.hardlink_sites,
+        "warnings": [json.loads(warning.json()) for warning in result.warnings],
+        "stats": result.stats,
+    }
+    return gzip.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_shard(data: bytes, root: Path) -> ScanResult:
+    """Inverse of :func:`encode_shard`; folder paths are rebuilt below ``root``."""
+    payload = json.loads(gzip.decompress(data))
+    folders: Dict[str, FolderInfo] = {}
+    fingerprints: Dict[str, DirectoryFingerprint] = {}
+    for key, total_bytes, file_count, unstable, weights, locations in payload["folders"]:
+        info = FolderInfo(
+            path=str(root / key),
+            relative_path=key,
+            total_bytes=total_bytes,
+            file_count=file_count,
+            unstable=unstable,
+        )
+        folders[key] = info
+        fingerprints[key] = DirectoryFingerprint(
+            folder=info,
+            file_weights=weights,
+            locations=LocationTree(locations) if locations is not None else None,
+        )
+    return ScanResult(
+        folders=folders,
+        fingerprints=fingerprints,
+        warnings=[WarningRecord(**warning) for warning in payload["warnings"]],
+        stats=payload["stats"],
+        hardlink_sites=[tuple(site) for site in payload["hardlink_sites"]],
+    )
+
+
+class _ShardJob:
+    def __init__(self, shard_id: str, assignment: ShardAssignment) -> None:
+        self.shard_id = shard_id
+        self.assignment = assignment
+        self.status = ScanStatus.PENDING
+        self.stats: Dict[str, int] = {}
+        self.error: Optional[str] = None
+        self.payload: Optional[bytes] = None
+        self.stop_event = threading.Event()
+        # time.monotonic() when the scan stopped running.
+        self.finished_at: Optional[float] = None
+
+    def describe(self) -> ShardStatus:
+        return ShardStatus(
+            shard_id=self.shard_id,
+            subtree=self.assignment.subtree,
+            status=self.status,
+            stats=dict(self.stats),
+            error=self.error,
+        )
+
+
+class ShardWorker:
+    """Worker side of a distributed scan: scans subtrees assigned by a coordinator.
+
+    Each assignment runs on its own thread. The scan keeps the
+    coordinator's folder keys and include/exclude patterns while walking
+    the worker's local path, and its encoded result is held until the
+    coordinator fetches and releases it. Results of a coordinator that went
+    away are dropped ``result_ttl`` seconds after their scan finished, the
+    next time a shard starts. Only paths below one of ``allowed_roots`` are
+    scanned; with none, every assignment is refused.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[FileHashCache] = None,
+        allowed_roots: Sequence[Path] = (),
+        result_ttl: float = SHARD_RESULT_TTL_SECONDS,
+    ) -> None:
+        self.cache = cache
+        self.allowed_roots = [root.resolve() for root in allowed_roots]
+        self.result_ttl = result_ttl
+        self._jobs: Dict[str, _ShardJob] = {}
+        self._lock = threading.Lock()
+
+    def start(self, assignment: ShardAssignment) -> ShardStatus:
+        """Raise PermissionError outside ``allowed_roots`` and FileNotFoundError for missing paths."""
+        path = assignment.path.resolve()
+        if not any(path == root or root in path.parents for root in self.allowed_roots):
+            raise PermissionError(f"Shard path {assignment.path} is outside the worker's allowed roots")
+        if not assignment.path.is_dir():
+            raise FileNotFoundError(f"Shard path {assignment.path} is not a directory")
+        job = _ShardJob(uuid.uuid4().hex[:12], assignment)
+        expired_before = time.monotonic() - self.result_ttl
+        with self._lock:
+            for shard_id, old in list(self._jobs.items()):
+                if old.finished_at is not None and old.finished_at < expired_before:
+                    del self._jobs[shard_id]
+            self._jobs[job.shard_id] = job
+        threading.Thread(target=self._run, args=(job,), name=f"xfs-shard-{job.shard_id}", daemon=True).start()
+        return job.describe()
+
+    def status(self, shard_id: str) -> ShardStatus:
+        return self._job(shard_id).describe()
+
+    def result(self, shard_id: str) -> bytes:
+        """Raise KeyError for unknown shards and LookupError while one is unfinished."""
+        job = self._job(shard_id)
+        if job.payload is None:
+            raise LookupError(f"Shard {shard_id} is {job.status.value}")
+        return job.payload
+
+    def release(self, shard_id: str) -> None:
+        """Stop the shard if it is running and drop its result."""
+        with self._lock:
+            job = self._jobs.pop(shard_id, None)
+        if job is None:
+            raise KeyError(shard_id)
+        job.stop_event.set()
+        if job.status in _ACTIVE:
+            job.status = ScanStatus.CANCELLED
+
+    def shutdown(self) -> None:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.stop_event.set()
+
+    def _job(self, shard_id: str) -> _ShardJob:
+        with self._lock:
+            return self._jobs[shard_id]
+
+    def _run(self, job: _ShardJob) -> None:
+        job.status = ScanStatus.RUNNING
+        assignment = job.assignment
+        try:
+            scanner = FolderScanner(
+                assignment.request,
+                cache=self.cache,
+                stats_sink=job.stats,
+                stop_event=job.stop_event,
+            )
+            result = scanner.scan(subtree=assignment.subtree, path=assignment.path, aggregate=False)
+            if job.stop_event.is_set():
+                job.status = ScanStatus.CANCELLED
+                return
+            job.payload = encode_shard(assignment.subtree, result)
+            job.stats = dict(result.stats)
+            job.stats["shard_payload_bytes"] = len(job.payload)
+            job.status = ScanStatus.COMPLETED
+        except Exception as exc:  # pylint: disable=broad-except
+            job.error = str(exc)
+            job.status = ScanStatus.FAILED
+        finally:
+            job.finished_at = time.monotonic()
+
+
+class RemoteWorker:
+    """HTTP client for the ``/api/worker/shards`` endpoints of one xfolder instance."""
+
+    def __init__(self, base_url: str, timeout: float = REMOTE_TIMEOUT_SECONDS) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def start(self, assignment: ShardAssignment) -> ShardStatus:
+        return ShardStatus.parse_raw(self._call("POST", "/api/worker/shards", assignment.json().encode("utf-8")))
+
+    def status(self, shard_id: str) -> ShardStatus:
+        return ShardStatus.parse_raw(self._call("GET", f"/api/worker/shards/{shard_id}"))
+
+    def result(self, shard_id: str) -> bytes:
+        return self._call("GET", f"/api/worker/shards/{shard_id}/result")
+
+    def release(self, shard_id: str) -> None:
+        self._call("DELETE", f"/api/worker/shards/{shard_id}")
+
+    def _call(self, method: str, path: str, body: Optional[bytes] = None) -> bytes:
+        request = urllib.request.Request(f"{self.base_url}{path}", data=body, method=method)
+        if body is not None:
+            request.add_header("Content-Type", "application/json")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as exc:
+            detail = exc.read().decode("utf-8", "replace")
+            raise OSError(f"Worker {self.base_url} answered {exc.code} to {method} {path}: {detail}") from exc
+        except urllib.error.URLError as exc:
+            raise OSError(f"Worker {self.base_url} is unreachable: {exc.reason}") from exc
+
+
+class DistributedScanner:
+    """Coordinator side: scans ``request.remote_shards`` on worker instances.
+
+    Every remote shard is started before anything else, so the workers
+    read their subtrees on their own storage heads while the coordinator
+    scans the rest of the root itself, polling them on another thread
+    meanwhile. Workers return per-folder fingerprints under the
+    coordinator's folder keys; once all have arrived the coordinator
+    aggregates the merged tree and grouping runs as for a local scan. A
+    worker that fails stops the local scan and fails the whole one, since
+    groups computed without its subtree would be misleading. Each host counts
+    hard links only among its own subtrees, as device and inode numbers
+    mean nothing across machines.
+    """
+
+    def __init__(
+        self,
+        request: ScanRequest,
+        cache: Optional[FileHashCache] = None,
+        stats_sink: Optional[Dict[str, int]] = None,
+        meta_sink: Optional[Dict[str, str]] = None,
+        phase_callback: Optional[Callable[[str], None]] = None,
+        stop_event: Optional[threading.Event] = None,
+    ) -> None:
+        self.request = request
+        self.cache = cache
+        self._stats_sink = stats_sink if stats_sink is not None else {}
+        self._meta_sink = meta_sink
+        self._phase_callback = phase_callback
+        self._stop_event = stop_event or threading.Event()
+
+    def scan(self) -> ScanResult:
+        request = self.request
+        root = request.root_path
+        if not root.is_dir():
+            raise FileNotFoundError(f"Root path {root} is not a directory")
+        worker_request = request.copy(update={"remote_shards": []})
+        started: List[Tuple[RemoteShard, RemoteWorker, str]] = []
+        try:
+            for shard in request.remote_shards:
+                client = RemoteWorker(shard.worker_url)
+                assignment = ShardAssignment(
+                    request=worker_request,
+                    subtree=shard.subtree,
+                    path=shard.path or root / shard.subtree,
+                )
+                started.append((shard, client, client.start(assignment).shard_id))
+            local_stats: Dict[str, int] = {}
+            # Stops the local scan on cancellation or when a worker fails.
+            local_stop = threading.Event()
+            local_done = threading.Event()
+            remote: List[Tuple[ScanResult, int]] = []
+            failures: List[BaseException] = []
+
+            def _poll() -> None:
+                try:
+                    remote.extend(self._collect(started, local_stats, local_stop, local_done))
+                except BaseException as exc:  # pylint: disable=broad-except
+                    failures.append(exc)
+                    local_stop.set()
+
+            poller = threading.Thread(target=_poll, name="xfs-remote-poll", daemon=True)
+            poller.start()
+            try:
+                local = FolderScanner(
+                    self._local_request(),
+                    cache=self.cache,
+                    stats_sink=local_stats,
+                    meta_sink=self._meta_sink,
+                    stop_event=local_stop,
+                ).scan(aggregate=False)
+            except BaseException:
+                local_stop.set()
+                raise
+            finally:
+                local_done.set()
+                poller.join()
+            if failures:
+                raise failures[0]
+        except BaseException:
+            for _shard, client, shard_id in started:
+                try:
+                    client.release(shard_id)
+                except OSError:
+                    pass
+            raise
+
+        if self._meta_sink is not None:
+            self._meta_sink["phase"] = "aggregating"
+        if self._phase_callback:
+            self._phase_callback("aggregating")
+        return self._merge(local, remote)
+
+    def _local_request(self) -> ScanRequest:
+        # Remote subtrees are left out of the local walk entirely.
+        exclude = list(self.request.exclude) + [glob.escape(shard.subtree) for shard in self.request.remote_shards]
+        return self.request.copy(update={"remote_shards": [], "exclude": exclude})
+
+    def _collect(
+        self,
+        started: List[Tuple[RemoteShard, RemoteWorker, str]],
+        local_stats: Dict[str, int],
+        local_stop: threading.Event,
+        local_done: threading.Event,
+    ) -> List[Tuple[ScanResult, int]]:
+        """Poll the workers until every shard and the local scan are done.
+
+        Runs on its own thread while the coordinator scans its part, so a
+        failed worker stops the local scan at once and progress covers
+        both sides. Cancellation is passed on to the local scan here too.
+        """
+        pending = list(started)
+        remote_stats: Dict[str, Dict[str, int]] = {}
+        results: List[Tuple[ScanResult, int]] = []
+        next_poll = 0.0
+        while pending or not local_done.is_set():
+            if self._stop_event.is_set():
+                local_stop.set()
+                raise InterruptedError("Scan cancelled while waiting for workers")
+            if local_stop.is_set():
+                # The local scan failed; the coordinator releases the shards.
+                return results
+            if not pending or time.monotonic() < next_poll:
+                self._publish_progress(local_stats, remote_stats)
+                self._stop_event.wait(LOCAL_WATCH_SECONDS)
+                continue
+            next_poll = time.monotonic() + REMOTE_POLL_SECONDS
+            still_running = []
+            for shard, client, shard_id in pending:
+                status = client.status(shard_id)
+                remote_stats[shard_id] = status.stats
+                if status.status == ScanStatus.COMPLETED:
+                    data = client.result(shard_id)
+                    client.release(shard_id)
+                    results.append((decode_shard(data, self.request.root_path), len(data)))
+                    if self._meta_sink is not None:
+                        self._meta_sink["last_path"] = str(self.request.root_path / shard.subtree)
+                elif status.status in _ACTIVE:
+                    still_running.append((shard, client, shard_id))
+                else:
+                    raise RuntimeError(
+                        f"Worker {shard.worker_url} did not finish {shard.subtree}: {status.error or status.status.value}"
+                    )
+            pending = still_running
+        self._publish_progress(local_stats, remote_stats)
+        return results
+
+    def _publish_progress(self, local_stats: Dict[str, int], remote_stats: Dict[str, Dict[str, int]]) -> None:
+        for key in _PROGRESS_STATS:
+            value = local_stats.get(key, 0) + sum(stats.get(key, 0) for stats in remote_stats.values())
+            self._stats_sink[key] = value
+
+    def _merge(self, local: ScanResult, remote: List[Tuple[ScanResult, int]]) -> ScanResult:
+        own: Dict[str, DirectoryFingerprint] = dict(local.fingerprints)
+        warnings = list(local.warnings)
+        sites = list(local.hardlink_sites)
+        stats: Dict[str, int] = defaultdict(int, local.stats)
+        for result, _size in remote:
+            own.update(result.fingerprints)
+            warnings.extend(result.warnings)
+            sites.extend(result.hardlink_sites)
+            for key, value in result.stats.items():
+                stats[key] = max(stats[key], value) if is_gauge_stat(key) else stats[key] + value
+        # A subtree's parents may not exist on the coordinator at all.
+        root = self.request.root_path
+        for shard in self.request.remote_shards:
+            parent = _parent_from_relative_path(shard.subtree)
+            while parent is not None and parent not in own:
+                info = FolderInfo(path=str(root / parent), relative_path=parent, total_bytes=0, file_count=0)
+                own[parent] = DirectoryFingerprint(folder=info, file_weights={}, locations=_empty_locations(own))
+                parent = _parent_from_relative_path(parent)
+
+        ordered = sorted(own, key=lambda key: Path(key).parts)
+        folders = {key: own[key].folder for key in ordered}
+        fingerprints = aggregate_fingerprints(
+            {key: own[key] for key in ordered},
+            stats,
+            self._meta_sink,
+            content_only=self.request.structure_policy == StructurePolicy.CONTENT,
+        )
+        account_hardlinks(folders, sites)
+        stats["folders_scanned"] = len(folders)
+        stats["remote_shards"] = len(remote)
+        stats["remote_payload_bytes"] = sum(size for _result, size in remote)
+        return ScanResult(folders=folders, fingerprints=fingerprints, warnings=warnings, stats=dict(stats))
+
+
+def _empty_locations(fingerprints: Dict[str, DirectoryFingerprint]) -> Optional[LocationTree]:
+    # Content-policy fingerprints carry a locations map, even when empty.
+    sample = next(iter(fingerprints.values()), None)
+    return LocationTree({}) if sample is not None and sample.locations is not None else None
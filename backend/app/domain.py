@@ -11,6 +11,9 @@ class FolderInfo:
     total_bytes: int
     file_count: int
     unstable: bool = False
+    # Part of total_bytes that deleting the folder would not free, because
+    # the files are hard links whose inode is also linked outside it.
+    hardlinked_bytes: int = 0
 
 
 @dataclass
@@ -0,0 +1,623 @@
+from __future__ import annotations
+
+import hashlib
+import mmap
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Sequence, Tuple
+
+
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+# Smallest read used by the adaptive chunk size.
+MIN_HASH_CHUNK_SIZE = 64 * 1024
+# Files at least this large are mapped instead of read under the mmap strategy.
+MMAP_MIN_SIZE = 16 * 1024 * 1024
+# Bytes read from each of the head, middle and tail of a sampled file.
+SAMPLE_BLOCK_SIZE = 64 * 1024
+# Not every platform has these; low-footprint reads degrade to plain reads.
+_O_NOATIME = getattr(os, "O_NOATIME", 0)
+_HAS_FADVISE = hasattr(os, "posix_fadvise")
+# Jobs sent to a worker process per round trip; amortises pickling and IPC.
+DEFAULT_HASH_BATCH_SIZE = 32
+# Bytes per leaf of a tree digest; each leaf is hashed on its own thread.
+DEFAULT_TREE_LEAF_SIZE = 64 * 1024 * 1024
+_HAS_PREADV = hasattr(os, "preadv")
+# Target mean chunk length for content-defined chunking.
+DEFAULT_CHUNK_AVG_SIZE = 1024 * 1024
+# Files smaller than this many mean chunks get one whole-file digest.
+CHUNK_THRESHOLD_FACTOR = 4
+# Chunk lists are cached as one string; larger files get longer chunks
+# (doubling the mean) so a list stays below this many entries.
+MAX_CHUNKS_PER_FILE = 4096
+
+# (path, expected_size, expected_mtime)
+HashJob = Tuple[str, int, float]
+# (WarningType value, message); plain strings so outcomes pickle cheaply.
+HashWarning = Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class DigestSpec:
+    """How file contents are digested; small and picklable for worker processes."""
+
+    algorithm: str = "sha256"
+    # Digest length in bytes; ``None`` keeps the algorithm's full length.
+    digest_size: Optional[int] = None
+    # ``read`` (a fresh bytes object per chunk), ``readinto`` (a reused
+    # per-thread buffer) or ``mmap`` (map large files, readinto otherwise).
+    strategy: str = "readinto"
+    # Keep hashing out of other tenants' way: O_NOATIME opens, sequential
+    # readahead hints, and dropping each file from the page cache after.
+    low_footprint: bool = False
+    # Ask the kernel to start reading the next queued file (WILLNEED).
+    prefetch: bool = False
+    # Files at least this large get a tree digest over parallel leaves.
+    tree_threshold: Optional[int] = None
+    tree_leaf_size: int = DEFAULT_TREE_LEAF_SIZE
+    # Mean chunk length; when set, files are digested as content-defined
+    # chunks and the "digest" is the encoded chunk list.
+    chunk_avg_size: Optional[int] = None
+
+    @property
+    def tag(self) -> str:
+        return digest_tag(self.algorithm, self.digest_size)
+
+    def uses_chunks(self, size: int) -> bool:
+        return self.chunk_avg_size is not None and size >= self.chunk_avg_size * CHUNK_THRESHOLD_FACTOR
+
+    def chunk_avg_for(self, size: int) -> int:
+        """Mean chunk length for a file of ``size`` bytes, within the list cap."""
+        average = self.chunk_avg_size or DEFAULT_CHUNK_AVG_SIZE
+        while size > average * MAX_CHUNKS_PER_FILE:
+            average *= 2
+        return average
+
+    def uses_tree(self, size: int) -> bool:
+        return (
+            _HAS_PREADV
+            and self.chunk_avg_size is None
+            and self.tree_threshold is not None
+            and size >= self.tree_threshold
+            and size > self.tree_leaf_size
+        )
+
+    def tag_for(self, size: int) -> str:
+        """Cache tag for a file of ``size`` bytes; tree digests and chunk
+        lists get their own."""
+        if self.uses_chunks(size):
+            return f"{self.tag}-runs{self.chunk_avg_for(size)}"
+        if self.uses_tree(size):
+            return f"{self.tag}-tree{self.tree_leaf_size}"
+        return self.tag
+
+
+DEFAULT_SPEC = DigestSpec()
+
+
+@dataclass
+class HashOutcome:
+    digest: Optional[str]
+    stable: bool
+    warnings: List[HashWarning] = field(default_factory=list)
+    bytes_read: int = 0
+    # True when ``digest`` covers sampled blocks rather than the whole file.
+    sampled: bool = False
+
+
+# (chunk digest, chunk length)
+Chunk = Tuple[str, int]
+
+# Called with the byte count of every read, e.g. to rate-limit them.
+ReadCallback = Callable[[int], None]
+
+_Reader = Callable[
+    [str, int, float, DigestSpec, List[HashWarning], Optional[ReadCallback]],
+    Tuple[Optional[str], bool, int],
+]
+
+_buffers = threading.local()
+_tree_pool: Optional[ThreadPoolExecutor] = None
+_tree_pool_lock = threading.Lock()
+
+
+def _boundary_classes() -> bytes:
+    """A ``bytes.translate`` table sending half of all byte values to 0.
+
+    Derived, not random, so chunk boundaries (and cached chunk lists) are
+    stable across processes.
+    """
+    ranked = sorted(range(256), key=lambda value: hashlib.sha256(bytes([value])).digest())
+    zero = set(ranked[:128])
+    return bytes(0 if value in zero else 1 for value in range(256))
+
+
+_BOUNDARY_CLASSES = _boundary_classes()
+
+
+def digest_tag(algorithm: str, digest_size: Optional[int] = None) -> str:
+    """Name of the digest space, e.g. ``sha256`` or ``blake2b-16``.
+
+    Digests from different tags are never comparable, so the tag keys the
+    hash cache.
+    """
+    return algorithm if digest_size is None else f"{algorithm}-{digest_size}"
+
+
+def new_hasher(spec: DigestSpec = DEFAULT_SPEC) -> "hashlib._Hash":
+    if spec.algorithm == "blake2b":
+        # BLAKE2b produces shorter digests natively instead of truncating.
+        return hashlib.blake2b(digest_size=spec.digest_size or 64)
+    return hashlib.new(spec.algorithm)
+
+
+def finish_digest(h: "hashlib._Hash", spec: DigestSpec = DEFAULT_SPEC) -> str:
+    value = h.hexdigest()
+    return value[: 2 * spec.digest_size] if spec.digest_size else value
+
+
+def chunk_size_for(size: int) -> int:
+    """Read size for a file: its own size rounded up to a power of two,
+    clamped to ``[MIN_HASH_CHUNK_SIZE, HASH_CHUNK_SIZE]``."""
+    if size <= MIN_HASH_CHUNK_SIZE:
+        return MIN_HASH_CHUNK_SIZE
+    return min(HASH_CHUNK_SIZE, 1 << (size - 1).bit_length())
+
+
+def _thread_buffer(size: int) -> memoryview:
+    """A per-thread scratch buffer of at least ``size`` bytes.
+
+    The buffer only grows, so a thread that has seen large files keeps one
+    ``HASH_CHUNK_SIZE`` allocation for the rest of the scan instead of
+    allocating a chunk per read.
+    """
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None or len(buffer) < size:
+        buffer = bytearray(size)
+        _buffers.buffer = buffer
+    return memoryview(buffer)[:size]
+
+
+def _open_for_hash(path: str, spec: DigestSpec, buffered: bool = True):
+    flags = os.O_RDONLY | getattr(os, "O_CLOEXEC", 0)
+    fd: Optional[int] = None
+    if spec.low_footprint and _O_NOATIME:
+        try:
+            fd = os.open(path, flags | _O_NOATIME)
+        except PermissionError:
+            # O_NOATIME needs ownership of the file (or CAP_FOWNER); without
+            # it we still read, we just cannot suppress the atime update.
+            fd = None
+    if fd is None:
+        fd = os.open(path, flags)
+    return os.fdopen(fd, "rb", buffering=-1 if buffered else 0)
+
+
+def _advise(fd: int, advice_name: str) -> None:
+    if not _HAS_FADVISE:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, getattr(os, advice_name))
+    except (OSError, AttributeError):
+        pass
+
+
+def prefetch_file(path: str, spec: DigestSpec = DEFAULT_SPEC) -> None:
+    """Start asynchronous readahead of ``path`` so its pages are warm when hashed.
+
+    The hint outlives the descriptor, so the file is opened and closed
+    right away. Best effort: errors are left for the real read to report.
+    """
+    if not _HAS_FADVISE:
+        return
+    try:
+        with _open_for_hash(path, spec, buffered=False) as f:
+            _advise(f.fileno(), "POSIX_FADV_WILLNEED")
+    except OSError:
+        pass
+
+
+def _digest_read(f, h: "hashlib._Hash", size: int, on_read: Optional[ReadCallback] = None) -> int:
+    read_bytes = 0
+    while True:
+        chunk = f.read(chunk_size_for(size))
+        if not chunk:
+            return read_bytes
+        if on_read is not None:
+            on_read(len(chunk))
+        h.update(chunk)
+        read_bytes += len(chunk)
+
+
+def _digest_readinto(f, h: "hashlib._Hash", size: int, on_read: Optional[ReadCallback] = None) -> int:
+    view = _thread_buffer(chunk_size_for(size))
+    read_bytes = 0
+    while True:
+        count = f.readinto(view)
+        if not count:
+            return read_bytes
+        if on_read is not None:
+            on_read(count)
+        h.update(view[:count])
+        read_bytes += count
+
+
+def _digest_mmap(f, h: "hashlib._Hash", size: int, on_read: Optional[ReadCallback] = None) -> int:
+    # Pages come straight from the page cache with no user-space copy; the
+    # caller's size check still catches files that changed before mapping.
+    try:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Emptied since it was listed; report a short read.
+        return 0
+    with mapped:
+        view = memoryview(mapped)
+        try:
+            for offset in range(0, len(mapped), HASH_CHUNK_SIZE):
+                if on_read is not None:
+                    on_read(min(HASH_CHUNK_SIZE, len(mapped) - offset))
+                h.update(view[offset : offset + HASH_CHUNK_SIZE])
+        finally:
+            view.release()
+        return len(mapped)
+
+
+def _read_digest(
+    path: str,
+    expected_size: int,
+    expected_mtime: float,
+    spec: DigestSpec,
+    warnings: List[HashWarning],
+    on_read: Optional[ReadCallback] = None,
+) -> Tuple[Optional[str], bool, int]:
+    h = new_hasher(spec)
+    read_bytes = 0
+    try:
+        # Unbuffered for readinto/mmap: they bypass the BufferedReader copy.
+        with _open_for_hash(path, spec, buffered=spec.strategy == "read") as f:
+            if spec.low_footprint:
+                _advise(f.fileno(), "POSIX_FADV_SEQUENTIAL")
+            try:
+                if spec.strategy == "read":
+                    read_bytes = _digest_read(f, h, expected_size, on_read)
+                elif spec.strategy == "mmap" and expected_size >= MMAP_MIN_SIZE:
+                    read_bytes = _digest_mmap(f, h, expected_size, on_read)
+                else:
+                    read_bytes = _digest_readinto(f, h, expected_size, on_read)
+            finally:
+                if spec.low_footprint:
+                    _advise(f.fileno(), "POSIX_FADV_DONTNEED")
+    except PermissionError:
+        warnings.append(("permission", "Permission denied while hashing"))
+        return None, False, read_bytes
+    except OSError as exc:
+        warnings.append(("io_error", f"I/O error while hashing: {exc}"))
+        return None, False, read_bytes
+    if read_bytes != expected_size:
+        return None, False, read_bytes
+    return finish_digest(h, spec), True, read_bytes
+
+
+def _tree_executor() -> ThreadPoolExecutor:
+    """Process-wide pool for tree leaves, one thread per core.
+
+    Shared by every file being tree-hashed so concurrent large files do not
+    multiply the thread count; hashlib releases the GIL on large updates,
+    so the leaves really do run on separate cores.
+    """
+    global _tree_pool
+    with _tree_pool_lock:
+        if _tree_pool is None:
+            _tree_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="xfs-tree")
+        return _tree_pool
+
+
+def _digest_range(
+    fd: int,
+    offset: int,
+    length: int,
+    spec: DigestSpec,
+    on_read: Optional[ReadCallback] = None,
+) -> Tuple[bytes, int]:
+    h = new_hasher(spec)
+    view = _thread_buffer(chunk_size_for(length))
+    read_bytes = 0
+    while read_bytes < length:
+        count = os.preadv(fd, [view[: min(len(view), length - read_bytes)]], offset + read_bytes)
+        if not count:
+            break
+        if on_read is not None:
+            on_read(count)
+        h.update(view[:count])
+        read_bytes += count
+    return h.digest(), read_bytes
+
+
+def _read_tree(
+    path: str,
+    expected_size: int,
+    expected_mtime: float,
+    spec: DigestSpec,
+    warnings: List[HashWarning],
+    on_read: Optional[ReadCallback] = None,
+) -> Tuple[Optional[str], bool, int]:
+    """Digest fixed-size leaves in parallel and hash their digests into a root.
+
+    The root covers the leaf size and file size too, so trees built with a
+    different leaf size never collide with each other or with flat digests.
+    """
+    leaf = spec.tree_leaf_size
+    read_bytes = 0
+    try:
+        with _open_for_hash(path, spec, buffered=False) as f:
+            fd = f.fileno()
+            try:
+                leaves = list(
+                    _tree_executor().map(
+                        lambda offset: _digest_range(fd, offset, min(leaf, expected_size - offset), spec, on_read),
+                        range(0, expected_size, leaf),
+                    )
+                )
+                stat_after = os.fstat(fd)
+            finally:
+                if spec.low_footprint:
+                    _advise(fd, "POSIX_FADV_DONTNEED")
+    except PermissionError:
+        warnings.append(("permission", "Permission denied while hashing"))
+        return None, False, read_bytes
+    except OSError as exc:
+        warnings.append(("io_error", f"I/O error while hashing: {exc}"))
+        return None, False, read_bytes
+    read_bytes = sum(count for _digest, count in leaves)
+    # Positional reads stop at the expected size, so growth only shows in metadata.
+    if read_bytes != expected_size or stat_after.st_size != expected_size or stat_after.st_mtime != expected_mtime:
+        return None, False, read_bytes
+    h = new_hasher(spec)
+    h.update(f"tree:{leaf}:{expected_size}".encode())
+    for digest, _count in leaves:
+        h.update(digest)
+    return finish_digest(h, spec), True, read_bytes
+
+
+def encode_chunks(chunks: Sequence[Chunk]) -> str:
+    return ",".join(f"{digest}:{length}" for digest, length in chunks)
+
+
+def decode_chunks(value: str) -> List[Chunk]:
+    chunks: List[Chunk] = []
+    for item in value.split(",") if value else ():
+        digest, length = item.rsplit(":", 1)
+        chunks.append((digest, int(length)))
+    return chunks
+
+
+def _read_chunks(
+    path: str,
+    expected_size: int,
+    expected_mtime: float,
+    spec: DigestSpec,
+    warnings: List[HashWarning],
+    on_read: Optional[ReadCallback] = None,
+) -> Tuple[Optional[str], bool, int]:
+    """Split a file into content-defined chunks.
+
+    Every byte is mapped to one of two classes with ``bytes.translate``,
+    and a boundary falls after the first run of ``log2(mean) - 1`` bytes of
+    class 0, found with ``bytes.find``. Both run in C, so chunking costs
+    little more than hashing. A boundary depends only on the bytes just
+    before it: an insertion early in a file shifts later boundaries along
+    with the data instead of changing every chunk after it. Chunks are
+    kept between a quarter of and eight times the mean length, and the
+    mean doubles for files that would otherwise exceed
+    ``MAX_CHUNKS_PER_FILE`` chunks.
+    """
+    average = spec.chunk_avg_for(expected_size)
+    minimum = max(1, average // 4)
+    maximum = average * 8
+    run = max(1, average.bit_length() - 2)
+    pattern = bytes(run)
+    chunks: List[Chunk] = []
+    h = new_hasher(spec)
+    length = 0
+    read_bytes = 0
+    # Classes of the current chunk's last bytes, for runs across reads.
+    carry = b""
+    try:
+        with _open_for_hash(path, spec, buffered=False) as f:
+            if spec.low_footprint:
+                _advise(f.fileno(), "POSIX_FADV_SEQUENTIAL")
+            view = _thread_buffer(chunk_size_for(expected_size))
+            try:
+                while True:
+                    count = f.readinto(view)
+                    if not count:
+                        break
+                    if on_read is not None:
+                        on_read(count)
+                    read_bytes += count
+                    offset = len(carry)
+                    classes = carry + view[:count].tobytes().translate(_BOUNDARY_CLASSES)
+                    # Where the current chunk starts in ``classes``.
+                    chunk_start = 0
+                    start = index = 0
+                    while index < count:
+                        if length < minimum:
+                            skip = min(minimum - length, count - index)
+                            index += skip
+                            length += skip
+                            continue
+                        limit = min(count, index + maximum - length)
+                        low = max(chunk_start, offset + index - run + 1)
+                        found = classes.find(pattern, low, offset + limit)
+                        end = found - offset + run if found >= 0 else limit
+                        length += end - index
+                        index = end
+                        if found >= 0 or length >= maximum:
+                            h.update(view[start:index])
+                            chunks.append((finish_digest(h, spec), length))
+                            h = new_hasher(spec)
+                            start = index
+                            chunk_start = offset + index
+                            length = 0
+                    h.update(view[start:count])
+                    carry = classes[max(chunk_start, len(classes) - run + 1) :] if run > 1 else b""
+            finally:
+                if spec.low_footprint:
+                    _advise(f.fileno(), "POSIX_FADV_DONTNEED")
+    except PermissionError:
+        warnings.append(("permission", "Permission denied while hashing"))
+        return None, False, read_bytes
+    except OSError as exc:
+        warnings.append(("io_error", f"I/O error while hashing: {exc}"))
+        return None, False, read_bytes
+    if length:
+        chunks.append((finish_digest(h, spec), length))
+    if read_bytes != expected_size:
+        return None, False, read_bytes
+    return encode_chunks(chunks), True, read_bytes
+
+
+def _sample_offsets(size: int, block_size: int) -> Tuple[int, int, int]:
+    return 0, (size - block_size) // 2, size - block_size
+
+
+def _read_samples(
+    path: str,
+    expected_size: int,
+    expected_mtime: float,
+    spec: DigestSpec,
+    warnings: List[HashWarning],
+    on_read: Optional[ReadCallback] = None,
+) -> Tuple[Optional[str], bool, int]:
+    h = new_hasher(spec)
+    # The size is mixed in so equal blocks of different-length files differ.
+    h.update(str(expected_size).encode())
+    read_bytes = 0
+    try:
+        with _open_for_hash(path, spec) as f:
+            try:
+                for offset in _sample_offsets(expected_size, SAMPLE_BLOCK_SIZE):
+                    f.seek(offset)
+                    chunk = f.read(SAMPLE_BLOCK_SIZE)
+                    read_bytes += len(chunk)
+                    if on_read is not None:
+                        on_read(len(chunk))
+                    if len(chunk) != SAMPLE_BLOCK_SIZE:
+                        return None, False, read_bytes
+                    h.update(chunk)
+                stat_after = os.fstat(f.fileno())
+            finally:
+                if spec.low_footprint:
+                    _advise(f.fileno(), "POSIX_FADV_DONTNEED")
+    except PermissionError:
+        warnings.append(("permission", "Permission denied while hashing"))
+        return None, False, read_bytes
+    except OSError as exc:
+        warnings.append(("io_error", f"I/O error while hashing: {exc}"))
+        return None, False, read_bytes
+    # Sampling cannot notice a rewrite by counting bytes, so compare metadata.
+    if stat_after.st_size != expected_size or stat_after.st_mtime != expected_mtime:
+        return None, False, read_bytes
+    return finish_digest(h, spec), True, read_bytes
+
+
+def _read_with_retry(
+    reader: _Reader,
+    path: str,
+    expected_size: int,
+    expected_mtime: float,
+    spec: DigestSpec,
+    on_read: Optional[ReadCallback] = None,
+) -> HashOutcome:
+    warnings: List[HashWarning] = []
+    digest, stable, read_bytes = reader(path, expected_size, expected_mtime, spec, warnings, on_read)
+    if not stable:
+        stat_after = os.stat(path)
+        if stat_after.st_size != expected_size or stat_after.st_mtime != expected_mtime:
+            # Drift detected, retry once
+            digest, stable, retried = reader(path, expected_size, expected_mtime, spec, warnings, on_read)
+            read_bytes += retried
+            if not stable:
+                warnings.append(("unstable", "File changed during hashing twice; skipping"))
+                return HashOutcome(None, False, warnings, read_bytes)
+    return HashOutcome(digest, True, warnings, read_bytes)
+
+
+def hash_file(
+    path: str,
+    expected_size: int,
+    expected_mtime: float,
+    spec: DigestSpec = DEFAULT_SPEC,
+    on_read: Optional[ReadCallback] = None,
+) -> HashOutcome:
+    """Hash one file with drift detection.
+
+    A short or failed read is retried once if ``stat`` shows the file moved
+    away from the expected size/mtime; a second failure is reported as
+    unstable. Mirrors what ``FolderScanner._hash_file`` has always done,
+    but without touching scanner state so it can run in another process.
+    Files above ``spec.tree_threshold`` get a tree digest instead, and with
+    ``spec.chunk_avg_size`` files of at least ``CHUNK_THRESHOLD_FACTOR``
+    mean chunks get an encoded chunk list.
+    """
+    if spec.uses_chunks(expected_size):
+        reader: _Reader = _read_chunks
+    elif spec.uses_tree(expected_size):
+        reader = _read_tree
+    else:
+        reader = _read_digest
+    return _read_with_retry(reader, path, expected_size, expected_mtime, spec, on_read)
+
+
+def sample_file(
+    path: str,
+    expected_size: int,
+    expected_mtime: float,
+    spec: DigestSpec = DEFAULT_SPEC,
+    on_read: Optional[ReadCallback] = None,
+) -> HashOutcome:
+    """Digest the head, middle and tail blocks of a file.
+
+    Files no larger than the three blocks are hashed in full instead, in
+    which case the outcome is a regular full digest (``sampled`` is False).
+    """
+    if expected_size <= 3 * SAMPLE_BLOCK_SIZE:
+        return hash_file(path, expected_size, expected_mtime, spec, on_read)
+    outcome = _read_with_retry(_read_samples, path, expected_size, expected_mtime, spec, on_read)
+    outcome.sampled = True
+    return outcome
+
+
+def hash_batch(jobs: Sequence[HashJob], spec: DigestSpec = DEFAULT_SPEC) -> List[HashOutcome]:
+    """Worker-process entry point: hash every job in order."""
+    outcomes: List[HashOutcome] = []
+    for index, (path, size, mtime) in enumerate(jobs):
+        if spec.prefetch and index + 1 < len(jobs):
+            prefetch_file(jobs[index + 1][0], spec)
+        outcomes.append(hash_file(path, size, mtime, spec))
+    return outcomes
+
+
+class ProcessHashPool:
+    """Content hashing on a pool of worker processes.
+
+    Each process has its own interpreter, so digesting scales past the GIL
+    that the walk, stat bookkeeping and API handlers share. Workers are
+    spawned rather than forked because the scanner runs inside a threaded
+    server process.
+    """
+
+    def __init__(self, processes: int) -> None:
+        self.processes = max(1, processes)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def submit(self, jobs: Sequence[HashJob], spec: DigestSpec = DEFAULT_SPEC) -> "Future[List[HashOutcome]]":
+        return self._executor.submit(hash_batch, list(jobs), spec)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Iterator, Set, Tuple
+
+
+class InodeSet:
+    """A set of ``(st_dev, st_ino)`` pairs kept as one int set per device.
+
+    A scan sees few devices, so storing bare inode numbers per device
+    avoids a tuple (and a second int) for every entry. Callers only add
+    inodes with ``st_nlink > 1``; no other inode can be met twice.
+    """
+
+    __slots__ = ("_devices", "_count")
+
+    def __init__(self, pairs: Iterable[Tuple[int, int]] = ()) -> None:
+        self._devices: Dict[int, Set[int]] = {}
+        self._count = 0
+        self.update(pairs)
+
+    def add(self, device: int, inode: int) -> bool:
+        """Add an inode; return False if it was already present."""
+        inodes = self._devices.get(device)
+        if inodes is None:
+            inodes = self._devices[device] = set()
+        elif inode in inodes:
+            return False
+        inodes.add(inode)
+        self._count += 1
+        return True
+
+    def update(self, pairs: Iterable[Tuple[int, int]]) -> None:
+        for device, inode in pairs:
+            self.add(device, inode)
+
+    def __contains__(self, pair: object) -> bool:
+        if not isinstance(pair, tuple) or len(pair) != 2:
+            return False
+        inodes = self._devices.get(pair[0])
+        return inodes is not None and pair[1] in inodes
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        for device, inodes in self._devices.items():
+            for inode in inodes:
+                yield device, inode
+
+    def __len__(self) -> int:
+        return self._count
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import ctypes
+import errno
+import os
+import select
+import struct
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+from .walker import ErrorCallback
+
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+    | IN_DONT_FOLLOW
+)
+
+# struct inotify_event { int wd; uint32_t mask, cookie, len; char name[]; }
+_EVENT = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+
+
+@dataclass
+class WatchBatch:
+    """Coalesced changes, as folder keys relative to the watched root.
+
+    ``folders`` had a file change and need their own files rescanned;
+    ``subtrees`` appeared, disappeared or were moved and need a recursive
+    rescan. ``overflow`` means the kernel dropped events, so nothing short
+    of rescanning the whole root is safe.
+    """
+
+    folders: Set[str] = field(default_factory=set)
+    subtrees: Set[str] = field(default_factory=set)
+    overflow: bool = False
+    events: int = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.folders or self.subtrees or self.overflow)
+
+
+def _libc() -> Optional[ctypes.CDLL]:
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.inotify_init1  # noqa: B018 - probe for the symbol
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def inotify_available() -> bool:
+    return _libc() is not None
+
+
+def _join(rel_dir: str, name: str) -> str:
+    return name if rel_dir == "." else f"{rel_dir}/{name}"
+
+
+def _within(key: str, prefix: str) -> bool:
+    return prefix == "." or key == prefix or key.startswith(prefix + "/")
+
+
+class InotifyWatcher:
+    """Recursive inotify watch over one tree, via ctypes.
+
+    inotify watches single directories, so every directory below ``root``
+    gets its own watch and new directories are added as they appear.
+    ``prunes`` skips subtrees the scan excludes. Directories that cannot be
+    watched (for example once ``fs.inotify.max_user_watches`` is reached)
+    are reported through ``on_error``.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        prunes: Optional[Callable[[str], bool]] = None,
+        on_error: Optional[ErrorCallback] = None,
+    ) -> None:
+        libc = _libc()
+        if libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available on this platform")
+        self.root = root
+        self._libc = libc
+        self._prunes = prunes
+        self._on_error = on_error
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        self._paths: Dict[int, str] = {}
+        self._watches: Dict[str, int] = {}
+
+    @property
+    def watch_count(self) -> int:
+        return len(self._paths)
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._paths.clear()
+        self._watches.clear()
+
+    def add_tree(self, rel_dir: str = ".") -> None:
+        """Watch ``rel_dir`` and every directory below it."""
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            if self._prunes is not None and current != "." and self._prunes(current):
+                continue
+            path = self.root / current if current != "." else self.root
+            if not self._add_watch(current, path):
+                continue
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(_join(current, entry.name))
+                        except OSError:
+                            continue
+            except OSError as exc:
+                if self._on_error is not None:
+                    self._on_error(path, exc)
+
+    def wait(self, timeout: float, settle: float = 0.5, max_delay: float = 5.0) -> WatchBatch:
+        """Block up to ``timeout`` for events, then coalesce a burst.
+
+        After the first event, reading continues until ``settle`` seconds
+        pass without a new one or ``max_delay`` is reached, so a copy of
+        many files yields one batch rather than one per file.
+        """
+        batch = WatchBatch()
+        if not self._readable(timeout):
+            return batch
+        deadline = time.monotonic() + max_delay
+        while True:
+            self._drain(batch)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._readable(min(settle, remaining)):
+                return batch
+
+    def _readable(self, timeout: float) -> bool:
+        if self._fd < 0:
+            return False
+        ready, _w, _x = select.select([self._fd], [], [], max(0.0, timeout))
+        return bool(ready)
+
+    def _drain(self, batch: WatchBatch) -> None:
+        while True:
+            try:
+                data = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                return
+            if not data:
+                return
+            for wd, mask, name in self._parse(data):
+                batch.events += 1
+                self._handle(batch, wd, mask, name)
+
+    @staticmethod
+    def _parse(data: bytes) -> Iterator[tuple]:
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            offset += length
+            yield wd, mask, name
+
+    def _handle(self, batch: WatchBatch, wd: int, mask: int, name: str) -> None:
+        if mask & IN_Q_OVERFLOW:
+            batch.overflow = True
+            return
+        rel_dir = self._paths.get(wd)
+        if rel_dir is None:
+            return
+        if mask & IN_IGNORED:
+            self._forget(wd)
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            if rel_dir == ".":
+                # The root itself went away or moved.
+                batch.overflow = True
+            return
+        if not name:
+            return
+        child = _join(rel_dir, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self.add_tree(child)
+                batch.subtrees.add(child)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._unwatch_tree(child)
+                batch.subtrees.add(child)
+            return
+        batch.folders.add(rel_dir)
+
+    def _add_watch(self, rel_dir: str, path: Path) -> bool:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            code = ctypes.get_errno()
+            if self._on_error is not None and code not in (errno.ENOENT, errno.ENOTDIR):
+                self._on_error(path, OSError(code, os.strerror(code)))
+            return False
+        # A directory moved within the tree keeps its watch descriptor.
+        previous = self._paths.get(wd)
+        if previous is not None and self._watches.get(previous) == wd:
+            del self._watches[previous]
+        self._paths[wd] = rel_dir
+        self._watches[rel_dir] = wd
+        return True
+
+    def _unwatch_tree(self, rel_dir: str) -> None:
+        # Moved-away directories keep reporting under their old path unless
+        # their watches are dropped; deleted ones are already gone.
+        for key in [key for key in self._watches if _within(key, rel_dir)]:
+            wd = self._watches.pop(key)
+            self._paths.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _forget(self, wd: int) -> None:
+        rel_dir = self._paths.pop(wd, None)
+        if rel_dir is not None and self._watches.get(rel_dir) == wd:
+            del self._watches[rel_dir]
+
+
+def collapse_batch(batch: WatchBatch) -> WatchBatch:
+    """Drop work already covered by a recursive rescan of an enclosing subtree."""
+    if batch.overflow:
+        return WatchBatch(subtrees={"."}, overflow=True, events=batch.events)
+    subtrees: List[str] = []
+    for key in sorted(batch.subtrees, key=lambda value: value.count("/")):
+        if not any(_within(key, kept) for kept in subtrees):
+            subtrees.append(key)
+    folders = {key for key in batch.folders if not any(_within(key, kept) for kept in subtrees)}
+    return WatchBatch(folders=folders, subtrees=set(subtrees), events=batch.events)
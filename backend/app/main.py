@@ -14,6 +14,7 @@ from .config import AppConfig
 from .logstream import LogStreamHandler
 from .metrics import MetricsExporter
 from .models import (
+    CheckpointInfo,
     ConfirmDeletionPayload,
     DeletionPlan,
     DeletionPlanPayload,
@@ -27,6 +28,8 @@ from .models import (
     ScanProgress,
     ScanMetrics,
     ScanRequest,
+    ShardAssignment,
+    ShardStatus,
     SimilarityMatrixResponse,
     TreemapResponse,
 )
@@ -130,6 +133,21 @@ def cancel_scan(scan_id: str, manager: ScanManager = Depends(get_scan_manager))
     return manager.get_progress(scan_id)
 
 
+@app.get("/api/checkpoints", response_model=list[CheckpointInfo])
+def list_checkpoints(manager: ScanManager = Depends(get_scan_manager)) -> list[CheckpointInfo]:
+    return manager.list_checkpoints()
+
+
+@app.post(
+    "/api/checkpoints/{scan_id}/resume",
+    response_model=ScanProgress,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def resume_scan(scan_id: str, manager: ScanManager = Depends(get_scan_manager)) -> ScanProgress:
+    job = manager.resume_scan(scan_id)
+    return manager.get_progress(job.scan_id)
+
+
 @app.get("/api/scans/{scan_id}/groups", response_model=list[GroupRecord])
 def get_groups(
     scan_id: str,
@@ -219,6 +237,42 @@ def get_group_contents(
     return manager.get_group_contents(scan_id, group_id)
 
 
+def require_worker_mode() -> None:
+    if not config.worker_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Worker mode disabled")
+
+
+@app.post(
+    "/api/worker/shards",
+    response_model=ShardStatus,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_worker_mode)],
+)
+def start_shard(assignment: ShardAssignment, manager: ScanManager = Depends(get_scan_manager)) -> ShardStatus:
+    return manager.start_shard(assignment)
+
+
+@app.get("/api/worker/shards/{shard_id}", response_model=ShardStatus, dependencies=[Depends(require_worker_mode)])
+def get_shard(shard_id: str, manager: ScanManager = Depends(get_scan_manager)) -> ShardStatus:
+    return manager.get_shard(shard_id)
+
+
+@app.get("/api/worker/shards/{shard_id}/result", dependencies=[Depends(require_worker_mode)])
+def get_shard_result(shard_id: str, manager: ScanManager = Depends(get_scan_manager)) -> Response:
+    # Already gzip'd JSON; sent as an opaque body so clients do not inflate it.
+    return Response(content=manager.get_shard_result(shard_id), media_type="application/gzip")
+
+
+@app.delete(
+    "/api/worker/shards/{shard_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(require_worker_mode)],
+)
+def release_shard(shard_id: str, manager: ScanManager = Depends(get_scan_manager)) -> Response:
+    manager.release_shard(shard_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
 @app.get("/api/system/logs/stream")
 async def stream_logs(level: Optional[str] = Query(default=None), once: bool = Query(default=False)):
     if not config.log_stream_enabled or not log_stream_handler:
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import fnmatch
+import os
+import re
+from typing import FrozenSet, Optional, Pattern, Sequence, Tuple
+
+
+_MAGIC = re.compile(r"[*?[]")
+# On POSIX normcase is the identity; skip the call per path there.
+_NORMCASE_IS_IDENTITY = os.path.normcase("Aa/Bb") == "Aa/Bb"
+
+
+def _normcase(value: str) -> str:
+    return value if _NORMCASE_IS_IDENTITY else os.path.normcase(value)
+
+
+class _PatternSet:
+    """A list of ``fnmatch`` globs compiled into cheap checks.
+
+    Matching follows ``fnmatch.fnmatch`` on the whole posix path, where
+    ``*`` also crosses ``/``. Patterns are split into:
+
+    - exact literals (no wildcard) checked with one set lookup,
+    - ``literal*`` prefixes checked with one ``str.startswith`` call,
+    - ``*literal`` suffixes checked with one ``str.endswith`` call,
+    - everything else folded into a single alternation regex.
+    """
+
+    def __init__(self, patterns: Sequence[str]) -> None:
+        exact = set()
+        prefixes = []
+        suffixes = []
+        complex_patterns = []
+        for raw in patterns:
+            pattern = _normcase(raw)
+            if not _MAGIC.search(pattern):
+                exact.add(pattern)
+                continue
+            head = pattern.rstrip("*")
+            if head != pattern and not _MAGIC.search(head):
+                prefixes.append(head)
+                continue
+            tail = pattern.lstrip("*")
+            if tail != pattern and not _MAGIC.search(tail):
+                suffixes.append(tail)
+                continue
+            complex_patterns.append(pattern)
+        self.exact: FrozenSet[str] = frozenset(exact)
+        self.prefixes: Tuple[str, ...] = tuple(prefixes)
+        self.suffixes: Tuple[str, ...] = tuple(suffixes)
+        self.regex: Optional[Pattern[str]] = None
+        if complex_patterns:
+            self.regex = re.compile("|".join(f"(?:{fnmatch.translate(item)})" for item in complex_patterns))
+        self.empty = not patterns
+
+    def matches(self, path: str) -> bool:
+        if path in self.exact:
+            return True
+        if self.prefixes and path.startswith(self.prefixes):
+            return True
+        if self.suffixes and path.endswith(self.suffixes):
+            return True
+        return self.regex is not None and self.regex.match(path) is not None
+
+    def covers_subtree(self, rel_dir: str) -> bool:
+        """True when every path below ``rel_dir`` is guaranteed to match."""
+        return bool(self.prefixes) and f"{rel_dir}/".startswith(self.prefixes)
+
+
+class PathMatcher:
+    """Include/exclude globs compiled once and reused for every path.
+
+    ``include`` applies to files only; ``exclude`` applies to files and
+    directories. Paths are posix strings relative to the scan root (or any
+    string for export filtering).
+    """
+
+    def __init__(self, include: Sequence[str] = (), exclude: Sequence[str] = ()) -> None:
+        self._include = _PatternSet(include)
+        self._exclude = _PatternSet(exclude)
+
+    def is_excluded(self, path: str) -> bool:
+        if self._exclude.empty:
+            return False
+        return self._exclude.matches(_normcase(path))
+
+    def is_included(self, path: str) -> bool:
+        if self._include.empty:
+            return True
+        return self._include.matches(_normcase(path))
+
+    def accepts_file(self, path: str) -> bool:
+        return not self.is_excluded(path) and self.is_included(path)
+
+    def prunes_subtree(self, rel_dir: str) -> bool:
+        """Whether nothing below ``rel_dir`` can survive the exclude list.
+
+        Such a directory is still reported as a folder, but it never needs
+        to be listed.
+        """
+        if self._exclude.empty or rel_dir in ("", "."):
+            return False
+        return self._exclude.covers_subtree(_normcase(rel_dir))
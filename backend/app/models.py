@@ -4,7 +4,7 @@ from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Literal, Optional
+from typing import Dict, List, Literal, Optional, Tuple
 
 from pydantic import BaseModel, Field, validator
 
@@ -13,11 +13,43 @@ from .domain import FolderInfo
 class FileEqualityMode(str, Enum):
     NAME_SIZE = "name_size"
     SHA256 = "sha256"
+    SAMPLED = "sampled"
+    CHUNKS = "chunks"
+
+
+class HashAlgorithm(str, Enum):
+    SHA256 = "sha256"
+    BLAKE2B = "blake2b"
+
+
+class HashStrategy(str, Enum):
+    READ = "read"
+    READINTO = "readinto"
+    MMAP = "mmap"
+
+
+class WalkerEngine(str, Enum):
+    OS_WALK = "os_walk"
+    SCANDIR = "scandir"
+    PARALLEL = "parallel"
+
+
+class HashBackend(str, Enum):
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+class HashSchedule(str, Enum):
+    FIFO = "fifo"
+    DEVICE = "device"
+    LARGEST_FIRST = "largest_first"
 
 
 class StructurePolicy(str, Enum):
     RELATIVE = "relative"
     BAG_OF_FILES = "bag_of_files"
+    # Identities are content only, so renamed or moved files still match.
+    CONTENT = "content"
 
 
 class WarningType(str, Enum):
@@ -40,15 +72,84 @@ class ScanStatus(str, Enum):
     FAILED = "failed"
 
 
+class RemoteShard(BaseModel):
+    """A subtree of the scan root that another xfolder instance scans."""
+
+    # Base URL of the worker instance, e.g. ``http://storage-2:8080``.
+    worker_url: str
+    # Folder key of the subtree below the coordinator's root.
+    subtree: str
+    # Where the worker finds the subtree; defaults to root_path/subtree.
+    path: Optional[Path] = None
+
+    @validator("worker_url")
+    def strip_worker_url(cls, value: str) -> str:
+        return value.rstrip("/")
+
+    @validator("subtree")
+    def normalize_subtree(cls, value: str) -> str:
+        parts = [part for part in value.replace("\\", "/").split("/") if part not in ("", ".")]
+        if not parts or ".." in parts:
+            raise ValueError("subtree must name a folder below the scan root")
+        return "/".join(parts)
+
+
 class ScanRequest(BaseModel):
     root_path: Path
+    # Further roots walked concurrently and grouped together with
+    # ``root_path``; folder keys are then prefixed with a per-root label.
+    additional_roots: List[Path] = Field(default_factory=list)
     include: List[str] = Field(default_factory=list)
     exclude: List[str] = Field(default_factory=list)
     file_equality: FileEqualityMode = FileEqualityMode.NAME_SIZE
     similarity_threshold: float = Field(default=0.80, ge=0.0, le=1.0)
     force_case_insensitive: bool = False
     structure_policy: StructurePolicy = StructurePolicy.RELATIVE
-    concurrency: Optional[int] = Field(default=None, ge=1, le=32)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=256)
+    adaptive_concurrency: bool = False
+    # Upper bound for adaptive concurrency; NFS mounts may want hundreds.
+    max_concurrency: int = Field(default=256, ge=1, le=1024)
+    walker: WalkerEngine = WalkerEngine.OS_WALK
+    traversal_workers: Optional[int] = Field(default=None, ge=1, le=256)
+    hash_backend: HashBackend = HashBackend.THREAD
+    hash_processes: Optional[int] = Field(default=None, ge=1, le=256)
+    lazy_hashing: bool = False
+    sampled_full_hash: bool = True
+    hash_algorithm: HashAlgorithm = HashAlgorithm.SHA256
+    # Digest length in bytes; defaults to the algorithm's full length.
+    digest_size: Optional[int] = Field(default=None, ge=8, le=64)
+    hash_strategy: HashStrategy = HashStrategy.READINTO
+    low_footprint_io: bool = False
+    prefetch_next: bool = False
+    hash_schedule: HashSchedule = HashSchedule.FIFO
+    # Concurrent hash reads per st_dev under the device schedule.
+    per_device_concurrency: int = Field(default=2, ge=1, le=256)
+    # Files of at least this many bytes get a parallel tree digest; None disables.
+    tree_hash_threshold: Optional[int] = Field(default=None, ge=1)
+    tree_leaf_size: int = Field(default=64 * 1024 * 1024, ge=64 * 1024)
+    # Mean content-defined chunk length in chunks mode.
+    chunk_avg_size: int = Field(default=1024 * 1024, ge=4 * 1024, le=64 * 1024 * 1024)
+    # name_size only: hash the members of identical/near-duplicate groups
+    # after grouping and relabel or split groups whose contents differ.
+    verify_groups: bool = False
+    # I/O limits for the stat and hash stages; None means unlimited.
+    max_read_bytes_per_second: Optional[int] = Field(default=None, ge=1)
+    max_opens_per_second: Optional[int] = Field(default=None, ge=1)
+    idle_io_priority: bool = False
+    # Pause new stats and reads while the host is above either threshold.
+    pause_load_average: Optional[float] = Field(default=None, gt=0)
+    pause_io_pressure: Optional[float] = Field(default=None, gt=0, le=100)
+    # Reuse stored per-folder results for directories whose mtime/ctime
+    # have not changed since the previous scan of the same root.
+    incremental: bool = False
+    # Keep results live from inotify events after the scan completes (Linux).
+    watch: bool = False
+    # Write a resumable checkpoint at most this often; None disables.
+    checkpoint_interval_seconds: Optional[float] = Field(default=None, ge=1)
+    # Scan the root's top-level subtrees on this many worker processes.
+    shard_processes: Optional[int] = Field(default=None, ge=1, le=256)
+    # Subtrees scanned by worker instances; the rest is scanned locally.
+    remote_shards: List[RemoteShard] = Field(default_factory=list)
     deletion_enabled: bool = False
     include_matrix: bool = False
     include_treemap: bool = False
@@ -57,6 +158,122 @@ class ScanRequest(BaseModel):
     def normalize_root(cls, value: str | Path) -> Path:
         return Path(value).expanduser().resolve()
 
+    @validator("additional_roots", pre=True)
+    def normalize_additional_roots(cls, value) -> List[Path]:
+        if value is None:
+            return []
+        return [Path(item).expanduser().resolve() for item in value]
+
+    @validator("additional_roots")
+    def check_additional_roots(cls, value: List[Path], values: Dict[str, object]) -> List[Path]:
+        # Nested roots would walk and group the same folders twice.
+        roots = [values["root_path"], *value] if "root_path" in values else list(value)
+        for index, left in enumerate(roots):
+            for right in roots[index + 1 :]:
+                if left == right or left in right.parents or right in left.parents:
+                    raise ValueError(f"scan roots overlap: {left} and {right}")
+        return value
+
+    @validator("lazy_hashing", always=True)
+    def check_lazy_hashing(cls, value: bool, values: Dict[str, object]) -> bool:
+        # Each root is scanned on its own, so name/size collisions between
+        # roots would go unseen and different files keep equal identities.
+        if (value or values.get("file_equality") == FileEqualityMode.SAMPLED) and values.get("additional_roots"):
+            raise ValueError("additional roots cannot be combined with lazy or sampled hashing")
+        return value
+
+    @validator("digest_size")
+    def check_digest_size(cls, value: Optional[int], values: Dict[str, object]) -> Optional[int]:
+        if value is not None and values.get("hash_algorithm") == HashAlgorithm.SHA256 and value > 32:
+            raise ValueError("sha256 digests are at most 32 bytes")
+        return value
+
+    @validator("structure_policy")
+    def check_structure_policy(cls, value: StructurePolicy, values: Dict[str, object]) -> StructurePolicy:
+        if value == StructurePolicy.CONTENT and values.get("file_equality") == FileEqualityMode.NAME_SIZE:
+            raise ValueError("the content structure policy needs a hashing file_equality mode")
+        return value
+
+    @validator("incremental")
+    def check_incremental(cls, value: bool, values: Dict[str, object]) -> bool:
+        # Lazy and sampled hashing decide per file from collisions across the
+        # whole tree, which a reused folder cannot take part in.
+        if value and (values.get("lazy_hashing") or values.get("file_equality") == FileEqualityMode.SAMPLED):
+            raise ValueError("incremental rescans cannot be combined with lazy or sampled hashing")
+        return value
+
+    @validator("watch")
+    def check_watch(cls, value: bool, values: Dict[str, object]) -> bool:
+        # Same constraint as incremental rescans: a watched folder is
+        # rescanned on its own. Verification replaces fingerprints with
+        # content ones, which the name/size updates could not follow.
+        if value and (values.get("lazy_hashing") or values.get("file_equality") == FileEqualityMode.SAMPLED):
+            raise ValueError("watch mode cannot be combined with lazy or sampled hashing")
+        if value and values.get("verify_groups"):
+            raise ValueError("watch mode cannot be combined with verify_groups")
+        if value and values.get("additional_roots"):
+            raise ValueError("watch mode covers a single root")
+        return value
+
+    @validator("checkpoint_interval_seconds")
+    def check_checkpoint(cls, value: Optional[float], values: Dict[str, object]) -> Optional[float]:
+        # Resumed folders are reused whole, like incremental rescans.
+        if value is not None and (
+            values.get("lazy_hashing") or values.get("file_equality") == FileEqualityMode.SAMPLED
+        ):
+            raise ValueError("checkpoints cannot be combined with lazy or sampled hashing")
+        if value is not None and values.get("additional_roots"):
+            raise ValueError("checkpoints cover a single root")
+        return value
+
+    @validator("shard_processes")
+    def check_shard_processes(cls, value: Optional[int], values: Dict[str, object]) -> Optional[int]:
+        if value is None:
+            return value
+        # A shard only sees its own subtree, so collisions that lazy and
+        # sampled hashing look for across the tree would be missed.
+        if values.get("lazy_hashing") or values.get("file_equality") == FileEqualityMode.SAMPLED:
+            raise ValueError("sharded scans cannot be combined with lazy or sampled hashing")
+        if (
+            values.get("incremental")
+            or values.get("watch")
+            or values.get("checkpoint_interval_seconds") is not None
+            or values.get("additional_roots")
+        ):
+            raise ValueError(
+                "sharded scans cannot be combined with incremental rescans, watch mode, checkpoints or additional roots"
+            )
+        return value
+
+    @validator("remote_shards")
+    def check_remote_shards(cls, value: List[RemoteShard], values: Dict[str, object]) -> List[RemoteShard]:
+        if not value:
+            return value
+        # Workers see only their subtree, like local shards.
+        if values.get("lazy_hashing") or values.get("file_equality") == FileEqualityMode.SAMPLED:
+            raise ValueError("remote shards cannot be combined with lazy or sampled hashing")
+        if (
+            values.get("incremental")
+            or values.get("watch")
+            or values.get("checkpoint_interval_seconds") is not None
+            or values.get("additional_roots")
+            or values.get("shard_processes")
+        ):
+            raise ValueError(
+                "remote shards cannot be combined with incremental rescans, watch mode, checkpoints, "
+                "additional roots or local shards"
+            )
+        subtrees = [shard.subtree for shard in value]
+        for index, left in enumerate(subtrees):
+            for right in subtrees[index + 1 :]:
+                if left == right or left.startswith(f"{right}/") or right.startswith(f"{left}/"):
+                    raise ValueError(f"remote shards overlap: {left} and {right}")
+        return value
+
+    @property
+    def roots(self) -> List[Path]:
+        return [self.root_path, *self.additional_roots]
+
 
 class FileRecord(BaseModel):
     path: Path
@@ -64,6 +281,9 @@ class FileRecord(BaseModel):
     size: int
     mtime: float
     sha256: Optional[str] = None
+    sample_digest: Optional[str] = None
+    # (digest, length) per content-defined chunk in chunks mode.
+    chunks: Optional[List[Tuple[str, int]]] = None
 
 
 class FolderRecord(BaseModel):
@@ -72,6 +292,7 @@ class FolderRecord(BaseModel):
     total_bytes: int
     file_count: int
     unstable: bool = False
+    hardlinked_bytes: int = 0
 
 
 class PairwiseSimilarity(BaseModel):
@@ -130,6 +351,33 @@ class ScanProgress(BaseModel):
     phases: List[PhaseProgress] = Field(default_factory=list)
     include_matrix: bool = False
     include_treemap: bool = False
+    # True while a completed scan is kept live by watch mode.
+    watching: bool = False
+
+
+class CheckpointInfo(BaseModel):
+    scan_id: str
+    root_path: Path
+    created_at: datetime
+    updated_at: datetime
+    folders_completed: int
+    folders_pending: int
+
+
+class ShardAssignment(BaseModel):
+    """Sent by a coordinator to a worker: scan ``path`` as ``subtree`` of ``request``."""
+
+    request: ScanRequest
+    subtree: str
+    path: Path
+
+
+class ShardStatus(BaseModel):
+    shard_id: str
+    subtree: str
+    status: ScanStatus
+    stats: Dict[str, int] = Field(default_factory=dict)
+    error: Optional[str] = None
 
 
 class ExportFilters(BaseModel):
@@ -155,6 +403,8 @@ class DeletionPlan(BaseModel):
     plan_id: str
     token: str
     reclaimable_bytes: int
+    # Bytes of planned hard links whose inode stays linked elsewhere.
+    hardlinked_bytes: int = 0
     queue: List[str]
     root: Path
     quarantine_root: Path
@@ -184,12 +434,19 @@ class MismatchEntry(BaseModel):
     right_bytes: int
 
 
+class MovedEntry(BaseModel):
+    from_path: str
+    to_path: str
+    bytes: int
+
+
 class GroupDiff(BaseModel):
     left: FolderRecord
     right: FolderRecord
     only_left: List[DiffEntry]
     only_right: List[DiffEntry]
     mismatched: List[MismatchEntry]
+    moved: List[MovedEntry] = Field(default_factory=list)
 
 
 class SimilarityMatrixEntry(BaseModel):
@@ -255,6 +512,12 @@ class ScanMetrics(BaseModel):
     completed_at: Optional[datetime]
     worker_count: int
     bytes_scanned: int
+    adaptive_concurrency: bool = False
+    # Current in-flight limit per pipeline stage, e.g. {"stat": 96, "hash": 12}.
+    stage_concurrency: Dict[str, int] = Field(default_factory=dict)
+    hash_schedule: HashSchedule = HashSchedule.FIFO
+    # Time from the hash queue running dry to the last digest finishing.
+    hash_tail_seconds: Optional[float] = None
     phase_timings: List[PhaseTiming]
     resource_samples: List[ResourceSample]
 
@@ -275,10 +538,42 @@ class GroupContents(BaseModel):
     duplicates: List[MemberContents]
 
 
+class LocationTree:
+    """Relative paths of a folder's content identities.
+
+    Each folder stores paths for its own files only; an aggregated folder
+    links its subfolders' trees under their names instead of copying
+    their paths, so memory stays proportional to the number of files
+    however deep the tree is. :meth:`flatten` builds the full map when a
+    diff or contents view asks for it.
+    """
+
+    __slots__ = ("own", "children")
+
+    def __init__(self, own: Dict[str, str], children: Tuple[Tuple[str, "LocationTree"], ...] = ()) -> None:
+        self.own = own
+        self.children = children
+
+    def flatten(self) -> Dict[str, str]:
+        """Identity -> path, the first file in pre-order winning."""
+        flat: Dict[str, str] = {}
+        stack: List[Tuple[str, LocationTree]] = [("", self)]
+        while stack:
+            prefix, node = stack.pop()
+            for identity, path in node.own.items():
+                if identity not in flat:
+                    flat[identity] = f"{prefix}{path}"
+            stack.extend((f"{prefix}{name}/", child) for name, child in reversed(node.children))
+        return flat
+
+
 @dataclass
 class DirectoryFingerprint:
     folder: FolderInfo
     file_weights: Dict[str, int]
+    # Content structure policy only: a relative path for each identity,
+    # since the identities themselves carry none.
+    locations: Optional[LocationTree] = None
 
 
 TreemapNode.update_forward_refs()
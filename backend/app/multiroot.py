@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .cache import FileHashCache
+from .domain import FolderInfo
+from .models import DirectoryFingerprint, HashBackend, ScanRequest, WarningRecord
+from .scanner import FolderScanner, ScanResult, default_concurrency, new_throttle
+from .snapshots import SnapshotStore
+
+
+# Stats whose scan-wide value is the largest per-root one rather than the sum.
+_MAX_STATS = frozenset({"hash_tail_ms", "hash_devices"})
+
+
+def root_labels(roots: List[Path]) -> List[str]:
+    """One key prefix per root: its name, suffixed ``-2``, ``-3``... on repeats."""
+    labels: List[str] = []
+    for root in roots:
+        base = root.name or "root"
+        label = base
+        suffix = 2
+        while label in labels:
+            label = f"{base}-{suffix}"
+            suffix += 1
+        labels.append(label)
+    return labels
+
+
+def qualify_key(label: str, key: str) -> str:
+    return label if key == "." else f"{label}/{key}"
+
+
+def split_root_path(request: ScanRequest, rel_path: str) -> Tuple[Path, str]:
+    """Map a folder key of ``request``'s scan to ``(root, path below that root)``."""
+    if not request.additional_roots:
+        return request.root_path, rel_path
+    label, _sep, rest = rel_path.strip("/").partition("/")
+    for root, candidate in zip(request.roots, root_labels(request.roots)):
+        if candidate == label:
+            return root, rest or "."
+    raise ValueError(f"Unknown scan root: {label}")
+
+
+def _share(total: int, index: int, count: int) -> int:
+    """Root ``index``'s part of ``total`` workers, spread as evenly as possible."""
+    return max(1, total // count + (1 if index < total % count else 0))
+
+
+class _RootStats(dict):
+    """One root's live stats; every write refreshes the scan-wide value."""
+
+    def __init__(self, siblings: List["_RootStats"], sink: Dict[str, int], lock: threading.Lock) -> None:
+        super().__init__()
+        self._siblings = siblings
+        self._sink = sink
+        self._lock = lock
+
+    def __setitem__(self, key: str, value: int) -> None:
+        super().__setitem__(key, value)
+        values = [stats.get(key, 0) for stats in self._siblings]
+        with self._lock:
+            self._sink[key] = max(values) if key in _MAX_STATS else sum(values)
+
+
+class _RootMeta(dict):
+    """Forwards a root's ``last_path``; the phase is reported for the whole scan."""
+
+    def __init__(self, sink: Optional[Dict[str, str]]) -> None:
+        super().__init__()
+        self._sink = sink
+
+    def __setitem__(self, key: str, value: str) -> None:
+        super().__setitem__(key, value)
+        if key == "last_path" and self._sink is not None:
+            self._sink[key] = value
+
+
+class MultiRootScanner:
+    """Scans ``request.roots`` concurrently into one :class:`ScanResult`.
+
+    Each root is walked by its own :class:`FolderScanner` on its own
+    thread. The roots share the file hash cache and the I/O throttle, and
+    split the request's worker budget between them instead of each taking
+    all of it. Folder keys are prefixed with the root's label from
+    :func:`root_labels`, so the fingerprints of every root are grouped
+    together and clones that span roots are found as usual.
+    """
+
+    def __init__(
+        self,
+        request: ScanRequest,
+        cache: Optional[FileHashCache] = None,
+        stats_sink: Optional[Dict[str, int]] = None,
+        meta_sink: Optional[Dict[str, str]] = None,
+        phase_callback: Optional[Callable[[str], None]] = None,
+        stop_event: Optional[threading.Event] = None,
+        snapshot_dir: Optional[Path] = None,
+    ) -> None:
+        self.request = request
+        self.cache = cache
+        self._stats_sink = stats_sink if stats_sink is not None else {}
+        self._meta_sink = meta_sink
+        self._phase_callback = phase_callback
+        self._stop_event = stop_event
+        self._snapshot_dir = snapshot_dir
+        self._lock = threading.Lock()
+
+    def scan(self) -> ScanResult:
+        roots = self.request.roots
+        labels = root_labels(roots)
+        # A failing root stops the others without cancelling the caller's job.
+        stop_event = threading.Event()
+        throttle = new_throttle(self.request, stop_event, self._set_stat)
+        siblings: List[_RootStats] = []
+        scanners: List[FolderScanner] = []
+        for index, root in enumerate(roots):
+            root_request = self._root_request(root, index, len(roots))
+            stats = _RootStats(siblings, self._stats_sink, self._lock)
+            siblings.append(stats)
+            snapshots = None
+            if self._snapshot_dir is not None and root_request.incremental:
+                # Keyed by this root alone, so single-root scans of it share them.
+                snapshots = SnapshotStore.for_request(self._snapshot_dir, root_request)
+            scanners.append(
+                FolderScanner(
+                    root_request,
+                    cache=self.cache,
+                    stats_sink=stats,
+                    meta_sink=_RootMeta(self._meta_sink),
+                    stop_event=stop_event,
+                    snapshots=snapshots,
+                    throttle=throttle,
+                )
+            )
+
+        results: Dict[int, ScanResult] = {}
+        failures: List[BaseException] = []
+
+        def _run(index: int) -> None:
+            try:
+                results[index] = scanners[index].scan()
+            except BaseException as exc:  # pylint: disable=broad-except
+                failures.append(exc)
+                stop_event.set()
+
+        threads = [
+            threading.Thread(target=_run, args=(index,), name=f"xfs-root-{index}", daemon=True)
+            for index in range(len(roots))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.2)
+                if self._stop_event is not None and self._stop_event.is_set():
+                    stop_event.set()
+        if failures:
+            raise failures[0]
+
+        if self._meta_sink is not None:
+            self._meta_sink["phase"] = "aggregating"
+        if self._phase_callback:
+            self._phase_callback("aggregating")
+        return self._merge(labels, [results[index] for index in range(len(roots))])
+
+    def _root_request(self, root: Path, index: int, count: int) -> ScanRequest:
+        request = self.request
+        update: Dict[str, object] = {
+            "root_path": root,
+            "additional_roots": [],
+            "concurrency": _share(request.concurrency or default_concurrency(), index, count),
+            "max_concurrency": _share(request.max_concurrency, index, count),
+        }
+        if request.traversal_workers is not None:
+            update["traversal_workers"] = _share(request.traversal_workers, index, count)
+        if request.hash_backend == HashBackend.PROCESS:
+            update["hash_processes"] = _share(request.hash_processes or os.cpu_count() or 4, index, count)
+        return request.copy(update=update)
+
+    def _merge(self, labels: List[str], results: List[ScanResult]) -> ScanResult:
+        folders: Dict[str, FolderInfo] = {}
+        fingerprints: Dict[str, DirectoryFingerprint] = {}
+        warnings: List[WarningRecord] = []
+        stats: Dict[str, int] = defaultdict(int)
+        for label, result in zip(labels, results):
+            for key, info in result.folders.items():
+                # Fingerprints share these objects, so their keys follow.
+                info.relative_path = qualify_key(label, key)
+                folders[info.relative_path] = info
+            for key, fingerprint in result.fingerprints.items():
+                fingerprints[qualify_key(label, key)] = fingerprint
+            warnings.extend(result.warnings)
+            for key, value in result.stats.items():
+                stats[key] = max(stats[key], value) if key in _MAX_STATS else stats[key] + value
+        for key, value in self._stats_sink.items():
+            if key.startswith("throttle_"):
+                stats[key] = value
+        stats["roots"] = len(labels)
+        self._set_stat("roots", len(labels))
+        return ScanResult(folders=folders, fingerprints=fingerprints, warnings=warnings, stats=dict(stats))
+
+    def _set_stat(self, key: str, value: int) -> None:
+        with self._lock:
+            self._stats_sink[key] = value
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional
+
+
+# Returned by ``StageQueue.get`` once the queue is closed and drained.
+CLOSED = object()
+# Returned by ``StageQueue._take`` when nothing may be dispatched yet.
+NOT_READY = object()
+
+
+class StageQueue:
+    """The bounded FIFO between two pipeline stages.
+
+    ``put`` blocks while ``capacity`` items are queued. ``get`` hands out
+    items until :meth:`close` has been called and the queue is empty, then
+    returns :data:`CLOSED` to every caller. Subclasses change the dispatch
+    order by overriding :meth:`_append`, :meth:`_take` and :meth:`_first`,
+    and may hold items back until :meth:`done` reports earlier ones as
+    finished.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = max(1, capacity)
+        self._condition = threading.Condition()
+        self._closed = False
+        self._size = 0
+        self._items: Deque[Any] = deque()
+        self._in_flight = 0
+        self._drained_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def put(self, item: Any) -> None:
+        with self._condition:
+            while self._size >= self.capacity:
+                self._condition.wait()
+            self._append(item)
+            self._size += 1
+            self._condition.notify_all()
+
+    def get(self, block: bool = True) -> Any:
+        """The next item, :data:`CLOSED`, or ``queue.Empty`` when not blocking."""
+        with self._condition:
+            while True:
+                item = self._take() if self._size else NOT_READY
+                if item is not NOT_READY:
+                    self._size -= 1
+                    self._in_flight += 1
+                    self._mark_drained()
+                    self._condition.notify_all()
+                    return item
+                if self._closed and not self._size:
+                    return CLOSED
+                if not block:
+                    raise queue.Empty
+                self._condition.wait()
+
+    def peek(self) -> Any:
+        """The item ``get`` would return next, or ``None``."""
+        with self._condition:
+            return self._first() if self._size else None
+
+    @property
+    def tail_seconds(self) -> float:
+        """Seconds the stage spent finishing in-flight items after draining."""
+        if self._drained_at is None:
+            return 0.0
+        return max(0.0, (self._finished_at or self._drained_at) - self._drained_at)
+
+    def done(self, item: Any) -> None:
+        """Report that a handler has finished with ``item``."""
+        with self._condition:
+            self._in_flight -= 1
+            if not self._in_flight and self._drained_at is not None:
+                self._finished_at = time.perf_counter()
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._mark_drained()
+            self._condition.notify_all()
+
+    def _mark_drained(self) -> None:
+        if self._closed and not self._size and self._drained_at is None:
+            self._drained_at = time.perf_counter()
+
+    def _append(self, item: Any) -> None:
+        self._items.append(item)
+
+    def _take(self) -> Any:
+        return self._items.popleft()
+
+    def _first(self) -> Optional[Any]:
+        return self._items[0]
+
+
+class PipelineStage:
+    """A fixed pool of worker threads draining one bounded queue.
+
+    ``put`` blocks while the queue is full, which is what gives upstream
+    stages backpressure and keeps the number of in-flight items (and the
+    memory they pin) proportional to ``capacity``. Handlers are expected to
+    deal with their own errors; anything that escapes is passed to
+    ``on_error`` and the worker keeps draining so producers never deadlock.
+
+    With ``batch_size > 1`` the handler receives a list instead: whatever
+    is already queued, up to ``batch_size`` items, so a stage that pays a
+    fixed cost per call (such as a process round trip) can amortise it
+    without waiting for a batch to fill.
+
+    ``stage_queue`` replaces the default FIFO with a scheduling policy.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], None],
+        workers: int,
+        capacity: int,
+        on_error: Callable[[BaseException], None],
+        batch_size: int = 1,
+        stage_queue: Optional[StageQueue] = None,
+    ) -> None:
+        self.name = name
+        self._handler = handler
+        self._batch_size = max(1, batch_size)
+        self._on_error = on_error
+        self._queue = stage_queue if stage_queue is not None else StageQueue(capacity)
+        self._threads: List[threading.Thread] = [
+            threading.Thread(target=self._run, name=f"xfs-{name}-{index}", daemon=True)
+            for index in range(max(1, workers))
+        ]
+
+    @property
+    def workers(self) -> int:
+        return len(self._threads)
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, item: Any) -> None:
+        self._queue.put(item)
+
+    def peek(self) -> Any:
+        """The next queued item, or ``None``. Advisory only: another worker
+        may take it first."""
+        return self._queue.peek()
+
+    def close(self) -> None:
+        """Signal that no more items will be queued; workers exit once drained."""
+        self._queue.close()
+
+    def join(self) -> None:
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self) -> None:
+        if self._batch_size > 1:
+            self._run_batched()
+            return
+        while True:
+            item = self._queue.get()
+            if item is CLOSED:
+                return
+            try:
+                self._handler(item)
+            except BaseException as exc:  # pylint: disable=broad-except
+                self._on_error(exc)
+            finally:
+                self._queue.done(item)
+
+    def _run_batched(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is CLOSED:
+                return
+            batch = [item]
+            while len(batch) < self._batch_size:
+                try:
+                    item = self._queue.get(block=False)
+                except queue.Empty:
+                    break
+                if item is CLOSED:
+                    break
+                batch.append(item)
+            try:
+                self._handler(batch)
+            except BaseException as exc:  # pylint: disable=broad-except
+                self._on_error(exc)
+            finally:
+                for item in batch:
+                    self._queue.done(item)
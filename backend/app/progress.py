@@ -11,6 +11,9 @@ from .store import ScanManager
 
 Subscriber = Tuple[asyncio.Queue[str], asyncio.AbstractEventLoop]
 
+# Watch updates list at most this many changed folders.
+MAX_UPDATE_FOLDERS = 200
+
 
 class ProgressBroadcaster:
     def __init__(self, manager: ScanManager, interval_seconds: float = 1.0) -> None:
@@ -21,6 +24,7 @@ class ProgressBroadcaster:
         self._latest_payload: Optional[str] = None
         self._stop = threading.Event()
         self._thread = threading.Thread(target=self._run, daemon=True)
+        manager.add_update_listener(self._publish_update)
 
     def start(self) -> None:
         if not self._thread.is_alive():
@@ -56,6 +60,19 @@ class ProgressBroadcaster:
         for queue, loop in subscribers:
             loop.call_soon_threadsafe(queue.put_nowait, payload)
 
+    def _publish_update(self, scan_id: str, folders: list[str]) -> None:
+        """Push a watch-mode update right away instead of waiting for the next tick."""
+        progress = self.manager.get_progress(scan_id)
+        event = {
+            "type": "scan_update",
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "scan_id": scan_id,
+            "folders": folders[:MAX_UPDATE_FOLDERS],
+            "folders_changed": len(folders),
+            "scan": json.loads(progress.json()),
+        }
+        self._broadcast(json.dumps(event))
+
     def _run(self) -> None:
         while not self._stop.is_set():
             payload = self._build_payload()
@@ -1,17 +1,19 @@
 from __future__ import annotations
 
-import fnmatch
-import hashlib
 import os
 import threading
+import time
 import uuid
 from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor
-from dataclasses import dataclass
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from itertools import islice
 from pathlib import Path
-from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from .cache import FileHashCache, FileCacheKey
+from .concurrency import ConcurrencyController
 from .domain import FolderInfo, GroupInfo
 from .models import (
     DirectoryFingerprint,
@@ -22,16 +24,61 @@ from .models import (
     FolderLabel,
     FolderRecord,
     GroupDiff,
+    HashBackend,
+    HashSchedule,
+    LocationTree,
     MismatchEntry,
+    MovedEntry,
     PairwiseSimilarity,
     ScanRequest,
     StructurePolicy,
+    WalkerEngine,
     WarningRecord,
     WarningType,
 )
+from .inodes import InodeSet
+from .hashing import (
+    DEFAULT_HASH_BATCH_SIZE,
+    DigestSpec,
+    HashOutcome,
+    HashWarning,
+    ProcessHashPool,
+    decode_chunks,
+    hash_file,
+    prefetch_file,
+    sample_file,
+)
+from .matcher import PathMatcher
+from .pipeline import PipelineStage, StageQueue
+from .scheduler import DeviceQueue, SizeQueue
+from .throttle import IOThrottle
+from .checkpoint import ScanCheckpoint
+from .snapshots import DirectorySnapshot, SnapshotStore, is_racy
+from .walker import (
+    DirectoryListing,
+    ErrorCallback,
+    FileItem,
+    Lister,
+    ParallelWalker,
+    iter_os_walk,
+    iter_scandir,
+    list_directory,
+)
+
+
+# Modes that read file contents; sampled mode falls back to full SHA-256.
+HASHING_MODES = (FileEqualityMode.SHA256, FileEqualityMode.SAMPLED, FileEqualityMode.CHUNKS)
+# Bounded queue slots per worker between pipeline stages.
+PIPELINE_QUEUE_DEPTH_PER_WORKER = 64
 
+# (owner folder, deepest folder holding every link or None, bytes) for a
+# multi-link inode a scan counted.
+HardlinkSite = Tuple[str, Optional[str], int]
 
-HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+def default_concurrency() -> int:
+    """Workers per scan when the request does not set ``concurrency``."""
+    return min(32, (os.cpu_count() or 4) * 2)
 
 
 def _to_folder_record(info: FolderInfo) -> FolderRecord:
@@ -41,15 +88,42 @@ def _to_folder_record(info: FolderInfo) -> FolderRecord:
         total_bytes=info.total_bytes,
         file_count=info.file_count,
         unstable=info.unstable,
+        hardlinked_bytes=info.hardlinked_bytes,
     )
 
 
+@dataclass
+class _PendingFolder:
+    """A listed folder whose files are still moving through the pipeline."""
+
+    path: Path
+    rel_dir: Path
+    pending: int = 0
+    sealed: bool = False
+    unstable: bool = False
+    files: List[FileRecord] = field(default_factory=list)
+    # Incremental rescans: the directory's metadata and subdirectories.
+    dir_stat: Optional[os.stat_result] = None
+    subdirs: List[str] = field(default_factory=list)
+    linked_inodes: List[Tuple[int, int]] = field(default_factory=list)
+    hardlink_sites: List[HardlinkSite] = field(default_factory=list)
+    rel_prefix: str = field(init=False)
+
+    def __post_init__(self) -> None:
+        # Files are joined onto this string instead of building a Path each.
+        self.rel_prefix = "" if self.rel_dir == Path(".") else f"{self.rel_dir.as_posix()}/"
+
+
 @dataclass
 class ScanResult:
     folders: Dict[str, FolderInfo]
     fingerprints: Dict[str, DirectoryFingerprint]
     warnings: List[WarningRecord]
     stats: Dict[str, int]
+    # Own (pre-aggregation) fingerprints, kept only for watched scans.
+    folder_fingerprints: Dict[str, DirectoryFingerprint] = field(default_factory=dict)
+    # Left for whoever aggregates a scan run with ``aggregate=False``.
+    hardlink_sites: List[HardlinkSite] = field(default_factory=list)
 
 
 class FolderScanner:
@@ -61,118 +135,894 @@ class FolderScanner:
         meta_sink: Optional[Dict[str, str]] = None,
         phase_callback: Optional[Callable[[str], None]] = None,
         stop_event: Optional["threading.Event"] = None,
+        snapshots: Optional[SnapshotStore] = None,
+        checkpoint: Optional[ScanCheckpoint] = None,
+        throttle: Optional[IOThrottle] = None,
     ) -> None:
         self.request = request
         self.cache = cache
+        self._matcher = PathMatcher(request.include, request.exclude)
+        self._digest_spec = DigestSpec(
+            algorithm=request.hash_algorithm.value,
+            digest_size=request.digest_size,
+            strategy=request.hash_strategy.value,
+            low_footprint=request.low_footprint_io,
+            prefetch=request.prefetch_next,
+            tree_threshold=request.tree_hash_threshold,
+            tree_leaf_size=request.tree_leaf_size,
+            chunk_avg_size=(
+                request.chunk_avg_size if request.file_equality == FileEqualityMode.CHUNKS else None
+            ),
+        )
         self._stats_sink = stats_sink
         self._meta_sink = meta_sink
         self._phase_callback = phase_callback
         self._stop_event = stop_event
         self._warnings: List[WarningRecord] = []
         self._stats: Dict[str, int] = defaultdict(int)
-        self._seen_inodes: Set[Tuple[int, int]] = set()
+        self._seen_inodes = InodeSet()
+        self._hardlink_sites: List[HardlinkSite] = []
+        # (device, inode) -> (links seen, link count, bytes) for inodes
+        # with links this scan did not see.
+        self._outside_links: Dict[Tuple[int, int], Tuple[int, int, int]] = {}
         self._lock = threading.RLock()
+        self._failure: Optional[BaseException] = None
+        self._finished: List[Tuple[Tuple[str, ...], DirectoryFingerprint]] = []
+        self._linked_files: List[Tuple[_PendingFolder, Path, str, os.stat_result]] = []
+        self._deferred_files: List[Tuple[_PendingFolder, Path, str, os.stat_result]] = []
+        self._collision_index: Dict[Tuple[str, int], int] = defaultdict(int)
+        # Content policy: one shared string per distinct identity, however
+        # many files and folders carry it.
+        self._digest_index: Dict[str, str] = {}
+        self._rel_base: Optional[Path] = None
+        self._recursive = True
+        self._stat_gate: Optional[ConcurrencyController] = None
+        self._hash_gate: Optional[ConcurrencyController] = None
+        # Multi-root scans hand every root the same throttle.
+        self._throttle = throttle if throttle is not None else new_throttle(request, stop_event, self._set_stat)
+        self._snapshot_store = snapshots if request.incremental else None
+        self._previous_snapshots: Dict[str, DirectorySnapshot] = {}
+        self._snapshots: Dict[str, DirectorySnapshot] = {}
+        self._scan_started_ns = time.time_ns()
+        self._checkpoint = checkpoint
+        # Folders discovered but not yet finished, written with checkpoints.
+        self._frontier: Set[str] = set()
         self._set_stat("files_scanned", 0)
         self._set_stat("folders_scanned", 0)
         self._set_stat("folders_discovered", 1)
         self._set_stat("bytes_scanned", 0)
 
-    def scan(self) -> ScanResult:
+    def scan(
+        self,
+        subtree: Optional[str] = None,
+        recursive: bool = True,
+        path: Optional[Path] = None,
+        aggregate: bool = True,
+    ) -> ScanResult:
+        """Walk, stat and hash the tree as a three-stage pipeline.
+
+        The calling thread is the walker stage. It feeds a bounded stat
+        queue, whose workers forward cache misses to a bounded hash queue
+        in ``sha256`` mode. A folder is finalized by whichever worker
+        completes its last file, so one slow file no longer holds up the
+        walk and listing overlaps with hashing.
+
+        ``subtree`` limits the walk to one folder below the root; paths,
+        include/exclude matching and fingerprint keys stay relative to the
+        root. With ``recursive=False`` only that folder's own files are
+        scanned. ``path`` walks another directory in place of the subtree,
+        such as the same share mounted elsewhere on a worker node. With
+        ``aggregate=False`` the result holds each folder's own fingerprint.
+        """
         root = self.request.root_path
-        folders: Dict[str, FolderInfo] = {}
-        fingerprints: Dict[str, DirectoryFingerprint] = {}
+        if subtree is not None and subtree != ".":
+            self._rel_base = Path(subtree)
+            root = root / subtree
+        if path is not None:
+            root = path
+        if self._snapshot_store is not None:
+            self._previous_snapshots = self._snapshot_store.load()
+        if self._checkpoint is not None:
+            restored = self._checkpoint.load()
+            self._previous_snapshots.update(restored)
+            if restored:
+                self._set_stat("checkpoint_folders_restored", len(restored))
+        self._recursive = recursive
+        self._frontier = {(self._rel_base or Path(".")).as_posix()}
 
         if not root.is_dir():
             raise FileNotFoundError(f"Root path {root} is not a directory")
 
-        max_workers = self.request.concurrency or min(32, (os.cpu_count() or 4) * 2)
+        max_workers = self.request.concurrency or default_concurrency()
         self._set_stat("workers", max_workers)
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            for dirpath, dirnames, filenames in os.walk(root):
-                if self._stop_event is not None and self._stop_event.is_set():
-                    break
-                current = Path(dirpath)
-                if getattr(self, "_meta_sink", None) is not None:
-                    self._meta_sink["last_path"] = str(current)
-                rel_dir = current.relative_to(root)
-                if self._is_excluded(rel_dir):
-                    dirnames[:] = []
-                    continue
-
-                filtered_dirnames: List[str] = []
-                for dirname in dirnames:
-                    rel_child = rel_dir / dirname
-                    if self._is_excluded(rel_child):
-                        continue
-                    filtered_dirnames.append(dirname)
-                dirnames[:] = filtered_dirnames
-                if filtered_dirnames:
-                    self._increment_stat("folders_discovered", len(filtered_dirnames))
-
-                files: List[FileRecord] = []
-                total_size = 0
-                unstable = False
-                futures = []
-                for filename in filenames:
-                    if self._stop_event is not None and self._stop_event.is_set():
-                        break
-                    if getattr(self, "_meta_sink", None) is not None:
-                        self._meta_sink["last_path"] = str(current / filename)
-                    futures.append(executor.submit(self._process_file, current, filename, rel_dir))
-                for future in futures:
-                    record, file_unstable = future.result()
-                    if file_unstable:
-                        unstable = True
-                    if record:
-                        files.append(record)
-                        total_size += record.size
-
-                folder_record = FolderInfo(
-                    path=str(current),
-                    relative_path=rel_dir.as_posix() if rel_dir != Path(".") else ".",
-                    total_bytes=total_size,
-                    file_count=len(files),
-                    unstable=unstable,
+        capacity = max_workers * PIPELINE_QUEUE_DEPTH_PER_WORKER
+        hashing = self.request.file_equality in HASHING_MODES
+        process_hashing = hashing and self.request.hash_backend == HashBackend.PROCESS
+        stage_threads = max_workers
+        if self.request.adaptive_concurrency:
+            # Stages get enough threads for the largest limit; the gates
+            # decide how many of them touch the filesystem at once.
+            stage_threads = max(max_workers, self.request.max_concurrency)
+            self._stat_gate = self._new_gate("stat", max_workers)
+            if hashing and not process_hashing:
+                self._hash_gate = self._new_gate("hash", max_workers)
+        self._set_stat("stat_concurrency", max_workers)
+
+        hash_stage: Optional[PipelineStage] = None
+        hash_pool: Optional[ProcessHashPool] = None
+        hash_queue: Optional[StageQueue] = None
+        if hashing:
+            hash_queue = self._new_hash_queue(capacity)
+            if process_hashing:
+                hash_pool = ProcessHashPool(self.request.hash_processes or os.cpu_count() or 4)
+                self._set_stat("hash_processes", hash_pool.processes)
+                self._set_stat("hash_concurrency", hash_pool.processes)
+                pool = hash_pool
+                # One dispatcher thread per process keeps every process busy
+                # while the threads themselves mostly wait on results.
+                hash_stage = PipelineStage(
+                    "hash",
+                    lambda batch: self._run_hash_batch(batch, pool),
+                    pool.processes,
+                    capacity,
+                    self._stage_failed,
+                    batch_size=DEFAULT_HASH_BATCH_SIZE,
+                    stage_queue=hash_queue,
+                )
+            else:
+                self._set_stat("hash_concurrency", max_workers)
+                hash_stage = PipelineStage(
+                    "hash",
+                    lambda item: self._run_hash_stage(item, hash_stage),
+                    stage_threads,
+                    capacity,
+                    self._stage_failed,
+                    stage_queue=hash_queue,
                 )
-                folder_key = folder_record.relative_path
-                folders[folder_key] = folder_record
-                fingerprint = self._build_fingerprint(folder_record, files)
-                fingerprints[folder_key] = fingerprint
-                self._set_stat("folders_scanned", len(folders))
+        stat_stage = PipelineStage(
+            "stat",
+            lambda item: self._run_stat_stage(item, hash_stage),
+            stage_threads,
+            capacity,
+            self._stage_failed,
+        )
+        stat_stage.start()
+        if hash_stage is not None:
+            hash_stage.start()
+        try:
+            self._run_walk_stage(root, stat_stage)
+        finally:
+            stat_stage.close()
+            stat_stage.join()
+            self._resolve_linked_files(hash_stage)
+            self._resolve_deferred_files(hash_stage)
+            if hash_stage is not None:
+                hash_stage.close()
+                hash_stage.join()
+            if hash_pool is not None:
+                hash_pool.shutdown()
+            if isinstance(hash_queue, DeviceQueue):
+                self._set_stat("hash_devices", hash_queue.devices)
+            if hash_queue is not None:
+                self._set_stat("hash_tail_ms", int(hash_queue.tail_seconds * 1000))
+        if self._failure is not None:
+            raise self._failure
+        if self._checkpoint is not None and not self._should_stop():
+            # Everything walked so far survives a crash in the later phases.
+            self._checkpoint.flush(self._pending_folders)
+            self._report_checkpoint()
+
+        folders: Dict[str, FolderInfo] = {}
+        fingerprints: Dict[str, DirectoryFingerprint] = {}
+        # Walker threads finish folders in arbitrary order; sorting by path
+        # parts gives a stable pre-order independent of timing.
+        for _order, fingerprint in sorted(self._finished, key=lambda item: item[0]):
+            folder_key = fingerprint.folder.relative_path
+            folders[folder_key] = fingerprint.folder
+            fingerprints[folder_key] = fingerprint
+        self._finished = []
+        if self._snapshot_store is not None and not self._should_stop():
+            # Aggregation rewrites folder totals in place, so per-folder
+            # results are saved first.
+            self._snapshot_store.save(self._snapshots, replace=self._rel_base is None)
+            self._snapshots = {}
+        self._previous_snapshots = {}
 
         self._stats["folders_scanned"] = len(folders)
+        if not aggregate:
+            sites, self._hardlink_sites = self._hardlink_sites, []
+            return ScanResult(
+                folders=folders,
+                fingerprints=fingerprints,
+                warnings=self._warnings,
+                stats=dict(self._stats),
+                hardlink_sites=sites,
+            )
         if getattr(self, "_meta_sink", None) is not None:
             self._meta_sink["phase"] = "aggregating"
         if self._phase_callback:
             self._phase_callback("aggregating")
-        fingerprints = aggregate_fingerprints(fingerprints, self._stats, self._meta_sink)
+        folder_fingerprints = dict(fingerprints) if self.request.watch else {}
+        fingerprints = aggregate_fingerprints(
+            fingerprints,
+            self._stats,
+            self._meta_sink,
+            content_only=self.request.structure_policy == StructurePolicy.CONTENT,
+        )
+        self._account_hardlinks(folders)
         return ScanResult(
             folders=folders,
             fingerprints=fingerprints,
             warnings=self._warnings,
             stats=dict(self._stats),
+            folder_fingerprints=folder_fingerprints,
+        )
+
+    def _new_hash_queue(self, capacity: int) -> StageQueue:
+        if self.request.hash_schedule == HashSchedule.DEVICE:
+            return DeviceQueue(
+                capacity,
+                self.request.per_device_concurrency,
+                lambda item: (int(item[3].st_dev), int(item[3].st_ino)),
+            )
+        if self.request.hash_schedule == HashSchedule.LARGEST_FIRST:
+            return SizeQueue(capacity, lambda item: int(item[3].st_size))
+        return StageQueue(capacity)
+
+    def _throttle_operation(self) -> None:
+        if self._throttle is not None:
+            self._throttle.prepare_thread()
+            self._throttle.operation()
+
+    def _new_gate(self, name: str, initial: int) -> ConcurrencyController:
+        return ConcurrencyController(
+            name,
+            initial,
+            minimum=1,
+            maximum=self.request.max_concurrency,
+            on_change=self._concurrency_changed,
+        )
+
+    def _concurrency_changed(self, name: str, limit: int, throughput: float, latency: float) -> None:
+        self._set_stat(f"{name}_concurrency", limit)
+        self._set_stat(f"{name}_throughput_per_second", int(throughput))
+        self._set_stat(f"{name}_latency_us", int(latency * 1_000_000))
+
+    @staticmethod
+    def _slot(gate: Optional[ConcurrencyController], nbytes: int = 0):
+        return gate.slot(nbytes) if gate is not None else nullcontext()
+
+    def _should_stop(self) -> bool:
+        if self._failure is not None:
+            return True
+        return self._stop_event is not None and self._stop_event.is_set()
+
+    def _stage_failed(self, exc: BaseException) -> None:
+        with self._lock:
+            if self._failure is None:
+                self._failure = exc
+
+    def _run_walk_stage(self, root: Path, stat_stage: PipelineStage) -> None:
+        if self.request.walker == WalkerEngine.PARALLEL:
+            workers = self.request.traversal_workers or self._stats["workers"]
+            self._set_stat("traversal_workers", workers)
+            walker = ParallelWalker(
+                root, workers, self._stop_event, on_error=self._listing_error, lister=self._lister()
+            )
+            walker.run(lambda listing: self._visit_listing(listing, stat_stage))
+            return
+        for listing in self._iter_listings(root):
+            if self._should_stop():
+                break
+            self._visit_listing(listing, stat_stage)
+
+    def _visit_listing(self, listing: DirectoryListing, stat_stage: PipelineStage) -> None:
+        """Prune one listed directory and queue its files; may run on several walker threads."""
+        if self._should_stop():
+            listing.subdirs[:] = []
+            return
+        current = listing.path
+        if getattr(self, "_meta_sink", None) is not None:
+            self._meta_sink["last_path"] = str(current)
+        rel_dir = listing.rel_dir if self._rel_base is None else self._rel_base / listing.rel_dir
+        if self._is_excluded(rel_dir):
+            listing.subdirs[:] = []
+            return
+
+        folder = _PendingFolder(
+            path=current,
+            rel_dir=rel_dir,
+            dir_stat=listing.stat,
+            subdirs=list(listing.subdirs),
+        )
+        filtered_dirnames: List[str] = []
+        pruned_dirnames: List[str] = []
+        for dirname in listing.subdirs:
+            rel_child = folder.rel_prefix + dirname
+            if self._matcher.is_excluded(rel_child):
+                continue
+            if self._matcher.prunes_subtree(rel_child):
+                pruned_dirnames.append(dirname)
+                continue
+            if self._recursive:
+                filtered_dirnames.append(dirname)
+        # Non-recursive scans still record pruned children, which cost no
+        # listing, so their parent's entry is complete.
+        listing.subdirs[:] = filtered_dirnames
+        if self._checkpoint is not None:
+            with self._lock:
+                self._frontier.update(folder.rel_prefix + dirname for dirname in filtered_dirnames)
+        discovered = len(filtered_dirnames) + len(pruned_dirnames)
+        if discovered:
+            self._increment_stat("folders_discovered", discovered)
+        for dirname in pruned_dirnames:
+            # Everything below is excluded, so the folder is known to be
+            # empty without listing it.
+            self._increment_stat("subtrees_pruned")
+            self._seal_folder(_PendingFolder(path=current / dirname, rel_dir=rel_dir / dirname))
+
+        if listing.snapshot is not None:
+            self._reuse_snapshot(rel_dir, listing.snapshot)
+            return
+        for item in listing.files:
+            if self._should_stop():
+                break
+            if getattr(self, "_meta_sink", None) is not None:
+                self._meta_sink["last_path"] = str(current / item) if isinstance(item, str) else item.path
+            with self._lock:
+                folder.pending += 1
+            stat_stage.put((folder, item))
+        self._seal_folder(folder)
+
+    def linked_inodes(self) -> Set[Tuple[int, int]]:
+        """Multi-link inodes this scan counted, so merged scans can spot links between them."""
+        with self._lock:
+            return set(self._seen_inodes)
+
+    def outside_links(self) -> Dict[Tuple[int, int], Tuple[int, int, int]]:
+        """``(links seen, link count, bytes)`` of counted inodes with links this scan did not see."""
+        with self._lock:
+            return dict(self._outside_links)
+
+    def hash_fingerprint(self, fingerprint: DirectoryFingerprint) -> DirectoryFingerprint:
+        """Re-derive an aggregated name/size fingerprint from file contents.
+
+        Each identity names a file below ``fingerprint.folder``, so the files
+        the scan already counted are hashed (through the cache) without
+        listing any directory again. The result shares the folder's
+        ``FolderInfo``; files that vanished or changed meanwhile are left
+        out and reported as warnings.
+        """
+        base = Path(fingerprint.folder.path)
+        case_insensitive = self.request.force_case_insensitive
+        content_only = self.request.structure_policy == StructurePolicy.CONTENT
+
+        def _digest(identity: str) -> Optional[Tuple[str, int]]:
+            if self._should_stop():
+                return None
+            rel = Path(_identity_to_path(identity))
+            path = _locate(base, rel) if case_insensitive else base / rel
+            try:
+                if path is None:
+                    raise FileNotFoundError(f"{base / rel} no longer exists")
+                stat = os.lstat(path)
+            except OSError as exc:
+                self._add_warning(WarningRecord(path=base / rel, type=WarningType.IO_ERROR, message=str(exc)))
+                return None
+            record = self._build_file_record(path, rel.as_posix(), stat)
+            if record is None:
+                return None
+            own = self._file_identity(Path(rel.name), record)
+            return _prefix_identity(rel.parent, own, content_only), record.size
+
+        weights: Dict[str, int] = defaultdict(int)
+        workers = self.request.concurrency or default_concurrency()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="xfs-verify") as pool:
+            for outcome in pool.map(_digest, list(fingerprint.file_weights)):
+                if outcome is not None:
+                    weights[outcome[0]] += outcome[1]
+        return DirectoryFingerprint(folder=fingerprint.folder, file_weights=dict(weights))
+
+    def warnings(self) -> List[WarningRecord]:
+        with self._lock:
+            return list(self._warnings)
+
+    def _reuses_folders(self) -> bool:
+        return self._snapshot_store is not None or self._checkpoint is not None
+
+    def _lister(self) -> Optional[Lister]:
+        return self._list_or_reuse if self._reuses_folders() else None
+
+    def _pending_folders(self) -> List[str]:
+        with self._lock:
+            return list(self._frontier)
+
+    def _report_checkpoint(self) -> None:
+        checkpoint = self._checkpoint
+        if checkpoint is None:
+            return
+        self._set_stat("checkpoints_written", checkpoint.checkpoints_written)
+        self._set_stat("checkpoint_ms", int(checkpoint.seconds * 1000))
+        self._set_stat("checkpoint_bytes", checkpoint.bytes_written)
+
+    def _list_or_reuse(
+        self,
+        current: Path,
+        rel_dir: Path,
+        on_error: Optional[ErrorCallback] = None,
+    ) -> Optional[DirectoryListing]:
+        """List ``current`` unless its stored snapshot is still current.
+
+        The directory is stat'ed before it is listed, so a change that
+        lands during the listing leaves an older mtime in the new snapshot
+        and is caught by the next scan.
+        """
+        try:
+            stat = os.stat(current)
+        except OSError:
+            return list_directory(current, rel_dir, on_error)
+        key = (rel_dir if self._rel_base is None else self._rel_base / rel_dir).as_posix()
+        snapshot = self._previous_snapshots.get(key)
+        if snapshot is not None and snapshot.matches(stat):
+            return DirectoryListing(
+                path=current,
+                rel_dir=rel_dir,
+                subdirs=list(snapshot.subdirs),
+                files=[],
+                stat=stat,
+                snapshot=snapshot,
+            )
+        listing = list_directory(current, rel_dir, on_error)
+        if listing is not None:
+            listing.stat = stat
+        return listing
+
+    def _reuse_snapshot(self, rel_dir: Path, snapshot: DirectorySnapshot) -> None:
+        folder = snapshot.fingerprint.folder
+        key = rel_dir.as_posix()
+        with self._lock:
+            self._finished.append((rel_dir.parts, snapshot.fingerprint))
+            self._seen_inodes.update(snapshot.linked_inodes)
+            self._hardlink_sites.extend(snapshot.hardlink_sites)
+            if self._snapshot_store is not None:
+                self._snapshots[key] = snapshot
+            self._frontier.discard(key)
+            count = len(self._finished)
+        if self._checkpoint is not None:
+            self._checkpoint.add(key, snapshot)
+        self._increment_stat("folders_reused")
+        self._increment_stat("files_reused", folder.file_count)
+        self._increment_stat("bytes_reused", folder.total_bytes)
+        self._set_stat("folders_scanned", count)
+
+    def _run_stat_stage(self, item: Tuple["_PendingFolder", FileItem], hash_stage: Optional[PipelineStage]) -> None:
+        folder, entry = item
+        record: Optional[FileRecord] = None
+        handed_off = False
+        try:
+            if self._should_stop():
+                return
+            self._throttle_operation()
+            with self._slot(self._stat_gate):
+                if isinstance(entry, str):
+                    located = self._stat_file(folder.path, entry, folder.rel_prefix)
+                else:
+                    located = self._stat_entry(entry, folder.rel_prefix)
+            if located is None:
+                return
+            file_path, rel_path, stat = located
+            if stat.st_nlink > 1:
+                # Which link owns a shared inode must not depend on worker
+                # timing, so multi-link files wait for the walk to finish.
+                with self._lock:
+                    self._linked_files.append((folder, file_path, rel_path, stat))
+                handed_off = True
+                return
+            handed_off, record = self._dispatch_file(folder, file_path, rel_path, stat, hash_stage)
+        except BaseException as exc:  # pylint: disable=broad-except
+            self._stage_failed(exc)
+        finally:
+            if not handed_off:
+                self._finish_file(folder, record, False)
+
+    def _dispatch_file(
+        self,
+        folder: "_PendingFolder",
+        file_path: Path,
+        rel_path: str,
+        stat: os.stat_result,
+        hash_stage: Optional[PipelineStage],
+    ) -> Tuple[bool, Optional[FileRecord]]:
+        """Return ``(handed_off, record)`` for a file that passed the stat stage."""
+        cached: Optional[str] = None
+        if self.request.file_equality in HASHING_MODES:
+            if self._defers_hashing():
+                with self._lock:
+                    self._deferred_files.append((folder, file_path, rel_path, stat))
+                    self._collision_index[self._collision_key(rel_path, stat.st_size)] += 1
+                return True, None
+            cached = self._lookup_cache(stat, stat.st_size, stat.st_mtime)
+            if not cached and hash_stage is not None:
+                hash_stage.put((folder, file_path, rel_path, stat))
+                return True, None
+        return False, self._make_record(file_path, rel_path, stat, cached)
+
+    def _defers_hashing(self) -> bool:
+        mode = self.request.file_equality
+        return mode == FileEqualityMode.SAMPLED or (
+            self.request.lazy_hashing and mode in (FileEqualityMode.SHA256, FileEqualityMode.CHUNKS)
+        )
+
+    def _resolve_linked_files(self, hash_stage: Optional[PipelineStage]) -> None:
+        """Collapse hard links by ``(device, inode)``, keeping the first in path order.
+
+        The other links are counted as ``files_hardlinked`` /
+        ``bytes_hardlinked``: deleting them frees nothing. Where every link
+        lies, decides which folders' deletion would free the kept one; see
+        :func:`account_hardlinks`.
+        """
+        with self._lock:
+            linked = self._linked_files
+            self._linked_files = []
+        linked.sort(key=lambda item: (item[0].rel_dir.parts, item[2]))
+        keeps_inodes = self._reuses_folders()
+        # (device, inode) -> [owner folder, folders of all links, size, link count]
+        sites: Dict[Tuple[int, int], list] = {}
+        # Owners held open until their sites are known, so the snapshot each
+        # folder leaves behind records them.
+        held: List[_PendingFolder] = []
+        for folder, file_path, rel_path, stat in linked:
+            record: Optional[FileRecord] = None
+            handed_off = False
+            try:
+                if self._should_stop():
+                    continue
+                inode_key = (stat.st_dev, stat.st_ino)
+                folder_key = folder.rel_dir.as_posix()
+                site = sites.get(inode_key)
+                if site is not None:
+                    site[1].append(folder_key)
+                if not self._seen_inodes.add(stat.st_dev, stat.st_ino):
+                    self._increment_stat("files_hardlinked")
+                    self._increment_stat("bytes_hardlinked", stat.st_size)
+                    continue
+                sites[inode_key] = [folder, [folder_key], stat.st_size, stat.st_nlink]
+                if keeps_inodes:
+                    folder.linked_inodes.append(inode_key)
+                    with self._lock:
+                        folder.pending += 1
+                    held.append(folder)
+                handed_off, record = self._dispatch_file(folder, file_path, rel_path, stat, hash_stage)
+            except BaseException as exc:  # pylint: disable=broad-except
+                self._stage_failed(exc)
+            finally:
+                if not handed_off:
+                    self._finish_file(folder, record, False)
+        try:
+            for inode_key, (owner, link_folders, size, nlink) in sites.items():
+                # Links outside the scan (or filtered out of it) keep the inode
+                # alive whatever is deleted here.
+                if len(link_folders) >= nlink:
+                    common: Optional[str] = _common_folder(link_folders)
+                else:
+                    common = None
+                    self._outside_links[inode_key] = (len(link_folders), nlink, size)
+                site = (owner.rel_dir.as_posix(), common, size)
+                self._hardlink_sites.append(site)
+                if keeps_inodes:
+                    owner.hardlink_sites.append(site)
+        finally:
+            for folder in held:
+                self._finish_file(folder, None, False)
+
+    def _account_hardlinks(self, folders: Dict[str, FolderInfo]) -> None:
+        account_hardlinks(folders, self._hardlink_sites)
+        self._hardlink_sites = []
+
+    def _resolve_deferred_files(self, hash_stage: Optional[PipelineStage]) -> None:
+        """Second pass of lazy hashing, once every file's metadata is known.
+
+        A file can only share an identity with another file if both have
+        the same name and size, because every identity ``_file_identity``
+        produces (relative or bag-of-files, at any aggregation level) ends
+        in the basename. Files whose ``(name, size)`` is unique in the scan
+        keep a ``name:size`` identity and are never read. In ``chunks``
+        mode only the name must match, since chunk identities do not carry
+        the file size. In ``sampled`` mode the remaining files go through
+        :meth:`_resolve_samples`.
+        """
+        with self._lock:
+            deferred = self._deferred_files
+            self._deferred_files = []
+        sampled = self.request.file_equality == FileEqualityMode.SAMPLED
+        candidates: List[Tuple[_PendingFolder, Path, str, os.stat_result]] = []
+        for item in deferred:
+            folder, file_path, rel_path, stat = item
+            record: Optional[FileRecord] = None
+            handed_off = False
+            try:
+                if self._should_stop():
+                    continue
+                if self._collision_index[self._collision_key(rel_path, stat.st_size)] < 2:
+                    self._increment_stat("files_hash_skipped")
+                    self._increment_stat("bytes_hash_skipped", stat.st_size)
+                    record = self._make_record(file_path, rel_path, stat, None)
+                    continue
+                if sampled:
+                    candidates.append(item)
+                    handed_off = True
+                    continue
+                cached = self._lookup_cache(stat, stat.st_size, stat.st_mtime)
+                if not cached and hash_stage is not None:
+                    hash_stage.put((folder, file_path, rel_path, stat))
+                    handed_off = True
+                    continue
+                record = self._make_record(file_path, rel_path, stat, cached)
+            except BaseException as exc:  # pylint: disable=broad-except
+                self._stage_failed(exc)
+            finally:
+                if not handed_off:
+                    self._finish_file(folder, record, False)
+        self._collision_index.clear()
+        if candidates:
+            self._resolve_samples(candidates, hash_stage)
+
+    def _resolve_samples(
+        self,
+        candidates: List[Tuple["_PendingFolder", Path, str, os.stat_result]],
+        hash_stage: Optional[PipelineStage],
+    ) -> None:
+        """Third pass of ``sampled`` mode.
+
+        Every name/size collision gets a head/middle/tail block digest.
+        Only files whose sample still matches another file's are hashed in
+        full (when ``sampled_full_hash`` is on); the rest keep a ``#s:``
+        sample identity, which is already enough to tell them apart.
+        """
+        outcomes: Dict[int, HashOutcome] = {}
+
+        def _sample(entry: Tuple[int, Tuple["_PendingFolder", Path, str, os.stat_result]]) -> None:
+            index, (_folder, file_path, _rel_path, stat) = entry
+            if self._should_stop():
+                return
+            self._throttle_operation()
+            outcomes[index] = sample_file(
+                str(file_path),
+                stat.st_size,
+                stat.st_mtime,
+                self._digest_spec,
+                on_read=self._throttle.read if self._throttle is not None else None,
+            )
+
+        workers = self._stats["workers"]
+        sample_stage = PipelineStage(
+            "sample", _sample, workers, workers * PIPELINE_QUEUE_DEPTH_PER_WORKER, self._stage_failed
+        )
+        sample_stage.start()
+        try:
+            for entry in enumerate(candidates):
+                if self._should_stop():
+                    break
+                sample_stage.put(entry)
+        finally:
+            sample_stage.close()
+            sample_stage.join()
+
+        matches: Dict[Tuple[str, int, str], int] = defaultdict(int)
+        for index, (_folder, _file_path, rel_path, stat) in enumerate(candidates):
+            outcome = outcomes.get(index)
+            if outcome is not None and outcome.sampled and outcome.digest:
+                matches[(*self._collision_key(rel_path, stat.st_size), outcome.digest)] += 1
+
+        for index, (folder, file_path, rel_path, stat) in enumerate(candidates):
+            record: Optional[FileRecord] = None
+            unstable = False
+            handed_off = False
+            try:
+                outcome = outcomes.get(index)
+                if outcome is None:
+                    continue
+                self._add_hash_warnings(file_path, outcome.warnings)
+                self._increment_stat("bytes_hashed", outcome.bytes_read)
+                if not outcome.sampled:
+                    # Small enough to have been read in full already.
+                    record = self._accept_digest(file_path, rel_path, stat, outcome.digest, outcome.stable)
+                    unstable = record is None
+                    continue
+                if not outcome.stable:
+                    unstable = True
+                    continue
+                self._increment_stat("files_sampled")
+                key = (*self._collision_key(rel_path, stat.st_size), outcome.digest)
+                if self.request.sampled_full_hash and matches[key] > 1:
+                    cached = self._lookup_cache(stat, stat.st_size, stat.st_mtime)
+                    if cached:
+                        record = self._make_record(file_path, rel_path, stat, cached)
+                    elif hash_stage is not None:
+                        hash_stage.put((folder, file_path, rel_path, stat))
+                        handed_off = True
+                    continue
+                record = self._make_record(file_path, rel_path, stat, None, sample_digest=outcome.digest)
+            except BaseException as exc:  # pylint: disable=broad-except
+                self._stage_failed(exc)
+            finally:
+                if not handed_off:
+                    self._finish_file(folder, record, unstable)
+
+    def _collision_key(self, rel_path: str, size: int) -> Tuple[str, int]:
+        if self.request.file_equality == FileEqualityMode.CHUNKS:
+            # Chunks of same-named files are worth comparing whatever their
+            # sizes; a file whose name is unique can share no chunk identity.
+            size = 0
+        if self.request.structure_policy == StructurePolicy.CONTENT:
+            # Names do not matter when identities ignore them.
+            return "", size
+        name = rel_path.rsplit("/", 1)[-1]
+        if self.request.force_case_insensitive:
+            name = name.lower()
+        return name, size
+
+    def _run_hash_stage(
+        self,
+        item: Tuple["_PendingFolder", Path, str, os.stat_result],
+        stage: Optional[PipelineStage] = None,
+    ) -> None:
+        folder, file_path, rel_path, stat = item
+        record: Optional[FileRecord] = None
+        unstable = False
+        try:
+            if self._should_stop():
+                return
+            if self._digest_spec.prefetch and stage is not None:
+                upcoming = stage.peek()
+                if upcoming is not None:
+                    prefetch_file(str(upcoming[1]), self._digest_spec)
+            with self._slot(self._hash_gate, stat.st_size):
+                record = self._build_file_record(file_path, rel_path, stat, check_cache=False)
+            unstable = record is None
+        except BaseException as exc:  # pylint: disable=broad-except
+            self._stage_failed(exc)
+        finally:
+            self._finish_file(folder, record, unstable)
+
+    def _run_hash_batch(
+        self,
+        items: List[Tuple["_PendingFolder", Path, str, os.stat_result]],
+        pool: ProcessHashPool,
+    ) -> None:
+        """Process-backend hash stage: one round trip to a worker per batch."""
+        outcomes = []
+        if not self._should_stop():
+            jobs = [(str(file_path), stat.st_size, stat.st_mtime) for _folder, file_path, _rel, stat in items]
+            if self._throttle is not None:
+                # Worker processes cannot share the buckets, so the whole
+                # batch is charged up front.
+                for _folder, _file_path, _rel, stat in items:
+                    self._throttle_operation()
+                    self._throttle.read(stat.st_size)
+            try:
+                outcomes = pool.submit(jobs, self._digest_spec).result()
+            except BaseException as exc:  # pylint: disable=broad-except
+                self._stage_failed(exc)
+        for index, (folder, file_path, rel_path, stat) in enumerate(items):
+            record: Optional[FileRecord] = None
+            unstable = False
+            try:
+                if index < len(outcomes):
+                    outcome = outcomes[index]
+                    self._add_hash_warnings(file_path, outcome.warnings)
+                    self._increment_stat("bytes_hashed", outcome.bytes_read)
+                    record = self._accept_digest(file_path, rel_path, stat, outcome.digest, outcome.stable)
+                    unstable = record is None
+            except BaseException as exc:  # pylint: disable=broad-except
+                self._stage_failed(exc)
+            finally:
+                self._finish_file(folder, record, unstable)
+
+    def _seal_folder(self, folder: "_PendingFolder") -> None:
+        with self._lock:
+            folder.sealed = True
+            ready = folder.pending == 0
+        if ready:
+            self._finalize_folder(folder)
+
+    def _finish_file(self, folder: "_PendingFolder", record: Optional[FileRecord], unstable: bool) -> None:
+        if record is not None:
+            self._increment_stat("files_scanned")
+            self._increment_stat("bytes_scanned", record.size)
+        with self._lock:
+            if record is not None:
+                folder.files.append(record)
+            if unstable:
+                folder.unstable = True
+            folder.pending -= 1
+            ready = folder.sealed and folder.pending == 0
+        if ready:
+            self._finalize_folder(folder)
+
+    def _finalize_folder(self, folder: "_PendingFolder") -> None:
+        # Keep the file order inside a folder stable regardless of which
+        # worker finished first.
+        files = sorted(folder.files, key=lambda record: record.relative_path)
+        folder_record = FolderInfo(
+            path=str(folder.path),
+            relative_path=folder.rel_dir.as_posix() if folder.rel_dir != Path(".") else ".",
+            total_bytes=sum(record.size for record in files),
+            file_count=len(files),
+            unstable=folder.unstable,
+        )
+        fingerprint = self._build_fingerprint(folder_record, files)
+        folder.files = []
+        snapshot = self._snapshot_for(folder, fingerprint)
+        key = folder.rel_dir.as_posix()
+        with self._lock:
+            self._finished.append((folder.rel_dir.parts, fingerprint))
+            if snapshot is not None and self._snapshot_store is not None:
+                # Only incremental scans save them; checkpoints keep their own.
+                self._snapshots[key] = snapshot
+            self._frontier.discard(key)
+            count = len(self._finished)
+        self._set_stat("folders_scanned", count)
+        if self._checkpoint is not None and not self._should_stop():
+            if snapshot is not None:
+                self._checkpoint.add(key, snapshot)
+            if self._checkpoint.maybe_flush(self._pending_folders):
+                self._report_checkpoint()
+
+    def _snapshot_for(self, folder: "_PendingFolder", fingerprint: DirectoryFingerprint) -> Optional[DirectorySnapshot]:
+        stat = folder.dir_stat
+        if not self._reuses_folders() or stat is None or folder.unstable:
+            return None
+        if is_racy(stat, self._scan_started_ns):
+            self._increment_stat("folders_racy")
+            return None
+        return DirectorySnapshot(
+            device=stat.st_dev,
+            inode=stat.st_ino,
+            mtime_ns=stat.st_mtime_ns,
+            ctime_ns=stat.st_ctime_ns,
+            subdirs=folder.subdirs,
+            fingerprint=fingerprint,
+            linked_inodes=folder.linked_inodes,
+            hardlink_sites=folder.hardlink_sites,
+        )
+
+    def _iter_listings(self, root: Path) -> Iterator[DirectoryListing]:
+        if self.request.walker == WalkerEngine.SCANDIR or self._reuses_folders():
+            # os.walk lists internally, so incremental rescans use the
+            # equivalent scandir walk to decide per directory.
+            return iter_scandir(root, self._stop_event, on_error=self._listing_error, lister=self._lister())
+        return iter_os_walk(root, self._stop_event)
+
+    def _listing_error(self, path: Path, exc: OSError) -> None:
+        if isinstance(exc, PermissionError):
+            self._add_warning(
+                WarningRecord(
+                    path=path,
+                    type=WarningType.PERMISSION,
+                    message="Permission denied while listing directory",
+                )
+            )
+            return
+        self._add_warning(
+            WarningRecord(
+                path=path,
+                type=WarningType.IO_ERROR,
+                message=f"I/O error while listing directory: {exc}",
+            )
         )
 
     def _is_excluded(self, rel: Path) -> bool:
-        rel_posix = rel.as_posix()
-        for pattern in self.request.exclude:
-            if fnmatch.fnmatch(rel_posix, pattern):
-                return True
-        return False
+        return self._matcher.is_excluded(rel.as_posix())
 
     def _is_included(self, rel: str) -> bool:
-        if not self.request.include:
-            return True
-        return any(fnmatch.fnmatch(rel, pattern) for pattern in self.request.include)
+        return self._matcher.is_included(rel)
 
-    def _process_file(self, current: Path, filename: str, rel_dir: Path) -> Tuple[Optional[FileRecord], bool]:
+    def _stat_file(self, current: Path, filename: str, rel_prefix: str) -> Optional[Tuple[Path, str, os.stat_result]]:
+        rel_path = rel_prefix + filename
+        if not self._matcher.accepts_file(rel_path):
+            return None
         file_path = current / filename
-        rel_path = (rel_dir / filename).as_posix()
-        if self._is_excluded(Path(rel_path)):
-            return None, False
-        if not self._is_included(rel_path):
-            return None, False
         try:
             stat = file_path.stat()
         except PermissionError:
@@ -183,7 +1033,7 @@ class FolderScanner:
                     message="Permission denied",
                 )
             )
-            return None, False
+            return None
         except OSError as exc:
             self._add_warning(
                 WarningRecord(
@@ -192,24 +1042,43 @@ class FolderScanner:
                     message=f"I/O error: {exc}",
                 )
             )
-            return None, False
+            return None
 
         if not file_path.is_file() or os.path.islink(file_path):
-            return None, False
-
-        inode_key = (stat.st_dev, stat.st_ino)
-        with self._lock:
-            if inode_key in self._seen_inodes:
-                return None, False
-            self._seen_inodes.add(inode_key)
+            return None
+        return file_path, rel_path, stat
 
-        record = self._build_file_record(file_path, rel_path, stat)
-        if record is None:
-            return None, True
+    def _stat_entry(self, entry: "os.DirEntry[str]", rel_prefix: str) -> Optional[Tuple[Path, str, os.stat_result]]:
+        """Scandir counterpart of :meth:`_stat_file`.
 
-        self._increment_stat("files_scanned")
-        self._increment_stat("bytes_scanned", record.size)
-        return record, False
+        The walker has already classified ``entry`` as a regular file from
+        its ``d_type``, so the only syscall left is the cached ``lstat``.
+        """
+        rel_path = rel_prefix + entry.name
+        if not self._matcher.accepts_file(rel_path):
+            return None
+        file_path = Path(entry.path)
+        try:
+            stat = entry.stat(follow_symlinks=False)
+        except PermissionError:
+            self._add_warning(
+                WarningRecord(
+                    path=file_path,
+                    type=WarningType.PERMISSION,
+                    message="Permission denied",
+                )
+            )
+            return None
+        except OSError as exc:
+            self._add_warning(
+                WarningRecord(
+                    path=file_path,
+                    type=WarningType.IO_ERROR,
+                    message=f"I/O error: {exc}",
+                )
+            )
+            return None
+        return file_path, rel_path, stat
 
     def _add_warning(self, warning: WarningRecord) -> None:
         with self._lock:
@@ -227,32 +1096,74 @@ class FolderScanner:
             if self._stats_sink is not None:
                 self._stats_sink[key] = value
 
-    def _build_file_record(self, path: Path, rel_path: str, stat: os.stat_result) -> Optional[FileRecord]:
+    def _build_file_record(
+        self,
+        path: Path,
+        rel_path: str,
+        stat: os.stat_result,
+        check_cache: bool = True,
+    ) -> Optional[FileRecord]:
         mtime = stat.st_mtime
         size = stat.st_size
         sha256_hash: Optional[str] = None
 
-        if self.request.file_equality == FileEqualityMode.SHA256:
-            cached = self._lookup_cache(stat, size, mtime)
+        if self.request.file_equality in HASHING_MODES:
+            cached = self._lookup_cache(stat, size, mtime) if check_cache else None
             if cached:
                 sha256_hash = cached
             else:
                 sha256_hash, stable = self._hash_file(path, size, mtime)
-                if not stable:
-                    return None
-                if sha256_hash and self.cache:
-                    self.cache.set(self._cache_key(stat, size, mtime), sha256_hash)
+                return self._accept_digest(path, rel_path, stat, sha256_hash, stable)
 
+        return self._make_record(path, rel_path, stat, sha256_hash)
+
+    def _accept_digest(
+        self,
+        path: Path,
+        rel_path: str,
+        stat: os.stat_result,
+        sha256_hash: Optional[str],
+        stable: bool,
+    ) -> Optional[FileRecord]:
+        if not stable:
+            return None
+        if sha256_hash and self._digest_spec.uses_tree(stat.st_size):
+            self._increment_stat("files_tree_hashed")
+        if sha256_hash and self.cache:
+            self.cache.set(
+                self._cache_key(stat, stat.st_size, stat.st_mtime),
+                sha256_hash,
+                self._digest_spec.tag_for(stat.st_size),
+            )
+        return self._make_record(path, rel_path, stat, sha256_hash)
+
+    def _make_record(
+        self,
+        path: Path,
+        rel_path: str,
+        stat: os.stat_result,
+        sha256_hash: Optional[str],
+        sample_digest: Optional[str] = None,
+    ) -> FileRecord:
         rel_display = rel_path
         if self.request.force_case_insensitive:
             rel_display = rel_display.lower()
 
+        chunks: Optional[List[Tuple[str, int]]] = None
+        if sha256_hash is not None and self._digest_spec.uses_chunks(stat.st_size):
+            # In chunks mode the digest slot carries the encoded chunk list.
+            chunks = decode_chunks(sha256_hash)
+            sha256_hash = None
+            self._increment_stat("chunks_indexed", len(chunks))
+
         return FileRecord(
             path=path,
             relative_path=rel_display,
-            size=size,
-            mtime=mtime,
+            size=stat.st_size,
+            mtime=stat.st_mtime,
             sha256=sha256_hash,
+            sample_digest=sample_digest,
+            chunks=chunks,
         )
 
     def _cache_key(self, stat: os.stat_result, size: int, mtime: float) -> FileCacheKey:
@@ -261,63 +1172,27 @@ class FolderScanner:
     def _lookup_cache(self, stat: os.stat_result, size: int, mtime: float) -> Optional[str]:
         if not self.cache:
             return None
-        return self.cache.get(self._cache_key(stat, size, mtime))
+        return self.cache.get(self._cache_key(stat, size, mtime), self._digest_spec.tag_for(size))
 
     def _hash_file(self, path: Path, expected_size: int, expected_mtime: float) -> Tuple[Optional[str], bool]:
-        """Return (sha256, stable). Performs drift detection."""
-
-        def _read() -> Tuple[Optional[str], bool]:
-            h = hashlib.sha256()
-            read_bytes = 0
-            try:
-                with path.open("rb") as f:
-                    while True:
-                        chunk = f.read(HASH_CHUNK_SIZE)
-                        if not chunk:
-                            break
-                        h.update(chunk)
-                        read_bytes += len(chunk)
-            except PermissionError:
-                self._add_warning(
-                    WarningRecord(
-                        path=path,
-                        type=WarningType.PERMISSION,
-                        message="Permission denied while hashing",
-                    )
-                )
-                return None, False
-            except OSError as exc:
-                self._add_warning(
-                    WarningRecord(
-                        path=path,
-                        type=WarningType.IO_ERROR,
-                        message=f"I/O error while hashing: {exc}",
-                    )
-                )
-                return None, False
-            if read_bytes != expected_size:
-                return None, False
-            return h.hexdigest(), True
-
-        digest, stable = _read()
-        if not stable:
-            stat_after = path.stat()
-            if stat_after.st_size != expected_size or stat_after.st_mtime != expected_mtime:
-                # Drift detected, retry once
-                digest, stable = _read()
-                if not stable:
-                    self._add_warning(
-                        WarningRecord(
-                            path=path,
-                            type=WarningType.UNSTABLE,
-                            message="File changed during hashing twice; skipping",
-                        )
-                    )
-                    return None, False
-        return digest, True
+        """Return (digest, stable). Performs drift detection."""
+        on_read = None
+        if self._throttle is not None:
+            self._throttle_operation()
+            on_read = self._throttle.read
+        outcome = hash_file(str(path), expected_size, expected_mtime, self._digest_spec, on_read=on_read)
+        self._add_hash_warnings(path, outcome.warnings)
+        self._increment_stat("bytes_hashed", outcome.bytes_read)
+        return outcome.digest, outcome.stable
+
+    def _add_hash_warnings(self, path: Path, warnings: List[HashWarning]) -> None:
+        for kind, message in warnings:
+            self._add_warning(WarningRecord(path=path, type=WarningType(kind), message=message))
 
     def _build_fingerprint(self, folder: FolderInfo, files: List[FileRecord]) -> DirectoryFingerprint:
         weights: Dict[str, int] = defaultdict(int)
+        content_only = self.request.structure_policy == StructurePolicy.CONTENT
+        locations: Optional[Dict[str, str]] = {} if content_only else None
         folder_prefix = Path(folder.relative_path) if folder.relative_path != "." else None
 
         for record in files:
@@ -329,23 +1204,88 @@ class FolderScanner:
                     relative_path = Path(record_path.name)
             else:
                 relative_path = record_path
+            if record.chunks:
+                # One identity per chunk, so files sharing most of their
+                # data overlap by the bytes they share.
+                base = self._identity_base(relative_path)
+                for digest, length in record.chunks:
+                    if content_only:
+                        identity = self._intern(f"#c:{digest}:{length}")
+                        locations.setdefault(identity, relative_path.as_posix())
+                    else:
+                        identity = f"{base}#c:{digest}"
+                    weights[identity] += length
+                continue
             identity = self._file_identity(relative_path, record)
             weights[identity] += record.size
-        return DirectoryFingerprint(folder=folder, file_weights=dict(weights))
+            if locations is not None:
+                locations.setdefault(identity, relative_path.as_posix())
+        return DirectoryFingerprint(
+            folder=folder,
+            file_weights=dict(weights),
+            locations=LocationTree(locations) if locations is not None else None,
+        )
 
-    def _file_identity(self, relative_path: Path, record: FileRecord) -> str:
+    def _identity_base(self, relative_path: Path) -> str:
         if self.request.structure_policy == StructurePolicy.BAG_OF_FILES:
-            base = relative_path.name
-        else:
-            base = relative_path.as_posix()
-        if self.request.file_equality == FileEqualityMode.SHA256:
+            return relative_path.name
+        return relative_path.as_posix()
+
+    def _intern(self, identity: str) -> str:
+        return self._digest_index.setdefault(identity, identity)
+
+    def _file_identity(self, relative_path: Path, record: FileRecord) -> str:
+        if self.request.structure_policy == StructurePolicy.CONTENT:
+            return self._content_identity(record)
+        base = self._identity_base(relative_path)
+        # The identity records how far the equality cascade went: a full
+        # digest, a sampled-block digest, or just the size for files that
+        # lazy/sampled hashing never needed to read.
+        if record.sha256 is not None:
             return f"{base}#{record.sha256}"
+        if record.sample_digest is not None:
+            return f"{base}#s:{record.sample_digest}"
         return f"{base}:{record.size}"
 
+    def _content_identity(self, record: FileRecord) -> str:
+        # The same cascade levels as _file_identity, minus the path.
+        if record.sha256 is not None:
+            return self._intern(f"#{record.sha256}:{record.size}")
+        if record.sample_digest is not None:
+            return self._intern(f"#s:{record.sample_digest}:{record.size}")
+        return self._intern(f":{record.size}")
+
+
+def new_throttle(
+    request: ScanRequest,
+    stop_event: Optional["threading.Event"] = None,
+    on_state: Optional[Callable[[str, int], None]] = None,
+) -> Optional[IOThrottle]:
+    """The request's I/O limits, or None when it sets none."""
+    if not (
+        request.max_read_bytes_per_second
+        or request.max_opens_per_second
+        or request.idle_io_priority
+        or request.pause_load_average is not None
+        or request.pause_io_pressure is not None
+    ):
+        return None
+    return IOThrottle(
+        bytes_per_second=request.max_read_bytes_per_second,
+        ops_per_second=request.max_opens_per_second,
+        max_load=request.pause_load_average,
+        max_io_pressure=request.pause_io_pressure,
+        idle_priority=request.idle_io_priority,
+        stop_event=stop_event,
+        on_state=on_state,
+    )
+
+
 def aggregate_fingerprints(
     fingerprints: Dict[str, DirectoryFingerprint],
     stats: Optional[Dict[str, int]] = None,
     meta: Optional[Dict[str, str]] = None,
+    content_only: bool = False,
 ) -> Dict[str, DirectoryFingerprint]:
     aggregated: Dict[str, DirectoryFingerprint] = {}
     children: Dict[str, List[str]] = defaultdict(list)
@@ -361,21 +1301,12 @@ def aggregate_fingerprints(
 
     for index, key in enumerate(sorted(fingerprints.keys(), key=lambda value: len(Path(value).parts), reverse=True), start=1):
         fingerprint = fingerprints[key]
-        combined = dict(fingerprint.file_weights)
-        for child_key in children.get(key, []):
-            child_fp = aggregated.get(child_key)
-            if not child_fp:
-                continue
-            prefix_path = Path(child_key).relative_to(Path(key)) if key != "." else Path(child_key)
-            for identity, weight in child_fp.file_weights.items():
-                prefixed_identity = _prefix_identity(prefix_path, identity)
-                combined[prefixed_identity] = combined.get(prefixed_identity, 0) + weight
-        aggregated_fp = DirectoryFingerprint(folder=fingerprint.folder, file_weights=combined)
-        total_bytes = sum(combined.values())
-        file_count = len(combined)
-        fingerprint.folder.total_bytes = total_bytes
-        fingerprint.folder.file_count = file_count
-        aggregated[key] = aggregated_fp
+        aggregated[key] = _aggregate_folder(
+            key,
+            fingerprint,
+            ((child_key, aggregated[child_key]) for child_key in children.get(key, []) if child_key in aggregated),
+            content_only,
+        )
         if stats is not None:
             stats["folders_aggregated"] = index
         if meta is not None:
@@ -383,10 +1314,93 @@ def aggregate_fingerprints(
     return aggregated
 
 
+def _aggregate_folder(
+    key: str,
+    fingerprint: DirectoryFingerprint,
+    children: Iterable[Tuple[str, DirectoryFingerprint]],
+    content_only: bool = False,
+) -> DirectoryFingerprint:
+    """Combine a folder's own fingerprint with its children's aggregated ones.
+
+    The folder's ``FolderInfo`` is shared with the result and its totals
+    are updated in place. ``content_only`` (the content structure policy)
+    keeps child identities as they are, since they carry no path.
+    """
+    combined = dict(fingerprint.file_weights)
+    child_locations: List[Tuple[str, LocationTree]] = []
+    for child_key, child_fp in children:
+        prefix_path = Path(child_key).relative_to(Path(key)) if key != "." else Path(child_key)
+        for identity, weight in child_fp.file_weights.items():
+            prefixed_identity = _prefix_identity(prefix_path, identity, content_only)
+            combined[prefixed_identity] = combined.get(prefixed_identity, 0) + weight
+        if child_fp.locations is not None:
+            child_locations.append((prefix_path.as_posix(), child_fp.locations))
+    fingerprint.folder.total_bytes = sum(combined.values())
+    fingerprint.folder.file_count = len(combined)
+    locations = fingerprint.locations
+    if locations is not None:
+        # Children are linked, not copied; paths are joined in flatten().
+        locations = LocationTree(locations.own, tuple(child_locations))
+    return DirectoryFingerprint(folder=fingerprint.folder, file_weights=combined, locations=locations)
+
+
+def account_hardlinks(folders: Dict[str, FolderInfo], sites: Iterable[HardlinkSite]) -> None:
+    """Set ``hardlinked_bytes`` on aggregated folders.
+
+    A kept link's bytes count towards its folder and every ancestor, but
+    deleting one of them frees those bytes only if it holds every link of
+    the inode. Folders below the deepest common folder of the links (all
+    of them, if some link lies outside the scan) report the bytes as
+    hardlinked, so they can be left out of reclaimable totals.
+    """
+    for owner, common, size in sites:
+        key: Optional[str] = owner
+        while key is not None and key != common:
+            info = folders.get(key)
+            if info is not None:
+                info.hardlinked_bytes += size
+            key = _parent_from_relative_path(key)
+
+
+def reaggregate_ancestors(
+    keys: Iterable[str],
+    folder_fingerprints: Dict[str, DirectoryFingerprint],
+    fingerprints: Dict[str, DirectoryFingerprint],
+    children: Dict[str, Set[str]],
+    content_only: bool = False,
+) -> List[str]:
+    """Rebuild the aggregated fingerprints of ``keys`` and all their ancestors.
+
+    ``folder_fingerprints`` holds each folder's own (pre-aggregation)
+    fingerprint and ``children`` the direct subfolders per key; aggregated
+    results are written back into ``fingerprints``. Folders are rebuilt
+    deepest first, so each one combines already refreshed children.
+    Returns the rebuilt keys.
+    """
+    affected: Set[str] = set()
+    for key in keys:
+        current: Optional[str] = key
+        while current is not None and current not in affected:
+            if current in folder_fingerprints:
+                affected.add(current)
+            current = _parent_from_relative_path(current)
+    ordered = sorted(affected, key=lambda value: len(Path(value).parts), reverse=True)
+    for key in ordered:
+        fingerprints[key] = _aggregate_folder(
+            key,
+            folder_fingerprints[key],
+            ((child, fingerprints[child]) for child in sorted(children.get(key, ())) if child in fingerprints),
+            content_only,
+        )
+    return ordered
+
+
 def compute_fingerprint_diff(
     left: DirectoryFingerprint,
     right: DirectoryFingerprint,
 ) -> GroupDiff:
+    if left.locations is not None and right.locations is not None:
+        return _compute_content_diff(left, right)
     left_map = _identity_map(left.file_weights)
     right_map = _identity_map(right.file_weights)
 
@@ -421,6 +1435,60 @@ def compute_fingerprint_diff(
     )
 
 
+def _compute_content_diff(left: DirectoryFingerprint, right: DirectoryFingerprint) -> GroupDiff:
+    """Diff content-keyed fingerprints: identities present on both sides
+    under different paths are moves, not an only-left/only-right pair."""
+    left_locations = left.locations.flatten() if left.locations is not None else {}
+    right_locations = right.locations.flatten() if right.locations is not None else {}
+    removed: Dict[str, int] = defaultdict(int)
+    added: Dict[str, int] = defaultdict(int)
+    moved: Dict[Tuple[str, str], int] = defaultdict(int)
+    mismatched: List[MismatchEntry] = []
+
+    for identity, bytes_left in left.file_weights.items():
+        path = left_locations.get(identity, _identity_to_path(identity))
+        bytes_right = right.file_weights.get(identity)
+        if bytes_right is None:
+            removed[path] += bytes_left
+            continue
+        right_path = right_locations.get(identity, path)
+        if right_path != path:
+            moved[(path, right_path)] += min(bytes_left, bytes_right)
+        if bytes_left != bytes_right:
+            # Same content, different number of copies.
+            mismatched.append(MismatchEntry(path=path, left_bytes=bytes_left, right_bytes=bytes_right))
+    for identity, bytes_right in right.file_weights.items():
+        if identity not in left.file_weights:
+            added[right_locations.get(identity, _identity_to_path(identity))] += bytes_right
+
+    # A path whose content differs on each side was edited in place.
+    for path in sorted(removed.keys() & added.keys()):
+        mismatched.append(MismatchEntry(path=path, left_bytes=removed.pop(path), right_bytes=added.pop(path)))
+
+    return GroupDiff(
+        left=_to_folder_record(left.folder),
+        right=_to_folder_record(right.folder),
+        only_left=sorted((DiffEntry(path=path, bytes=size) for path, size in removed.items()), key=lambda e: e.path),
+        only_right=sorted((DiffEntry(path=path, bytes=size) for path, size in added.items()), key=lambda e: e.path),
+        mismatched=sorted(mismatched, key=lambda entry: entry.path),
+        moved=[
+            MovedEntry(from_path=source, to_path=target, bytes=size)
+            for (source, target), size in sorted(moved.items())
+        ],
+    )
+
+
+def fingerprint_entries(fingerprint: DirectoryFingerprint) -> Dict[str, int]:
+    """Bytes per relative path, whatever the identity format."""
+    if fingerprint.locations is None:
+        return _identity_map(fingerprint.file_weights)
+    mapping: Dict[str, int] = defaultdict(int)
+    locations = fingerprint.locations.flatten()
+    for identity, bytes_size in fingerprint.file_weights.items():
+        mapping[locations.get(identity, _identity_to_path(identity))] += bytes_size
+    return dict(mapping)
+
+
 def _identity_map(weights: Dict[str, int]) -> Dict[str, int]:
     mapping: Dict[str, int] = {}
     for identity, bytes_size in weights.items():
@@ -437,6 +1505,36 @@ def _identity_to_path(identity: str) -> str:
     return identity
 
 
+def _locate(base: Path, rel: Path) -> Optional[Path]:
+    """Find ``rel`` below ``base`` ignoring case, as identities were lowercased."""
+    current = base
+    for part in rel.parts:
+        candidate = current / part
+        if not candidate.exists():
+            try:
+                names = os.listdir(current)
+            except OSError:
+                return None
+            match = next((name for name in names if name.lower() == part), None)
+            if match is None:
+                return None
+            candidate = current / match
+        current = candidate
+    return current
+
+
+def _common_folder(keys: List[str]) -> str:
+    """The deepest folder key that is, or is an ancestor of, every one of ``keys``."""
+    common = Path(keys[0]).parts
+    for key in keys[1:]:
+        parts = Path(key).parts
+        length = 0
+        while length < min(len(common), len(parts)) and common[length] == parts[length]:
+            length += 1
+        common = common[:length]
+    return Path(*common).as_posix() if common else "."
+
+
 def _parent_from_relative_path(rel_path: str) -> Optional[str]:
     rel = Path(rel_path)
     if rel == Path("."):
@@ -489,6 +1587,17 @@ def _promote_parent_groups(
     return promoted
 
 
+# (relative path, relative path, similarity) for one pair above the threshold.
+SimilarPair = Tuple[str, str, float]
+
+# Folders are only compared with folders of a similar total size.
+SIMILARITY_BUCKET_BYTES = 10 * 1024 * 1024
+
+
+def _similarity_bucket(fingerprint: DirectoryFingerprint) -> int:
+    return round(fingerprint.folder.total_bytes / SIMILARITY_BUCKET_BYTES)
+
+
 def compute_similarity_groups(
     fingerprints: Dict[str, DirectoryFingerprint],
     threshold: float,
@@ -497,44 +1606,87 @@ def compute_similarity_groups(
     stop_event: Optional["threading.Event"] = None,
     structure_policy: StructurePolicy = StructurePolicy.RELATIVE,
 ) -> List["SimilarityGroup"]:
-    folders = list(fingerprints.values())
-    buckets: Dict[int, List[DirectoryFingerprint]] = defaultdict(list)
-    for fingerprint in folders:
-        bucket_key = round(fingerprint.folder.total_bytes / (10 * 1024 * 1024))
-        buckets[bucket_key].append(fingerprint)
+    pairs = find_similar_pairs(fingerprints, threshold, stats=stats, meta=meta, stop_event=stop_event)
+    return groups_from_pairs(pairs, fingerprints, threshold, structure_policy)
 
-    groups: List[SimilarityGroup] = []
 
-    total_pairs = 0
-    for bucket_items in buckets.values():
-        n = len(bucket_items)
-        if n > 1:
-            total_pairs += n * (n - 1) // 2
+def find_similar_pairs(
+    fingerprints: Dict[str, DirectoryFingerprint],
+    threshold: float,
+    stats: Optional[Dict[str, int]] = None,
+    meta: Optional[Dict[str, str]] = None,
+    stop_event: Optional["threading.Event"] = None,
+    only: Optional[Set[str]] = None,
+) -> List[SimilarPair]:
+    """Return every pair of folders in the same size bucket above ``threshold``.
+
+    With ``only``, just the pairs involving at least one of those folders
+    are compared, so a caller holding the previous pairs can refresh the
+    ones a change could affect.
+    """
+    buckets: Dict[int, List[DirectoryFingerprint]] = defaultdict(list)
+    for fingerprint in fingerprints.values():
+        buckets[_similarity_bucket(fingerprint)].append(fingerprint)
+
+    candidates: Iterable[Tuple[DirectoryFingerprint, Iterable[DirectoryFingerprint]]]
+    if only is None:
+        total = sum(len(items) * (len(items) - 1) // 2 for items in buckets.values())
+        # islice keeps the pass allocation-free; slicing would copy each tail.
+        candidates = (
+            (a, islice(items, i + 1, None)) for items in buckets.values() for i, a in enumerate(items)
+        )
+    else:
+        selected = []
+        for key in sorted(only):
+            a = fingerprints.get(key)
+            if a is None:
+                continue
+            others = [
+                b
+                for b in buckets[_similarity_bucket(a)]
+                if b is not a and (b.folder.relative_path not in only or b.folder.relative_path > key)
+            ]
+            selected.append((a, others))
+        total = sum(len(others) for _a, others in selected)
+        candidates = selected
+
     if stats is not None:
-        stats["similarity_pairs_total"] = total_pairs
+        stats["similarity_pairs_total"] = total
         stats["similarity_pairs_processed"] = 0
 
-    for bucket_items in buckets.values():
+    pairs: List[SimilarPair] = []
+    for a, others in candidates:
         if stop_event is not None and stop_event.is_set():
             break
-        for i, a in enumerate(bucket_items):
-            for b in bucket_items[i + 1 :]:
-                if stop_event is not None and stop_event.is_set():
-                    break
-                if stats is not None:
-                    stats["similarity_pairs_processed"] += 1
-                if meta is not None:
-                    meta["last_path"] = str(a.folder.path)
-                if _is_ancestor_descendant_pair(a.folder.relative_path, b.folder.relative_path):
-                    continue
-                similarity = weighted_jaccard(a.file_weights, b.file_weights)
-                if similarity >= threshold:
-                    groups.append(
-                        SimilarityGroup(
-                            members=[a.folder, b.folder],
-                            similarity_pairs=[PairwiseSimilarity(a=0, b=1, similarity=similarity)],
-                        )
-                    )
+        for b in others:
+            if stop_event is not None and stop_event.is_set():
+                break
+            if stats is not None:
+                stats["similarity_pairs_processed"] += 1
+            if meta is not None:
+                meta["last_path"] = str(a.folder.path)
+            if _is_ancestor_descendant_pair(a.folder.relative_path, b.folder.relative_path):
+                continue
+            similarity = weighted_jaccard(a.file_weights, b.file_weights)
+            if similarity >= threshold:
+                pairs.append((a.folder.relative_path, b.folder.relative_path, similarity))
+    return pairs
+
+
+def groups_from_pairs(
+    pairs: Iterable[SimilarPair],
+    fingerprints: Dict[str, DirectoryFingerprint],
+    threshold: float,
+    structure_policy: StructurePolicy = StructurePolicy.RELATIVE,
+) -> List["SimilarityGroup"]:
+    """Merge similar pairs into clusters and promote matching parents."""
+    groups = [
+        SimilarityGroup(
+            members=[fingerprints[a].folder, fingerprints[b].folder],
+            similarity_pairs=[PairwiseSimilarity(a=0, b=1, similarity=similarity)],
+        )
+        for a, b, similarity in pairs
+    ]
     merged = merge_groups(groups, threshold)
     if structure_policy == StructurePolicy.RELATIVE:
         promoted = _promote_parent_groups(merged, fingerprints, threshold)
@@ -749,7 +1901,11 @@ def group_to_record(
     if label != FolderLabel.IDENTICAL and len(reordered_members) >= 2:
         base = fingerprints[reordered_members[0].relative_path]
         compared = fingerprints[reordered_members[1].relative_path]
-        divergences = compute_divergences(base.file_weights, compared.file_weights)
+        divergences = compute_divergences(
+            base.file_weights,
+            compared.file_weights,
+            locations={**_flat_locations(compared), **_flat_locations(base)},
+        )
 
     return GroupInfo(
         group_id=group_id,
@@ -762,7 +1918,16 @@ def group_to_record(
     )
 
 
-def compute_divergences(a: Dict[str, int], b: Dict[str, int], top_k: int = 5) -> List[DivergenceRecord]:
+def _flat_locations(fingerprint: DirectoryFingerprint) -> Dict[str, str]:
+    return fingerprint.locations.flatten() if fingerprint.locations is not None else {}
+
+
+def compute_divergences(
+    a: Dict[str, int],
+    b: Dict[str, int],
+    top_k: int = 5,
+    locations: Optional[Dict[str, str]] = None,
+) -> List[DivergenceRecord]:
     deltas: List[Tuple[str, int]] = []
     keys = set(a.keys()) | set(b.keys())
     for key in keys:
@@ -772,12 +1937,8 @@ def compute_divergences(a: Dict[str, int], b: Dict[str, int], top_k: int = 5) ->
     deltas.sort(key=lambda item: item[1], reverse=True)
     records: List[DivergenceRecord] = []
     for name, delta in deltas[:top_k]:
-        if ":" in name:
-            path = name.split(":", 1)[0]
-        elif "#" in name:
-            path = name.split("#", 1)[0]
-        else:
-            path = name
+        path = locations.get(name) if locations else None
+        path = path or _identity_to_path(name)
         records.append(DivergenceRecord(path_a=path, path_b=path, delta_bytes=delta))
     return records
 
@@ -794,20 +1955,12 @@ def _is_ancestor_descendant_pair(path_a: str, path_b: str) -> bool:
     return path_b.startswith(f"{path_a}/") or path_a.startswith(f"{path_b}/")
 
 
-def _prefix_identity(prefix: Path, identity: str) -> str:
-    if not prefix or str(prefix) in (".", ""):
+def _prefix_identity(prefix: Path, identity: str, content_only: bool = False) -> str:
+    if content_only or not prefix or str(prefix) in (".", ""):
+        # Content-only identities have no path to prefix.
         return identity
     prefix_str = prefix.as_posix()
     if not identity:
         return prefix_str
-    if "#" in identity:
-        base, rest = identity.split("#", 1)
-        base = base.strip("/")
-        combined_base = f"{prefix_str}/{base}" if base else prefix_str
-        return f"{combined_base}#{rest}"
-    if ":" in identity:
-        base, rest = identity.split(":", 1)
-        base = base.strip("/")
-        combined_base = f"{prefix_str}/{base}" if base else prefix_str
-        return f"{combined_base}:{rest}"
+    # Every other identity starts with the file's path, whatever its name.
     return f"{prefix_str}/{identity}"
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .pipeline import NOT_READY, StageQueue
+
+
+# Maps a queued item to its (st_dev, st_ino).
+Locator = Callable[[Any], Tuple[int, int]]
+# Maps a queued item to its size in bytes.
+Sizer = Callable[[Any], int]
+
+
+class DeviceQueue(StageQueue):
+    """Hash queue that schedules reads per physical device.
+
+    Items are kept in one heap per ``st_dev``, ordered by inode, which on
+    most filesystems tracks on-disk allocation closely enough to cut seeks
+    on rotational media. At most ``per_device`` items of one device are
+    handed out before :meth:`done` returns them, so a slow disk cannot
+    absorb every worker while the others sit idle; among devices with a
+    free slot the least busy goes first.
+
+    Ordering is only as good as the window of queued items, which is the
+    stage capacity.
+    """
+
+    def __init__(self, capacity: int, per_device: int, locate: Locator) -> None:
+        super().__init__(capacity)
+        self.per_device = max(1, per_device)
+        self._locate = locate
+        self._heaps: Dict[int, List[Tuple[int, int, Any]]] = defaultdict(list)
+        self._active: Dict[int, int] = defaultdict(int)
+        self._sequence = itertools.count()
+
+    @property
+    def devices(self) -> int:
+        """Number of distinct devices seen so far."""
+        return len(self._active)
+
+    def done(self, item: Any) -> None:
+        device, _inode = self._locate(item)
+        with self._condition:
+            self._active[device] -= 1
+            super().done(item)
+
+    def _append(self, item: Any) -> None:
+        device, inode = self._locate(item)
+        self._active.setdefault(device, 0)
+        heapq.heappush(self._heaps[device], (inode, next(self._sequence), item))
+
+    def _next_device(self) -> Optional[int]:
+        best: Optional[int] = None
+        for device, heap in self._heaps.items():
+            if not heap or self._active[device] >= self.per_device:
+                continue
+            if best is None or self._active[device] < self._active[best]:
+                best = device
+        return best
+
+    def _take(self) -> Any:
+        device = self._next_device()
+        if device is None:
+            return NOT_READY
+        self._active[device] += 1
+        return heapq.heappop(self._heaps[device])[2]
+
+    def _first(self) -> Optional[Any]:
+        device = self._next_device()
+        return None if device is None else self._heaps[device][0][2]
+
+
+class SizeQueue(StageQueue):
+    """Hash queue that hands out the largest of a window of jobs first.
+
+    Jobs are held back until ``capacity`` of them are queued, or until
+    :meth:`close`; from then on every job taken frees a slot and the next
+    one goes to the largest job queued. A big file therefore starts ahead
+    of the small ones found around it instead of leaving one worker
+    hashing long after the rest are idle. The window keeps the queue
+    bounded like any other stage, so the walk waits on it rather than
+    queueing the whole tree, at a price: a huge file found after the
+    window has turned over many times still starts late, and workers stay
+    idle until the first window fills or the walk ends.
+
+    All workers pull from the one size-ordered heap, which is work stealing
+    at its simplest: whichever worker frees up first takes the next largest
+    job, and the small files at the end spread over every idle worker.
+
+    Ordering is only as good as the window of queued items, which is the
+    stage capacity.
+    """
+
+    def __init__(self, capacity: int, size_of: Sizer) -> None:
+        super().__init__(capacity)
+        self._size_of = size_of
+        self._heap: List[Tuple[int, int, Any]] = []
+        self._sequence = itertools.count()
+
+    def _append(self, item: Any) -> None:
+        heapq.heappush(self._heap, (-self._size_of(item), next(self._sequence), item))
+
+    def _take(self) -> Any:
+        if not self._releasing():
+            return NOT_READY
+        return heapq.heappop(self._heap)[2]
+
+    def _first(self) -> Optional[Any]:
+        return self._heap[0][2] if self._releasing() else None
+
+    def _releasing(self) -> bool:
+        return self._closed or self._size >= self.capacity
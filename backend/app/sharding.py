@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import multiprocessing
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .cache import FileHashCache
+from .domain import FolderInfo
+from .matcher import PathMatcher
+from .models import DirectoryFingerprint, HashBackend, ScanRequest, StructurePolicy, WarningRecord
+from .scanner import FolderScanner, ScanResult, default_concurrency, reaggregate_ancestors
+from .walker import list_directory
+
+
+# Stats that describe a setting or a level rather than count work; merged
+# shards report the largest value instead of the sum.
+_GAUGE_STATS = frozenset({"workers", "traversal_workers", "hash_devices", "hash_tail_ms", "throttle_paused", "throttle_ioprio_idle"})
+_GAUGE_SUFFIXES = ("_concurrency", "_per_second", "_latency_us", "_x100")
+
+# (result, multi-link inodes the shard counted, those with links the shard
+# did not see mapped to (links seen, link count, bytes))
+ShardOutcome = Tuple[ScanResult, List[Tuple[int, int]], Dict[Tuple[int, int], Tuple[int, int, int]]]
+
+_shard_stop_event = None
+
+
+def _init_shard(stop_event) -> None:
+    global _shard_stop_event
+    _shard_stop_event = stop_event
+
+
+def _scan_shard(request: ScanRequest, subtree: str, cache_path: Optional[str]) -> Optional[ShardOutcome]:
+    """Worker-process entry point: scan and aggregate one top-level subtree."""
+    cache = FileHashCache(Path(cache_path)) if cache_path else None
+    scanner = FolderScanner(request, cache=cache, stop_event=_shard_stop_event)
+    try:
+        result = scanner.scan(subtree=subtree)
+    except FileNotFoundError:
+        # Removed since the root was listed.
+        return None
+    return result, sorted(scanner.linked_inodes()), scanner.outside_links()
+
+
+def is_gauge_stat(key: str) -> bool:
+    """Whether merging scans should keep the largest value of ``key`` rather than add them."""
+    return key in _GAUGE_STATS or key.endswith(_GAUGE_SUFFIXES)
+
+
+class ShardedScanner:
+    """Scans the root's top-level subtrees on a pool of worker processes.
+
+    Walking, fingerprinting and aggregation are Python-bound, so a single
+    process is limited by the GIL however many threads it runs. Here every
+    top-level subtree is one task for a pool of ``request.shard_processes``
+    spawned processes. Each worker walks, hashes and aggregates its subtree
+    with a :class:`FolderScanner` and returns the aggregated per-folder
+    fingerprints. The parent scans the root's own files meanwhile, then
+    merges the shards and aggregates only the root. Pool tasks are handed
+    out as workers free up, so many small subtrees balance themselves, but
+    one subtree holding most of the tree still runs on one process.
+
+    Shards share the hash cache database and split the worker budget and
+    I/O rate limits. Each shard collapses the hard links it sees, but only
+    a single walk can keep one link of an inode linked from several
+    subtrees. When the shards report such inodes, the tree is scanned
+    again in this process, with the shards' hashes already in the cache,
+    and ``stats.shard_shared_inodes`` says how many inodes caused it.
+    """
+
+    def __init__(
+        self,
+        request: ScanRequest,
+        cache: Optional[FileHashCache] = None,
+        stats_sink: Optional[Dict[str, int]] = None,
+        meta_sink: Optional[Dict[str, str]] = None,
+        phase_callback: Optional[Callable[[str], None]] = None,
+        stop_event: Optional[threading.Event] = None,
+    ) -> None:
+        self.request = request
+        self.cache = cache
+        self._stats_sink = stats_sink
+        self._meta_sink = meta_sink
+        self._phase_callback = phase_callback
+        self._stop_event = stop_event
+        self._progress: Dict[str, int] = defaultdict(int)
+
+    def scan(self) -> ScanResult:
+        request = self.request
+        root = request.root_path
+        if not root.is_dir():
+            raise FileNotFoundError(f"Root path {root} is not a directory")
+        processes = request.shard_processes or 1
+        shard_request = self._shard_request(processes)
+        subtrees = self._subtrees()
+        self._set_stat("shards", len(subtrees))
+        self._set_stat("shard_processes", processes)
+        self._set_stat("folders_discovered", 1 + len(subtrees))
+
+        context = multiprocessing.get_context("spawn")
+        shard_stop = context.Event()
+        cache_path = str(self.cache.db_path) if self.cache is not None else None
+        outcomes: Dict[str, ShardOutcome] = {}
+        executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=context,
+            initializer=_init_shard,
+            initargs=(shard_stop,),
+        )
+        try:
+            futures: Dict[Future, str] = {
+                executor.submit(_scan_shard, shard_request, subtree, cache_path): subtree for subtree in subtrees
+            }
+            # The root's own files are scanned here while the shards run.
+            own_scanner = FolderScanner(shard_request, cache=self.cache, stop_event=self._stop_event)
+            own = own_scanner.scan(recursive=False)
+            self._add_progress(own.stats, len(futures))
+            pending: Set[Future] = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                if self._stop_event is not None and self._stop_event.is_set():
+                    shard_stop.set()
+                for future in done:
+                    outcome = future.result()
+                    if outcome is None:
+                        continue
+                    outcomes[futures[future]] = outcome
+                    self._add_progress(outcome[0].stats, len(pending))
+                    if self._meta_sink is not None:
+                        self._meta_sink["last_path"] = str(root / futures[future])
+        except BaseException:
+            shard_stop.set()
+            raise
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        if self._meta_sink is not None:
+            self._meta_sink["phase"] = "aggregating"
+        if self._phase_callback:
+            self._phase_callback("aggregating")
+        merged = [(own, sorted(own_scanner.linked_inodes()), own_scanner.outside_links())]
+        merged += [outcomes[subtree] for subtree in sorted(outcomes)]
+        inode_owners: Counter = Counter()
+        for _result, inodes, _outside_links in merged:
+            inode_owners.update(inodes)
+        shared = sum(1 for count in inode_owners.values() if count > 1)
+        if shared and not (self._stop_event is not None and self._stop_event.is_set()):
+            return self._scan_whole(shared, len(outcomes))
+        return self._merge(merged)
+
+    def _scan_whole(self, shared: int, shards: int) -> ScanResult:
+        """Scan the whole tree in this process, for links the shards cannot resolve."""
+        scanner = FolderScanner(
+            self.request.copy(update={"shard_processes": None}),
+            cache=self.cache,
+            stats_sink=self._stats_sink,
+            meta_sink=self._meta_sink,
+            phase_callback=self._phase_callback,
+            stop_event=self._stop_event,
+        )
+        result = scanner.scan()
+        result.stats["shards"] = shards
+        result.stats["shard_processes"] = self.request.shard_processes or 1
+        result.stats["shard_shared_inodes"] = shared
+        self._set_stat("shard_shared_inodes", shared)
+        return result
+
+    def _shard_request(self, processes: int) -> ScanRequest:
+        request = self.request
+        update: Dict[str, object] = {
+            "shard_processes": None,
+            "concurrency": max(1, (request.concurrency or default_concurrency()) // processes),
+            "max_concurrency": max(1, request.max_concurrency // processes),
+            # Each shard already has a process of its own.
+            "hash_backend": HashBackend.THREAD,
+        }
+        if request.traversal_workers is not None:
+            update["traversal_workers"] = max(1, request.traversal_workers // processes)
+        if request.max_read_bytes_per_second is not None:
+            update["max_read_bytes_per_second"] = max(1, request.max_read_bytes_per_second // processes)
+        if request.max_opens_per_second is not None:
+            update["max_opens_per_second"] = max(1, request.max_opens_per_second // processes)
+        return request.copy(update=update)
+
+    def _subtrees(self) -> List[str]:
+        listing = list_directory(self.request.root_path, Path("."))
+        if listing is None:
+            # The root's own scan reports the listing error.
+            return []
+        matcher = PathMatcher(self.request.include, self.request.exclude)
+        # Pruned subtrees are recorded by the root's own scan without a walk.
+        return sorted(
+            name for name in listing.subdirs if not matcher.is_excluded(name) and not matcher.prunes_subtree(name)
+        )
+
+    def _merge(self, outcomes: List[ShardOutcome]) -> ScanResult:
+        folders: Dict[str, FolderInfo] = {}
+        fingerprints: Dict[str, DirectoryFingerprint] = {}
+        warnings: List[WarningRecord] = []
+        stats: Dict[str, int] = defaultdict(int)
+        # (device, inode) -> [links seen by all shards, link count, bytes]
+        outside: Dict[Tuple[int, int], List[int]] = {}
+        for result, _inodes, outside_links in outcomes:
+            folders.update(result.folders)
+            fingerprints.update(result.fingerprints)
+            warnings.extend(result.warnings)
+            for inode_key, (seen, nlink, size) in outside_links.items():
+                if inode_key in outside:
+                    outside[inode_key][0] += seen
+                else:
+                    outside[inode_key] = [seen, nlink, size]
+            for key, value in result.stats.items():
+                stats[key] = max(stats[key], value) if is_gauge_stat(key) else stats[key] + value
+
+        root_fingerprint = fingerprints.get(".")
+        if root_fingerprint is not None:
+            top_level = {key for key in fingerprints if key != "." and "/" not in key}
+            reaggregate_ancestors(
+                ["."],
+                {".": root_fingerprint},
+                fingerprints,
+                {".": top_level},
+                content_only=self.request.structure_policy == StructurePolicy.CONTENT,
+            )
+            # Shards account hard links up to their own top folder; the root
+            # is hardlinked for inodes with links outside every shard.
+            root_fingerprint.folder.hardlinked_bytes = sum(
+                size for seen, nlink, size in outside.values() if seen < nlink
+            )
+
+        # Same order as a single-process scan: folders in pre-order,
+        # fingerprints deepest first.
+        ordered = sorted(folders, key=lambda key: Path(key).parts)
+        folders = {key: folders[key] for key in ordered}
+        fingerprints = {
+            key: fingerprints[key]
+            for key in sorted(ordered, key=lambda key: len(Path(key).parts), reverse=True)
+            if key in fingerprints
+        }
+        stats["workers"] = self.request.concurrency or default_concurrency()
+        stats["folders_scanned"] = len(folders)
+        stats["total_folders"] = len(fingerprints)
+        stats["folders_aggregated"] = len(fingerprints)
+        stats["shards"] = len(outcomes) - 1
+        stats["shard_processes"] = self.request.shard_processes or 1
+        return ScanResult(folders=folders, fingerprints=fingerprints, warnings=warnings, stats=dict(stats))
+
+    def _add_progress(self, stats: Dict[str, int], unfinished: int) -> None:
+        for key, value in stats.items():
+            if not is_gauge_stat(key):
+                self._progress[key] += value
+        for key in ("files_scanned", "folders_scanned", "bytes_scanned", "bytes_hashed"):
+            self._set_stat(key, self._progress[key])
+        # Subtrees still running count as one discovered folder each.
+        self._set_stat("folders_discovered", self._progress["folders_discovered"] + unfinished)
+
+    def _set_stat(self, key: str, value: int) -> None:
+        if self._stats_sink is not None:
+            self._stats_sink[key] = value
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shelve
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .models import DirectoryFingerprint, ScanRequest
+
+
+# Request fields that change a folder's own fingerprint. Anything else
+# (thresholds, concurrency, scheduling) can differ between scans that share
+# snapshots.
+FINGERPRINT_OPTIONS = (
+    "root_path",
+    "include",
+    "exclude",
+    "file_equality",
+    "force_case_insensitive",
+    "structure_policy",
+    "hash_algorithm",
+    "digest_size",
+    "tree_hash_threshold",
+    "tree_leaf_size",
+    "chunk_avg_size",
+)
+
+# A directory modified this close to the scan may change again within the
+# same timestamp tick, so its snapshot could look current when it is not.
+RACY_WINDOW_NS = 2_000_000_000
+
+# Part of the store key: bumped whenever DirectorySnapshot changes, so a
+# store written by an older version is started afresh instead of misread.
+SNAPSHOT_FORMAT = 3
+
+
+@dataclass
+class DirectorySnapshot:
+    """One folder's own scan result, valid while the directory is unchanged.
+
+    ``fingerprint`` is the per-folder fingerprint from before aggregation;
+    ``subdirs`` are the names the walker descends into instead of listing
+    the directory again. ``linked_inodes`` are the multi-link files the
+    folder kept, so the same inodes are not counted again elsewhere, and
+    ``hardlink_sites`` the ``(owner, common folder, size)`` records they
+    produced, replayed so a reused folder still reports its hard-linked
+    bytes.
+    """
+
+    device: int
+    inode: int
+    mtime_ns: int
+    ctime_ns: int
+    subdirs: List[str]
+    fingerprint: DirectoryFingerprint
+    linked_inodes: List[Tuple[int, int]]
+    hardlink_sites: List[Tuple[str, Optional[str], int]]
+
+    def matches(self, stat: os.stat_result) -> bool:
+        return (
+            self.device == stat.st_dev
+            and self.inode == stat.st_ino
+            and self.mtime_ns == stat.st_mtime_ns
+            and self.ctime_ns == stat.st_ctime_ns
+        )
+
+
+class SnapshotStore:
+    """Shelve-backed directory snapshots for one root and set of scan options.
+
+    Creating or renaming an entry updates a directory's mtime and ctime,
+    so a folder whose metadata still matches has the same listing. Files
+    rewritten in place without a rename do not touch their directory and
+    are only picked up once something else in it changes.
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+
+    @classmethod
+    def for_request(cls, base_dir: Path, request: ScanRequest) -> "SnapshotStore":
+        options = json.loads(request.json(include=set(FINGERPRINT_OPTIONS)))
+        options["snapshot_format"] = SNAPSHOT_FORMAT
+        key = hashlib.sha256(json.dumps(options, sort_keys=True).encode("utf-8")).hexdigest()[:24]
+        return cls(base_dir / key)
+
+    def load(self) -> Dict[str, DirectorySnapshot]:
+        if not self._exists():
+            return {}
+        try:
+            with shelve.open(str(self.db_path), flag="r") as database:
+                return dict(database.items())
+        except Exception:  # pylint: disable=broad-except
+            # An unreadable or outdated store only costs a full scan.
+            return {}
+
+    def save(self, snapshots: Dict[str, DirectorySnapshot], replace: bool = True) -> None:
+        """Write ``snapshots``; ``replace`` drops folders the scan did not see."""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        flag = "n" if replace or not self._exists() else "c"
+        with shelve.open(str(self.db_path), flag=flag) as database:
+            for key, snapshot in snapshots.items():
+                database[key] = snapshot
+
+    def _exists(self) -> bool:
+        return any(self.db_path.parent.glob(f"{self.db_path.name}*"))
+
+
+def is_racy(stat: os.stat_result, scan_started_ns: int) -> bool:
+    return max(stat.st_mtime_ns, stat.st_ctime_ns) >= scan_started_ns - RACY_WINDOW_NS
+
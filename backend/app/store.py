@@ -4,27 +4,33 @@ import csv
 import io
 import json
 import shutil
+import stat as stat_module
 import threading
 import uuid
 from collections import defaultdict
-import fnmatch
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 from fastapi import HTTPException, status
 
 from .analytics import build_similarity_matrix, build_treemap
 from .cache import FileHashCache
+from .checkpoint import ScanCheckpoint, list_checkpoints
 from .config import AppConfig
+from .distributed import DistributedScanner, ShardWorker
 from .domain import FolderInfo, GroupInfo
 from .fingerprint_store import FingerprintStore
+from .inotify import InotifyWatcher
+from .matcher import PathMatcher
 from .converters import folder_info_to_record, group_info_to_record
 from .models import (
+    CheckpointInfo,
     DeletionPlan,
     DeletionPlanPayload,
     DeletionResult,
     DiffEntry,
+    DirectoryFingerprint,
     ExportFilters,
     ExportHeader,
     FolderLabel,
@@ -41,6 +47,8 @@ from .models import (
     ScanRequest,
     ScanStatus,
     ScanMetrics,
+    ShardAssignment,
+    ShardStatus,
     SimilarityMatrixEntry,
     SimilarityMatrixResponse,
     TreemapNode,
@@ -51,14 +59,25 @@ from .models import (
 from .scanner import (
     FolderScanner,
     ScanResult,
-    _identity_to_path,
+    SimilarityGroup,
+    SimilarPair,
+    fingerprint_entries,
     classify_groups,
     compute_fingerprint_diff,
-    compute_similarity_groups,
+    find_similar_pairs,
     group_to_record,
+    groups_from_pairs,
 )
 from .metrics import MetricsExporter
+from .multiroot import MultiRootScanner, root_labels, split_root_path
+from .sharding import ShardedScanner
+from .snapshots import SnapshotStore
 from .system import read_resource_sample
+from .verify import verification_enabled, verify_groups
+from .watch import ScanWatch, open_watcher
+
+
+_ACTIVE_STATUSES = (ScanStatus.PENDING, ScanStatus.RUNNING)
 
 
 class ScanJob:
@@ -89,6 +108,8 @@ class ScanJob:
         self._overall_progress: float = 0.0
         self._phase_progress: Dict[str, float] = {}
         self._stop_event = threading.Event()
+        # Held while watch mode swaps in an updated result and its groups.
+        self.lock = threading.Lock()
 
     def set_phase(self, name: str) -> None:
         if self._current_phase == name:
@@ -118,6 +139,17 @@ class ScanJob:
     def handle_phase_transition(self, name: str) -> None:
         self.set_phase(name)
 
+    def record_timing(self, name: str, started_at: datetime, duration_seconds: float) -> None:
+        """Record work that overlapped other phases, e.g. checkpoint writes."""
+        self.phase_timings[name] = PhaseTiming(
+            phase=name,
+            started_at=started_at,
+            completed_at=datetime.now(timezone.utc),
+            duration_seconds=duration_seconds,
+        )
+        if name not in self.phase_sequence:
+            self.phase_sequence.append(name)
+
     def capture_resource_sample(self) -> None:
         sample = read_resource_sample()
         self.resource_samples.append(sample)
@@ -138,23 +170,102 @@ class ScanManager:
         )
         cache_path.parent.mkdir(parents=True, exist_ok=True)
         self.file_cache = FileHashCache(cache_path)
+        self.snapshot_dir = cache_path.parent / "snapshots"
+        self.checkpoint_dir = cache_path.parent / "checkpoints"
         self._jobs: Dict[str, ScanJob] = {}
         self._plans: Dict[str, DeletionPlan] = {}
         self._lock = threading.RLock()
         self._executor = ThreadPoolExecutorWithStop(max_workers=executor_workers)
         self._metrics = metrics_exporter
+        self._watches: Dict[str, ScanWatch] = {}
+        self._update_listeners: List[Callable[[str, List[str]], None]] = []
+        self.shard_worker = ShardWorker(self.file_cache, allowed_roots=app_config.worker_roots)
 
     def start_scan(self, request: ScanRequest) -> ScanJob:
         scan_id = uuid.uuid4().hex[:12]
         job = ScanJob(scan_id, request)
+        checkpoint = None
+        if request.checkpoint_interval_seconds is not None:
+            checkpoint = ScanCheckpoint.create(self.checkpoint_dir, scan_id, request)
+        with self._lock:
+            self._jobs[scan_id] = job
+        self._executor.submit(self._run_scan, job, checkpoint)
+        return job
+
+    def list_checkpoints(self) -> List[CheckpointInfo]:
+        """Checkpoints left behind by scans that did not finish, e.g. before a restart."""
         with self._lock:
+            running = {scan_id for scan_id, job in self._jobs.items() if job.status in _ACTIVE_STATUSES}
+        return [info for info in list_checkpoints(self.checkpoint_dir) if info.scan_id not in running]
+
+    def resume_scan(self, scan_id: str) -> ScanJob:
+        """Continue an interrupted scan from its last checkpoint under the same id.
+
+        Folders recorded in the checkpoint whose directory metadata is
+        unchanged are reused without listing them; everything else is
+        walked again.
+        """
+        try:
+            checkpoint = ScanCheckpoint.open(self.checkpoint_dir, scan_id)
+        except FileNotFoundError as exc:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Checkpoint not found") from exc
+        with self._lock:
+            existing = self._jobs.get(scan_id)
+            if existing is not None and existing.status in _ACTIVE_STATUSES:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Scan is still running")
+            job = ScanJob(scan_id, checkpoint.request())
             self._jobs[scan_id] = job
-        self._executor.submit(self._run_scan, job)
+        self._executor.submit(self._run_scan, job, checkpoint)
         return job
 
     def shutdown(self) -> None:
+        with self._lock:
+            watches = list(self._watches.values())
+            self._watches.clear()
+        for watch in watches:
+            watch.stop()
+        self.shard_worker.shutdown()
         self._executor.shutdown()
 
+    def start_shard(self, assignment: ShardAssignment) -> ShardStatus:
+        """Scan a subtree on behalf of a coordinator's distributed scan."""
+        try:
+            return self.shard_worker.start(assignment)
+        except PermissionError as exc:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(exc)) from exc
+        except FileNotFoundError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+    def get_shard(self, shard_id: str) -> ShardStatus:
+        try:
+            return self.shard_worker.status(shard_id)
+        except KeyError as exc:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shard not found") from exc
+
+    def get_shard_result(self, shard_id: str) -> bytes:
+        try:
+            return self.shard_worker.result(shard_id)
+        except KeyError as exc:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shard not found") from exc
+        except LookupError as exc:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+
+    def release_shard(self, shard_id: str) -> None:
+        try:
+            self.shard_worker.release(shard_id)
+        except KeyError as exc:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Shard not found") from exc
+
+    def add_update_listener(self, listener: Callable[[str, List[str]], None]) -> None:
+        """Call ``listener(scan_id, folder_keys)`` whenever watch mode updates a scan."""
+        with self._lock:
+            self._update_listeners.append(listener)
+
+    def is_watching(self, scan_id: str) -> bool:
+        with self._lock:
+            watch = self._watches.get(scan_id)
+        return watch is not None and watch.running
+
     def list_jobs(self) -> List[ScanJob]:
         with self._lock:
             return list(self._jobs.values())
@@ -175,6 +286,7 @@ class ScanManager:
         walking_ratio = None
         aggregating_ratio = None
         grouping_ratio = None
+        verifying_ratio = None
         scanned_folders = stats_snapshot.get("folders_scanned", 0)
         discovered_folders = stats_snapshot.get("folders_discovered", 0)
         # Use a non-decreasing denominator so walking progress does not regress
@@ -192,9 +304,15 @@ class ScanManager:
         if pairs_total > 0:
             grouping_ratio = min(1.0, max(0.0, pairs_processed / pairs_total))
 
+        verify_total = stats_snapshot.get("verify_bytes_total", 0)
+        if verify_total > 0:
+            verifying_ratio = min(1.0, max(0.0, stats_snapshot.get("verify_bytes_done", 0) / verify_total))
+
         phases: List[PhaseProgress] = []
         current_phase = job.meta.get("phase", "")
         phase_names = ["walking", "aggregating", "grouping"]
+        if verification_enabled(job.request):
+            phase_names.append("verifying")
 
         def _smooth_phase_progress(name: str, raw: Optional[float], status: str) -> float:
             """Clamp and monotonise per-phase progress without extra allocations."""
@@ -234,6 +352,8 @@ class ScanManager:
                     raw_progress = aggregating_ratio
                 elif name == "grouping" and grouping_ratio is not None:
                     raw_progress = grouping_ratio
+                elif name == "verifying" and verifying_ratio is not None:
+                    raw_progress = verifying_ratio
                 return "running", _smooth_phase_progress(name, raw_progress, "running")
             # Determine ordering by index in phase_names
             try:
@@ -268,6 +388,9 @@ class ScanManager:
             # visible without letting grouping's long tail masquerade as
             # "last 1%".
             weights = {"walking": 0.2, "aggregating": 0.1, "grouping": 0.7}
+            if "verifying" in phase_names:
+                # Verification hashes file contents, typically the slowest step.
+                weights = {"walking": 0.2, "aggregating": 0.1, "grouping": 0.3, "verifying": 0.4}
             overall_raw = 0.0
             for name in phase_names:
                 phase_value = phase_progress_map.get(name, 0.0)
@@ -308,6 +431,7 @@ class ScanManager:
             phases=phases,
             include_matrix=job.request.include_matrix,
             include_treemap=job.request.include_treemap,
+            watching=self.is_watching(job.scan_id),
         )
 
     def get_groups(self, scan_id: str, label: Optional[FolderLabel] = None) -> List[GroupRecord]:
@@ -381,8 +505,11 @@ class ScanManager:
         if job.status != ScanStatus.COMPLETED or not job.result:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Scan is not complete")
 
+        with job.lock:
+            group_infos = job.group_infos
+            fingerprints = job.result.fingerprints
         target_info: Optional[GroupInfo] = None
-        for records in job.group_infos.values():
+        for records in group_infos.values():
             for info in records:
                 if info.group_id == group_id:
                     target_info = info
@@ -397,7 +524,6 @@ class ScanManager:
         if not left_member or not right_member:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Members not found in group")
 
-        fingerprints = job.result.fingerprints
         if left_member.relative_path not in fingerprints or right_member.relative_path not in fingerprints:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Fingerprint missing for members")
 
@@ -412,6 +538,7 @@ class ScanManager:
             only_left=diff.only_left,
             only_right=diff.only_right,
             mismatched=diff.mismatched,
+            moved=diff.moved,
         )
 
     def get_group_contents(self, scan_id: str, group_id: str) -> GroupContents:
@@ -419,8 +546,11 @@ class ScanManager:
         if job.status != ScanStatus.COMPLETED or not job.result:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Scan is not complete")
 
+        with job.lock:
+            group_infos = job.group_infos
+            fingerprints = job.result.fingerprints
         group_info: Optional[GroupInfo] = None
-        for records in job.group_infos.values():
+        for records in group_infos.values():
             for info in records:
                 if info.group_id == group_id:
                     group_info = info
@@ -430,7 +560,6 @@ class ScanManager:
         if not group_info:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Group not found")
 
-        fingerprints = job.result.fingerprints
         if not fingerprints:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Missing fingerprint data")
 
@@ -439,9 +568,10 @@ class ScanManager:
             if not fp:
                 entries: List[DiffEntry] = []
             else:
+                # Chunks mode has many identities per file; list each file once.
                 entries = [
-                    DiffEntry(path=_identity_to_path(identity), bytes=bytes_size)
-                    for identity, bytes_size in fp.file_weights.items()
+                    DiffEntry(path=path, bytes=bytes_size)
+                    for path, bytes_size in fingerprint_entries(fp).items()
                 ]
             entries.sort(key=lambda entry: entry.path)
             folder_entries = [FolderEntry(path=entry.path, bytes=entry.bytes) for entry in entries]
@@ -461,18 +591,29 @@ class ScanManager:
         if not job.request.deletion_enabled:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Deletion is disabled")
 
-        root = job.request.root_path
-        plan_paths: List[str] = []
-        total_bytes = 0
+        # Multi-root keys start with the root's label; a plan moves folders
+        # into the quarantine of a single root.
+        located: List[Tuple[Path, str]] = []
         for rel_path in payload.paths:
+            try:
+                located.append(split_root_path(job.request, rel_path))
+            except ValueError as exc:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+        plan_roots = {path_root for path_root, _rel in located}
+        if len(plan_roots) > 1:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Paths span several scan roots")
+        root = plan_roots.pop() if plan_roots else job.request.root_path
+        plan_paths: List[str] = []
+        existing: List[Path] = []
+        for _root, rel_path in located:
             abs_path = (root / rel_path).resolve()
             if root not in abs_path.parents and abs_path != root:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Path escapes root: {rel_path}")
             if not abs_path.exists():
                 continue
-            size = _compute_path_size(abs_path)
-            total_bytes += size
+            existing.append(abs_path)
             plan_paths.append(abs_path.relative_to(root).as_posix())
+        total_bytes, hardlinked_bytes = _measure_plan(existing)
 
         plan_id = uuid.uuid4().hex[:12]
         token = uuid.uuid4().hex
@@ -481,6 +622,7 @@ class ScanManager:
             plan_id=plan_id,
             token=token,
             reclaimable_bytes=total_bytes,
+            hardlinked_bytes=hardlinked_bytes,
             queue=plan_paths,
             root=root,
             quarantine_root=quarant_root,
@@ -630,6 +772,11 @@ class ScanManager:
         then stop.
         """
         job = self.get_job(scan_id)
+        with self._lock:
+            watch = self._watches.pop(scan_id, None)
+        if watch is not None:
+            # Cancelling a watched scan only ends the watch.
+            watch.stop()
         if job.status not in (ScanStatus.PENDING, ScanStatus.RUNNING):
             return
         job._stop_event.set()
@@ -648,34 +795,91 @@ class ScanManager:
             completed_at=job.completed_at,
             worker_count=job.stats.get("workers", 0),
             bytes_scanned=job.stats.get("bytes_scanned", 0),
+            adaptive_concurrency=job.request.adaptive_concurrency,
+            stage_concurrency={
+                key[: -len("_concurrency")]: value
+                for key, value in job.stats.items()
+                if key.endswith("_concurrency")
+            },
+            hash_schedule=job.request.hash_schedule,
+            hash_tail_seconds=(
+                job.stats["hash_tail_ms"] / 1000 if "hash_tail_ms" in job.stats else None
+            ),
             phase_timings=timings,
             resource_samples=job.resource_samples,
         )
 
-    def _run_scan(self, job: ScanJob) -> None:
+    def _run_scan(self, job: ScanJob, checkpoint: Optional[ScanCheckpoint] = None) -> None:
         job.status = ScanStatus.RUNNING
         self._update_active_metric()
         job.set_phase("walking")
+        watcher: Optional[InotifyWatcher] = None
+        watch_warnings: List[WarningRecord] = []
         try:
             job.meta["phase"] = "walking"
-            scanner = FolderScanner(
-                job.request,
-                cache=self.file_cache,
-                stats_sink=job.stats,
-                meta_sink=job.meta,
-                phase_callback=job.handle_phase_transition,
-                stop_event=job._stop_event,
-            )
+            if job.request.watch:
+                watcher = open_watcher(job.request, watch_warnings)
+            if job.request.additional_roots:
+                scanner = MultiRootScanner(
+                    job.request,
+                    cache=self.file_cache,
+                    stats_sink=job.stats,
+                    meta_sink=job.meta,
+                    phase_callback=job.handle_phase_transition,
+                    stop_event=job._stop_event,
+                    snapshot_dir=self.snapshot_dir,
+                )
+            elif job.request.shard_processes:
+                scanner = ShardedScanner(
+                    job.request,
+                    cache=self.file_cache,
+                    stats_sink=job.stats,
+                    meta_sink=job.meta,
+                    phase_callback=job.handle_phase_transition,
+                    stop_event=job._stop_event,
+                )
+            elif job.request.remote_shards:
+                scanner = DistributedScanner(
+                    job.request,
+                    cache=self.file_cache,
+                    stats_sink=job.stats,
+                    meta_sink=job.meta,
+                    phase_callback=job.handle_phase_transition,
+                    stop_event=job._stop_event,
+                )
+            else:
+                scanner = FolderScanner(
+                    job.request,
+                    cache=self.file_cache,
+                    stats_sink=job.stats,
+                    meta_sink=job.meta,
+                    phase_callback=job.handle_phase_transition,
+                    stop_event=job._stop_event,
+                    snapshots=(
+                        SnapshotStore.for_request(self.snapshot_dir, job.request) if job.request.incremental else None
+                    ),
+                    checkpoint=checkpoint,
+                )
             result = scanner.scan()
+            if checkpoint is not None and checkpoint.first_written_at is not None:
+                job.record_timing("checkpointing", checkpoint.first_written_at, checkpoint.seconds)
+            result.warnings.extend(watch_warnings)
             job.meta["phase"] = "grouping"
             job.set_phase("grouping")
-            similarity_groups = compute_similarity_groups(
+            # Watch mode keeps the similar pairs so updates only compare
+            # the folders that changed.
+            pairs = find_similar_pairs(
                 result.fingerprints,
                 job.request.similarity_threshold,
                 stats=job.stats,
                 meta=job.meta,
                 stop_event=job._stop_event,
-                structure_policy=job.request.structure_policy,
+            )
+            similarity_groups = groups_from_pairs(
+                pairs,
+                result.fingerprints,
+                job.request.similarity_threshold,
+                job.request.structure_policy,
             )
 
             classified = classify_groups(
@@ -683,39 +887,21 @@ class ScanManager:
                 job.request.similarity_threshold,
                 result.fingerprints,
             )
-
-            records_by_label: Dict[FolderLabel, List[GroupInfo]] = {label: [] for label in FolderLabel}
-            combined_records: List[Tuple[FolderLabel, GroupInfo]] = []
-
-            for label, items in classified.items():
-                for group, _score in items:
-                    info = group_to_record(group, label, result.fingerprints)
-                    records_by_label[label].append(info)
-                    combined_records.append((label, info))
-
-            filtered_records = _suppress_descendant_groups_all(combined_records)
-            for label in FolderLabel:
-                job.group_infos[label] = []
-            for label, info in filtered_records:
-                job.group_infos[label].append(info)
-
-            if job.request.include_matrix:
-                job.matrix_entries = build_similarity_matrix(
-                    filtered_records,
-                    max_entries=self.config.matrix_max_entries,
-                    min_reclaim_bytes=self.config.matrix_min_reclaim_bytes,
-                    include_identical=self.config.matrix_include_identical,
+            if verification_enabled(job.request):
+                job.meta["phase"] = "verifying"
+                job.set_phase("verifying")
+                classified = verify_groups(
+                    classified,
+                    result.fingerprints,
+                    job.request,
+                    cache=self.file_cache,
+                    stats=job.stats,
+                    warnings=result.warnings,
+                    stop_event=job._stop_event,
                 )
-            else:
-                job.matrix_entries = []
+                result.stats.update({key: value for key, value in job.stats.items() if key.startswith("verify_")})
 
-            if job.request.include_treemap:
-                root_label = job.request.root_path.name or job.request.root_path.as_posix()
-                root_fingerprint = result.fingerprints.get(".")
-                root_bytes = root_fingerprint.folder.total_bytes if root_fingerprint else 0
-                job.treemap = build_treemap(filtered_records, root_label=root_label, root_bytes=root_bytes)
-            else:
-                job.treemap = None
+            self._store_groups(job, classified, result.fingerprints)
 
             job.result = result
             job.warnings = result.warnings
@@ -724,6 +910,11 @@ class ScanManager:
             job.completed_at = datetime.now(timezone.utc)
             job.finish_phase()
             self._record_metrics(job)
+            if checkpoint is not None:
+                checkpoint.remove()
+            if watcher is not None and not job._stop_event.is_set():
+                self._start_watch(job, result, pairs, watcher)
+                watcher = None
         except Exception as exc:  # pylint: disable=broad-except
             # Treat unexpected errors as warnings when we already
             # have a partial result, instead of failing the entire
@@ -743,9 +934,88 @@ class ScanManager:
                 )
             )
         finally:
+            if watcher is not None:
+                watcher.close()
+            if checkpoint is not None and job.status == ScanStatus.CANCELLED:
+                # A cancelled scan is not meant to be resumed.
+                checkpoint.remove()
             job.finish_phase()
             self._update_active_metric()
 
+    def _store_groups(
+        self,
+        job: ScanJob,
+        classified: Dict[FolderLabel, List[Tuple[SimilarityGroup, float]]],
+        fingerprints: Dict[str, DirectoryFingerprint],
+    ) -> None:
+        combined_records: List[Tuple[FolderLabel, GroupInfo]] = []
+        for label, items in classified.items():
+            for group, _score in items:
+                combined_records.append((label, group_to_record(group, label, fingerprints)))
+
+        filtered_records = _suppress_descendant_groups_all(combined_records)
+        group_infos: Dict[FolderLabel, List[GroupInfo]] = defaultdict(list)
+        for label in FolderLabel:
+            group_infos[label] = []
+        for label, info in filtered_records:
+            group_infos[label].append(info)
+        # Swapped in whole so readers never see a half-built set while a
+        # watched scan is updating.
+        job.group_infos = group_infos
+
+        if job.request.include_matrix:
+            job.matrix_entries = build_similarity_matrix(
+                filtered_records,
+                max_entries=self.config.matrix_max_entries,
+                min_reclaim_bytes=self.config.matrix_min_reclaim_bytes,
+                include_identical=self.config.matrix_include_identical,
+            )
+        else:
+            job.matrix_entries = []
+
+        if job.request.include_treemap:
+            root_label = job.request.root_path.name or job.request.root_path.as_posix()
+            root_keys = ["."]
+            if job.request.additional_roots:
+                # The roots hang off a synthetic top node.
+                root_keys = root_labels(job.request.roots)
+                root_label = " + ".join(root_keys)
+            root_bytes = sum(fingerprints[key].folder.total_bytes for key in root_keys if key in fingerprints)
+            job.treemap = build_treemap(filtered_records, root_label=root_label, root_bytes=root_bytes)
+        else:
+            job.treemap = None
+
+    def _start_watch(
+        self,
+        job: ScanJob,
+        result: ScanResult,
+        pairs: List[SimilarPair],
+        watcher: InotifyWatcher,
+    ) -> None:
+        def _publish(groups: List[SimilarityGroup]) -> None:
+            # Runs under job.lock, once the updated result is swapped in.
+            classified = classify_groups(groups, job.request.similarity_threshold, result.fingerprints)
+            self._store_groups(job, classified, result.fingerprints)
+
+        def _updated(folders: List[str]) -> None:
+            with self._lock:
+                listeners = list(self._update_listeners)
+            for listener in listeners:
+                listener(job.scan_id, folders)
+
+        watch = ScanWatch(
+            job.request,
+            result,
+            pairs,
+            cache=self.file_cache,
+            publish=_publish,
+            on_update=_updated,
+            lock=job.lock,
+        )
+        with self._lock:
+            self._watches[job.scan_id] = watch
+        watch.start(watcher)
+
 
 class ThreadPoolExecutorWithStop:
     def __init__(self, max_workers: int) -> None:
@@ -769,27 +1039,52 @@ def _move_to_quarantine(source: Path, target: Path) -> int:
     return target.stat().st_size
 
 
-def _compute_path_size(path: Path) -> int:
-    if path.is_dir():
-        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
-    if path.is_file():
-        return path.stat().st_size
-    return 0
+def _measure_plan(paths: List[Path]) -> Tuple[int, int]:
+    """Return ``(reclaimable, hardlinked)`` bytes for moving ``paths`` away.
+
+    A hard-linked file frees its bytes only when every link to its inode
+    is in the plan; the rest of the linked bytes are reported separately.
+    Each inode is counted once however many of its links are planned.
+    """
+    reclaimable = 0
+    # (device, inode) -> [planned links, link count, size]
+    linked: Dict[Tuple[int, int], List[int]] = {}
+    # Paths nested in another planned path are already covered by it.
+    outermost = [path for path in set(paths) if not any(other in path.parents for other in paths)]
+    for path in outermost:
+        files = [path] if path.is_file() else path.rglob("*")
+        for file_path in files:
+            try:
+                info = file_path.lstat()
+            except OSError:
+                continue
+            if not stat_module.S_ISREG(info.st_mode):
+                continue
+            if info.st_nlink <= 1:
+                reclaimable += info.st_size
+                continue
+            entry = linked.setdefault((info.st_dev, info.st_ino), [0, info.st_nlink, info.st_size])
+            entry[0] += 1
+    hardlinked = 0
+    for planned, nlink, size in linked.values():
+        if planned >= nlink:
+            reclaimable += size
+        else:
+            hardlinked += size
+    return reclaimable, hardlinked
 
 
 def _apply_filters(groups: List[GroupRecord], filters: ExportFilters) -> List[GroupRecord]:
     if not filters.include and not filters.exclude:
         return groups
 
-    def match(path_str: str, patterns: List[str]) -> bool:
-        return any(fnmatch.fnmatch(path_str, pattern) for pattern in patterns)
-
+    matcher = PathMatcher(filters.include, filters.exclude)
     filtered: List[GroupRecord] = []
     for group in groups:
         canonical = group.canonical_path
-        if filters.include and not match(canonical, filters.include):
+        if not matcher.is_included(canonical):
             continue
-        if filters.exclude and match(canonical, filters.exclude):
+        if matcher.is_excluded(canonical):
             continue
         filtered.append(group)
     return filtered
@@ -3,16 +3,38 @@ from __future__ import annotations
 import os
 import resource
 from datetime import datetime, timezone
+from typing import Optional
 
 from .models import ResourceSample, ResourceStats
 
 
-def read_resource_stats() -> ResourceStats:
-    cpu_cores = os.cpu_count() or 1
+def read_load_1m() -> float:
     try:
-        load_1m = os.getloadavg()[0]
+        return os.getloadavg()[0]
     except (OSError, AttributeError):
-        load_1m = 0.0
+        return 0.0
+
+
+def read_io_pressure() -> Optional[float]:
+    """``some avg10`` from ``/proc/pressure/io``: the share of the last ten
+    seconds (in percent) in which some task was stalled on I/O. ``None``
+    where PSI is unavailable."""
+    try:
+        with open("/proc/pressure/io", "r", encoding="utf-8") as fh:
+            for line in fh:
+                if line.startswith("some "):
+                    for field in line.split()[1:]:
+                        key, _, value = field.partition("=")
+                        if key == "avg10":
+                            return float(value)
+    except (OSError, ValueError):
+        return None
+    return None
+
+
+def read_resource_stats() -> ResourceStats:
+    cpu_cores = os.cpu_count() or 1
+    load_1m = read_load_1m()
 
     usage = resource.getrusage(resource.RUSAGE_SELF)
     rss_kb = usage.ru_maxrss
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import ctypes
+import platform
+import threading
+import time
+from typing import Callable, Optional
+
+from .system import read_io_pressure, read_load_1m
+
+
+# Seconds between load / PSI samples, and between re-checks while paused.
+PRESSURE_POLL_SECONDS = 1.0
+
+# ioprio_set(2) has no libc wrapper; syscall numbers per architecture.
+_IOPRIO_SET_SYSCALLS = {"x86_64": 251, "aarch64": 30, "i386": 289, "i686": 289}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_IDLE = 3
+_IOPRIO_CLASS_SHIFT = 13
+
+# (stats key, value)
+StateCallback = Callable[[str, int], None]
+
+
+def set_idle_io_priority() -> bool:
+    """Put the calling thread in the idle I/O scheduling class.
+
+    With ``who=IOPRIO_WHO_PROCESS`` and id 0 the kernel applies the class
+    to the calling thread only. Returns False where the call is missing or
+    refused; the scan then simply runs at normal priority.
+    """
+    number = _IOPRIO_SET_SYSCALLS.get(platform.machine())
+    if number is None:
+        return False
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        result = libc.syscall(number, _IOPRIO_WHO_PROCESS, 0, _IOPRIO_CLASS_IDLE << _IOPRIO_CLASS_SHIFT)
+    except (OSError, AttributeError):
+        return False
+    return result == 0
+
+
+class TokenBucket:
+    """A token bucket that callers may overdraw.
+
+    ``acquire`` always takes its tokens and then sleeps off any deficit, so
+    a request larger than the burst still goes through, at the configured
+    average rate. Concurrent callers queue up behind each other's debt.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, stop_event: Optional[threading.Event] = None) -> None:
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop_event = stop_event
+
+    def acquire(self, amount: float) -> float:
+        """Take ``amount`` tokens; return the seconds spent waiting."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            deficit = -self._tokens
+        if deficit <= 0:
+            return 0.0
+        delay = deficit / self.rate
+        if self._stop_event is not None:
+            self._stop_event.wait(delay)
+        else:
+            time.sleep(delay)
+        return delay
+
+
+class IOThrottle:
+    """Per-scan I/O limits for the stat and hash stages.
+
+    - ``read`` charges hashed bytes against a bytes/s bucket,
+    - ``operation`` charges one stat or open against an ops/s bucket and
+      blocks while the host is overloaded (1-minute load average or I/O
+      pressure above their thresholds),
+    - ``prepare_thread`` moves the calling worker into the idle I/O class.
+
+    State is pushed to ``on_state`` as integer stats so it shows up in
+    scan progress.
+    """
+
+    def __init__(
+        self,
+        bytes_per_second: Optional[int] = None,
+        ops_per_second: Optional[int] = None,
+        max_load: Optional[float] = None,
+        max_io_pressure: Optional[float] = None,
+        idle_priority: bool = False,
+        stop_event: Optional[threading.Event] = None,
+        on_state: Optional[StateCallback] = None,
+    ) -> None:
+        self._bytes = TokenBucket(bytes_per_second, stop_event=stop_event) if bytes_per_second else None
+        self._ops = TokenBucket(ops_per_second, stop_event=stop_event) if ops_per_second else None
+        self._max_load = max_load
+        self._max_io_pressure = max_io_pressure
+        self._idle_priority = idle_priority
+        self._stop_event = stop_event
+        self._on_state = on_state
+        self._lock = threading.Lock()
+        self._thread_state = threading.local()
+        self._wait_seconds = 0.0
+        self._paused_seconds = 0.0
+        self._pauses = 0
+        self._overloaded = False
+        self._sampled_at: Optional[float] = None
+
+    def prepare_thread(self) -> None:
+        if not self._idle_priority or getattr(self._thread_state, "prepared", False):
+            return
+        self._thread_state.prepared = True
+        self._report("throttle_ioprio_idle", int(set_idle_io_priority()))
+
+    def read(self, nbytes: int) -> None:
+        if self._bytes is not None and nbytes > 0:
+            self._waited(self._bytes.acquire(nbytes))
+
+    def operation(self) -> None:
+        self._wait_for_headroom()
+        if self._ops is not None:
+            self._waited(self._ops.acquire(1))
+
+    def _waited(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        with self._lock:
+            self._wait_seconds += seconds
+            total = self._wait_seconds
+        self._report("throttle_wait_ms", int(total * 1000))
+
+    def _wait_for_headroom(self) -> None:
+        if self._max_load is None and self._max_io_pressure is None:
+            return
+        paused_at: Optional[float] = None
+        while self._sample_overloaded():
+            if self._stop_event is not None and self._stop_event.is_set():
+                break
+            if paused_at is None:
+                paused_at = time.monotonic()
+            if self._stop_event is not None:
+                self._stop_event.wait(PRESSURE_POLL_SECONDS)
+            else:
+                time.sleep(PRESSURE_POLL_SECONDS)
+        if paused_at is not None:
+            with self._lock:
+                self._paused_seconds += time.monotonic() - paused_at
+                total = self._paused_seconds
+            self._report("throttle_paused_ms", int(total * 1000))
+
+    def _sample_overloaded(self) -> bool:
+        """Re-sample at most once per poll interval; every worker shares the result."""
+        now = time.monotonic()
+        with self._lock:
+            if self._sampled_at is not None and now - self._sampled_at < PRESSURE_POLL_SECONDS:
+                return self._overloaded
+            self._sampled_at = now
+        load = read_load_1m()
+        pressure = read_io_pressure() if self._max_io_pressure is not None else None
+        overloaded = (self._max_load is not None and load > self._max_load) or (
+            pressure is not None and pressure > self._max_io_pressure
+        )
+        with self._lock:
+            started = overloaded and not self._overloaded
+            self._overloaded = overloaded
+            if started:
+                self._pauses += 1
+            pauses = self._pauses
+        self._report("throttle_load_x100", int(load * 100))
+        if pressure is not None:
+            self._report("throttle_io_pressure_x100", int(pressure * 100))
+        self._report("throttle_paused", int(overloaded))
+        self._report("throttle_pauses", pauses)
+        return overloaded
+
+    def _report(self, key: str, value: int) -> None:
+        if self._on_state is not None:
+            self._on_state(key, value)
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .cache import FileHashCache
+from .models import DirectoryFingerprint, FileEqualityMode, FolderLabel, ScanRequest, WarningRecord
+from .scanner import (
+    FolderScanner,
+    SimilarityGroup,
+    _is_ancestor_descendant_pair,
+    classify_groups,
+    compute_similarity_groups,
+)
+
+
+# Labels whose members are hashed; partial overlaps are reported as found.
+VERIFIED_LABELS = (FolderLabel.IDENTICAL, FolderLabel.NEAR_DUPLICATE)
+
+Classified = Dict[FolderLabel, List[Tuple[SimilarityGroup, float]]]
+
+
+def verification_enabled(request: ScanRequest) -> bool:
+    return request.verify_groups and request.file_equality == FileEqualityMode.NAME_SIZE
+
+
+def verify_groups(
+    classified: Classified,
+    fingerprints: Dict[str, DirectoryFingerprint],
+    request: ScanRequest,
+    cache: Optional[FileHashCache] = None,
+    stats: Optional[Dict[str, int]] = None,
+    warnings: Optional[List[WarningRecord]] = None,
+    stop_event: Optional[threading.Event] = None,
+) -> Classified:
+    """Re-check name/size groups against file contents.
+
+    Only the files of folders that are members of an identical or
+    near-duplicate group are hashed, in ``sha256`` mode and through the
+    hash cache, so the cost is proportional to the bytes in candidate
+    groups rather than the whole tree. The members' fingerprints name
+    their files, so no directory is listed again. Each group is regrouped
+    and relabelled from the content fingerprints; a group whose members
+    no longer agree may split or drop out. ``fingerprints`` itself is not
+    changed, so diffs and contents keep comparing like with like.
+    """
+    stats = stats if stats is not None else {}
+    candidates = [group for label in VERIFIED_LABELS for group, _score in classified.get(label, [])]
+    roots = _member_roots(member for group in candidates for member in group.members)
+    stats["verify_groups_checked"] = len(candidates)
+    stats["verify_groups_changed"] = 0
+    stats["verify_bytes_total"] = sum(fingerprints[root].folder.total_bytes for root in roots)
+    stats["verify_bytes_done"] = 0
+    stats["verify_bytes_hashed"] = 0
+
+    verify_request = request.copy(update={"file_equality": FileEqualityMode.SHA256, "lazy_hashing": False})
+    scan_stats: Dict[str, int] = {}
+    scanner = FolderScanner(verify_request, cache=cache, stats_sink=scan_stats, stop_event=stop_event)
+    hashed: Dict[str, DirectoryFingerprint] = {}
+    for root in roots:
+        if stop_event is not None and stop_event.is_set():
+            return classified
+        hashed[root] = scanner.hash_fingerprint(fingerprints[root])
+        stats["verify_bytes_hashed"] = scan_stats.get("bytes_hashed", 0)
+        stats["verify_bytes_done"] += fingerprints[root].folder.total_bytes
+    if warnings is not None:
+        warnings.extend(scanner.warnings())
+
+    # Used only to regroup; members keep their FolderInfo objects.
+    content_fingerprints = {
+        member.relative_path: _member_fingerprint(member.relative_path, roots, hashed, fingerprints)
+        for group in candidates
+        for member in group.members
+    }
+    verified: Classified = {label: [] for label in FolderLabel}
+    for label, items in classified.items():
+        if label not in VERIFIED_LABELS:
+            verified[label].extend(items)
+    for label in VERIFIED_LABELS:
+        for group, _score in classified.get(label, []):
+            members = {member.relative_path: content_fingerprints[member.relative_path] for member in group.members}
+            regrouped = compute_similarity_groups(
+                members, request.similarity_threshold, structure_policy=request.structure_policy
+            )
+            relabelled = classify_groups(regrouped, request.similarity_threshold, content_fingerprints)
+            unchanged = (
+                len(regrouped) == 1
+                and len(regrouped[0].members) == len(group.members)
+                and [new_label for new_label, items in relabelled.items() if items] == [label]
+            )
+            if not unchanged:
+                stats["verify_groups_changed"] += 1
+            for new_label, items in relabelled.items():
+                verified[new_label].extend(items)
+    return verified
+
+
+def _member_fingerprint(
+    key: str,
+    roots: List[str],
+    hashed: Dict[str, DirectoryFingerprint],
+    fingerprints: Dict[str, DirectoryFingerprint],
+) -> DirectoryFingerprint:
+    """A member's content fingerprint, cut out of the hashed member containing it."""
+    if key in hashed:
+        return hashed[key]
+    root = next(root for root in roots if root == "." or _is_ancestor_descendant_pair(root, key))
+    prefix = key if root == "." else key[len(root) + 1 :]
+    prefix = f"{prefix}/"
+    weights = {
+        identity[len(prefix) :]: weight
+        for identity, weight in hashed[root].file_weights.items()
+        if identity.startswith(prefix)
+    }
+    return DirectoryFingerprint(folder=fingerprints[key].folder, file_weights=weights)
+
+
+def _member_roots(members: Iterable) -> List[str]:
+    """Distinct member paths, minus those inside another member."""
+    paths = sorted({member.relative_path for member in members}, key=lambda path: (path.count("/"), path))
+    roots: List[str] = []
+    for path in paths:
+        if not any(root == "." or _is_ancestor_descendant_pair(root, path) for root in roots):
+            roots.append(path)
+    return roots
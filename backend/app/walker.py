@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Optional, Union
+
+
+FileItem = Union[str, "os.DirEntry[str]"]
+ErrorCallback = Callable[[Path, OSError], None]
+
+
+@dataclass
+class DirectoryListing:
+    """One directory as seen by a walker engine.
+
+    ``subdirs`` may be pruned in place by the consumer before the walker
+    resumes, mirroring ``os.walk(topdown=True)``. ``files`` holds plain
+    names for the ``os_walk`` engine and ``os.DirEntry`` objects for the
+    scandir-based engines, so callers can reuse the cached metadata.
+
+    A custom lister may instead return a stored result for an unchanged
+    directory: ``files`` is then empty and ``snapshot`` carries whatever
+    it stored. ``stat`` is the directory's own metadata, taken before
+    listing, when the lister needed it.
+    """
+
+    path: Path
+    rel_dir: Path
+    subdirs: List[str]
+    files: List[FileItem]
+    stat: Optional[os.stat_result] = None
+    snapshot: Any = None
+
+
+def iter_os_walk(
+    root: Path,
+    stop_event: Optional[threading.Event] = None,
+) -> Iterator[DirectoryListing]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        if stop_event is not None and stop_event.is_set():
+            return
+        current = Path(dirpath)
+        # ``subdirs`` aliases ``dirnames`` so in-place pruning reaches os.walk.
+        yield DirectoryListing(
+            path=current,
+            rel_dir=current.relative_to(root),
+            subdirs=dirnames,
+            files=list(filenames),
+        )
+
+
+def iter_scandir(
+    root: Path,
+    stop_event: Optional[threading.Event] = None,
+    on_error: Optional[ErrorCallback] = None,
+    lister: Optional["Lister"] = None,
+) -> Iterator[DirectoryListing]:
+    """Depth-first walk built directly on ``os.scandir``.
+
+    Entries are classified from ``d_type`` (``is_dir``/``is_file`` with
+    ``follow_symlinks=False``), so symlinks and special files are dropped
+    without an extra syscall and regular files carry their ``DirEntry``
+    forward for a single cached ``lstat``. The visiting order matches
+    ``os.walk``. ``lister`` replaces :func:`list_directory`.
+    """
+    lister = lister or list_directory
+    stack: List[Path] = [Path(".")]
+    while stack:
+        if stop_event is not None and stop_event.is_set():
+            return
+        rel_dir = stack.pop()
+        current = root / rel_dir if rel_dir != Path(".") else root
+        listing = lister(current, rel_dir, on_error)
+        if listing is None:
+            continue
+        yield listing
+        for name in reversed(listing.subdirs):
+            stack.append(rel_dir / name)
+
+
+def list_directory(
+    current: Path,
+    rel_dir: Path,
+    on_error: Optional[ErrorCallback] = None,
+) -> Optional[DirectoryListing]:
+    subdirs: List[str] = []
+    files: List[FileItem] = []
+    try:
+        with os.scandir(current) as iterator:
+            for entry in iterator:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.is_file(follow_symlinks=False):
+                        files.append(entry)
+                except OSError:
+                    continue
+    except OSError as exc:
+        if on_error is not None:
+            on_error(current, exc)
+        return None
+    return DirectoryListing(path=current, rel_dir=rel_dir, subdirs=subdirs, files=files)
+
+
+Lister = Callable[[Path, Path, Optional[ErrorCallback]], Optional[DirectoryListing]]
+
+
+class ParallelWalker:
+    """Lists directories concurrently from a shared frontier.
+
+    ``workers`` threads pop pending directories (LIFO, to keep the frontier
+    small), list them with :func:`list_directory` and hand the listing to
+    ``visit``. Whatever is left in ``listing.subdirs`` after ``visit``
+    returns is pushed back onto the frontier, so consumers prune exactly as
+    they would with the sequential engines. ``run`` returns once every
+    discovered directory has been visited or the stop event fires, and
+    re-raises the first exception raised by ``visit``. ``lister`` replaces
+    :func:`list_directory`.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        workers: int,
+        stop_event: Optional[threading.Event] = None,
+        on_error: Optional[ErrorCallback] = None,
+        lister: Optional[Lister] = None,
+    ) -> None:
+        self.root = root
+        self._lister = lister or list_directory
+        self.workers = max(1, workers)
+        self._stop_event = stop_event
+        self._on_error = on_error
+        self._frontier: List[Path] = [Path(".")]
+        self._outstanding = 1
+        self._condition = threading.Condition()
+        self._failure: Optional[BaseException] = None
+
+    def run(self, visit: Callable[[DirectoryListing], None]) -> None:
+        threads = [
+            threading.Thread(target=self._work, args=(visit,), name=f"xfs-walk-{index}", daemon=True)
+            for index in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self._failure is not None:
+            raise self._failure
+
+    def _stopped(self) -> bool:
+        if self._failure is not None:
+            return True
+        return self._stop_event is not None and self._stop_event.is_set()
+
+    def _work(self, visit: Callable[[DirectoryListing], None]) -> None:
+        while True:
+            with self._condition:
+                while not self._frontier and self._outstanding > 0 and not self._stopped():
+                    self._condition.wait(timeout=0.1)
+                if self._outstanding == 0 or self._stopped():
+                    self._condition.notify_all()
+                    return
+                rel_dir = self._frontier.pop()
+            children: List[Path] = []
+            try:
+                current = self.root / rel_dir if rel_dir != Path(".") else self.root
+                listing = self._lister(current, rel_dir, self._on_error)
+                if listing is not None:
+                    visit(listing)
+                    children = [rel_dir / name for name in listing.subdirs]
+            except BaseException as exc:  # pylint: disable=broad-except
+                with self._condition:
+                    if self._failure is None:
+                        self._failure = exc
+            with self._condition:
+                self._frontier.extend(reversed(children))
+                self._outstanding += len(children) - 1
+                self._condition.notify_all()
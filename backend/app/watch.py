@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from dataclasses import replace
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .cache import FileHashCache
+from .inotify import InotifyWatcher, WatchBatch, collapse_batch
+from .matcher import PathMatcher
+from .models import DirectoryFingerprint, ScanRequest, StructurePolicy, WarningRecord, WarningType
+from .scanner import (
+    FolderScanner,
+    ScanResult,
+    SimilarityGroup,
+    SimilarPair,
+    _parent_from_relative_path,
+    find_similar_pairs,
+    groups_from_pairs,
+    reaggregate_ancestors,
+)
+
+
+# Quiet period that ends a burst of events, and the longest a burst may be
+# held back before it is applied anyway.
+DEFAULT_SETTLE_SECONDS = 0.5
+DEFAULT_MAX_DELAY_SECONDS = 5.0
+
+PublishCallback = Callable[[List[SimilarityGroup]], None]
+UpdateCallback = Callable[[List[str]], None]
+
+
+def open_watcher(request: ScanRequest, warnings: List[WarningRecord]) -> Optional[InotifyWatcher]:
+    """Start watching ``request.root_path``; None (with a warning) where inotify is unavailable.
+
+    Watches are added before the scan starts, so changes made while it runs
+    are queued by the kernel and applied once it completes.
+    """
+    matcher = PathMatcher(request.include, request.exclude)
+
+    def _error(path: Path, exc: OSError) -> None:
+        warnings.append(WarningRecord(path=path, type=WarningType.IO_ERROR, message=f"Cannot watch: {exc}"))
+
+    try:
+        watcher = InotifyWatcher(request.root_path, prunes=matcher.prunes_subtree, on_error=_error)
+    except OSError as exc:
+        _error(request.root_path, exc)
+        return None
+    watcher.add_tree()
+    return watcher
+
+
+class ScanWatch:
+    """Keeps one completed scan's fingerprints and groups current.
+
+    Each batch of inotify events rescans only the folders it names (their
+    own files) and the subtrees that appeared or disappeared, rebuilds the
+    aggregated fingerprints of those folders and their ancestors, and
+    compares just the changed folders against the rest. Similar pairs
+    between untouched folders carry over from the previous round, so the
+    cost of an update follows the size of the change rather than the tree.
+    A queue overflow re-adds watches for the whole tree and falls back to
+    rescanning the whole root.
+
+    Readers may hold on to the result while an update runs: each update is
+    built on copies and swapped into ``result`` under ``lock``, together
+    with the groups it publishes.
+    """
+
+    def __init__(
+        self,
+        request: ScanRequest,
+        result: ScanResult,
+        pairs: List[SimilarPair],
+        cache: Optional[FileHashCache] = None,
+        publish: Optional[PublishCallback] = None,
+        on_update: Optional[UpdateCallback] = None,
+        stats: Optional[Dict[str, int]] = None,
+        lock: Optional[threading.Lock] = None,
+    ) -> None:
+        self.request = request
+        self.result = result
+        self._lock = lock if lock is not None else threading.Lock()
+        self.cache = cache
+        self._publish = publish
+        self._on_update = on_update
+        self.stats = stats if stats is not None else result.stats
+        self._pairs: Dict[Tuple[str, str], float] = {_pair_key(a, b): similarity for a, b, similarity in pairs}
+        self._children: Dict[str, Set[str]] = defaultdict(set)
+        for key in result.folder_fingerprints:
+            self._link(key)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._watcher: Optional[InotifyWatcher] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, watcher: InotifyWatcher) -> None:
+        self._watcher = watcher
+        self.stats["watch_dirs"] = watcher.watch_count
+        self._thread = threading.Thread(target=self._run, name="xfs-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+
+    def _run(self) -> None:
+        watcher = self._watcher
+        assert watcher is not None
+        try:
+            while not self._stop_event.is_set():
+                batch = watcher.wait(1.0, DEFAULT_SETTLE_SECONDS, DEFAULT_MAX_DELAY_SECONDS)
+                if not batch or self._stop_event.is_set():
+                    continue
+                self.apply(batch)
+                self.stats["watch_dirs"] = watcher.watch_count
+        except Exception as exc:  # pylint: disable=broad-except
+            with self._lock:
+                self.result.warnings.append(
+                    WarningRecord(path=self.request.root_path, type=WarningType.IO_ERROR, message=f"Watch stopped: {exc}")
+                )
+        finally:
+            watcher.close()
+
+    def apply(self, batch: WatchBatch) -> List[str]:
+        """Bring results up to date with ``batch``; return the changed folder keys."""
+        batch = collapse_batch(batch)
+        self.stats["watch_events"] = self.stats.get("watch_events", 0) + batch.events
+        if batch.overflow:
+            self.stats["watch_overflows"] = self.stats.get("watch_overflows", 0) + 1
+            if self._watcher is not None:
+                # Directories created while events were dropped have no
+                # watch yet; add them before the rescan so nothing is missed.
+                self._watcher.add_tree(".")
+
+        current = self.result
+        working = ScanResult(
+            folders=dict(current.folders),
+            fingerprints=dict(current.fingerprints),
+            warnings=[],
+            stats=current.stats,
+            folder_fingerprints=dict(current.folder_fingerprints),
+        )
+        fingerprints = working.fingerprints
+        touched: Set[str] = set()
+        roots: Set[str] = set()
+        for subtree in sorted(batch.subtrees):
+            removed = self._drop(working, subtree)
+            touched.update(removed)
+            rescanned = self._rescan(working, subtree, recursive=True)
+            self.stats["watch_subtrees_rescanned"] = self.stats.get("watch_subtrees_rescanned", 0) + 1
+            if rescanned:
+                touched.update(rescanned)
+                roots.add(subtree)
+            elif removed:
+                parent = _parent_from_relative_path(subtree)
+                if parent is not None:
+                    roots.add(parent)
+        for folder in sorted(batch.folders):
+            if folder not in working.folder_fingerprints:
+                # Excluded, or inside a subtree the scan never reached.
+                continue
+            if self._rescan(working, folder, recursive=False):
+                self.stats["watch_folders_rescanned"] = self.stats.get("watch_folders_rescanned", 0) + 1
+                roots.add(folder)
+        self._detach_ancestors(working, roots)
+        touched.update(
+            reaggregate_ancestors(
+                roots,
+                working.folder_fingerprints,
+                fingerprints,
+                self._children,
+                content_only=self.request.structure_policy == StructurePolicy.CONTENT,
+            )
+        )
+
+        live = {key for key in touched if key in fingerprints}
+        self._pairs = {
+            key: similarity for key, similarity in self._pairs.items() if key[0] not in touched and key[1] not in touched
+        }
+        for a, b, similarity in find_similar_pairs(fingerprints, self.request.similarity_threshold, only=live):
+            self._pairs[_pair_key(a, b)] = similarity
+        groups: Optional[List[SimilarityGroup]] = None
+        if self._publish is not None:
+            pairs = [(a, b, similarity) for (a, b), similarity in self._pairs.items()]
+            groups = groups_from_pairs(pairs, fingerprints, self.request.similarity_threshold, self.request.structure_policy)
+        with self._lock:
+            current.folders = working.folders
+            current.fingerprints = working.fingerprints
+            current.folder_fingerprints = working.folder_fingerprints
+            current.warnings.extend(working.warnings)
+            if groups is not None and self._publish is not None:
+                self._publish(groups)
+
+        changed = sorted(touched)
+        self.stats["watch_updates"] = self.stats.get("watch_updates", 0) + 1
+        self.stats["watch_folders_changed"] = self.stats.get("watch_folders_changed", 0) + len(changed)
+        if self._on_update is not None:
+            self._on_update(changed)
+        return changed
+
+    def _rescan(self, working: ScanResult, rel_dir: str, recursive: bool) -> List[str]:
+        scanner = FolderScanner(self.request, cache=self.cache, stop_event=self._stop_event)
+        try:
+            rescanned = scanner.scan(subtree=rel_dir, recursive=recursive)
+        except FileNotFoundError:
+            # Gone already; the event for its removal updates the parent.
+            return []
+        working.warnings.extend(rescanned.warnings)
+        working.fingerprints.update(rescanned.fingerprints)
+        working.folders.update(rescanned.folders)
+        working.folder_fingerprints.update(rescanned.folder_fingerprints)
+        for key in rescanned.folder_fingerprints:
+            self._link(key)
+        return list(rescanned.fingerprints)
+
+    def _drop(self, working: ScanResult, rel_dir: str) -> List[str]:
+        """Forget ``rel_dir`` and everything below it."""
+        removed: List[str] = []
+        stack = [rel_dir] if rel_dir in working.folder_fingerprints else []
+        while stack:
+            key = stack.pop()
+            removed.append(key)
+            stack.extend(self._children.pop(key, ()))
+            working.fingerprints.pop(key, None)
+            working.folders.pop(key, None)
+            working.folder_fingerprints.pop(key, None)
+        parent = _parent_from_relative_path(rel_dir)
+        if parent is not None:
+            self._children.get(parent, set()).discard(rel_dir)
+        return removed
+
+    @staticmethod
+    def _detach_ancestors(working: ScanResult, roots: Set[str]) -> None:
+        """Give ``roots`` and their ancestors their own ``FolderInfo``.
+
+        Aggregation updates folder totals in place; the published result
+        keeps the old objects.
+        """
+        seen: Set[str] = set()
+        for key in roots:
+            current: Optional[str] = key
+            while current is not None and current not in seen:
+                seen.add(current)
+                own = working.folder_fingerprints.get(current)
+                if own is not None:
+                    info = replace(own.folder)
+                    working.folder_fingerprints[current] = DirectoryFingerprint(
+                        folder=info, file_weights=own.file_weights, locations=own.locations
+                    )
+                    working.folders[current] = info
+                current = _parent_from_relative_path(current)
+
+    def _link(self, key: str) -> None:
+        parent = _parent_from_relative_path(key)
+        if parent is not None:
+            self._children[parent].add(key)
+
+
+def _pair_key(a: str, b: str) -> Tuple[str, str]:
+    return (a, b) if a <= b else (b, a)
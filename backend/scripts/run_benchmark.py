@@ -23,11 +23,18 @@ if str(BACKEND_ROOT) not in sys.path:
 from app.config import AppConfig  # noqa: E402
 from app.models import (  # noqa: E402
     FileEqualityMode,
+    HashAlgorithm,
+    HashBackend,
+    HashSchedule,
+    HashStrategy,
+    RemoteShard,
     ScanRequest,
     ScanStatus,
     StructurePolicy,
+    WalkerEngine,
 )
 from app.domain import FolderInfo  # noqa: E402
+from app.scanner import FolderScanner  # noqa: E402
 from app.store import ScanJob, ScanManager  # noqa: E402
 from app.system import read_resource_stats  # noqa: E402
 
@@ -42,6 +49,14 @@ def parse_args() -> argparse.Namespace:
         default=REPO_ROOT / "test_mockup",
         help="Directory to scan (default: %(default)s)",
     )
+    parser.add_argument(
+        "--additional-root",
+        dest="additional_roots",
+        type=Path,
+        action="append",
+        default=[],
+        help="Further directory scanned concurrently with --target and grouped with it (repeatable)",
+    )
     parser.add_argument(
         "--config-dir",
         type=Path,
@@ -60,6 +75,17 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="Optional override for scanner concurrency",
     )
+    parser.add_argument(
+        "--adaptive-concurrency",
+        action="store_true",
+        help="Let the scanner tune stat/hash concurrency from observed throughput and latency",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=256,
+        help="Upper bound for --adaptive-concurrency (default: %(default)s)",
+    )
     parser.add_argument(
         "--similarity-threshold",
         type=float,
@@ -80,6 +106,176 @@ def parse_args() -> argparse.Namespace:
         default=StructurePolicy.RELATIVE.value,
         help="Structure policy (default: %(default)s)",
     )
+    parser.add_argument(
+        "--walker",
+        type=str,
+        choices=[engine.value for engine in WalkerEngine],
+        default=WalkerEngine.OS_WALK.value,
+        help="Directory walker engine for the main run (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--traversal-workers",
+        type=int,
+        default=None,
+        help="Directory listing threads for the parallel walker (default: scanner concurrency)",
+    )
+    parser.add_argument(
+        "--compare-walkers",
+        action="store_true",
+        help="Run a walk-only pass per walker engine and report files/s for each",
+    )
+    parser.add_argument(
+        "--hash-backend",
+        type=str,
+        choices=[backend.value for backend in HashBackend],
+        default=HashBackend.THREAD.value,
+        help="Where sha256 digests are computed (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--hash-processes",
+        type=int,
+        default=None,
+        help="Worker processes for --hash-backend process (default: CPU count)",
+    )
+    parser.add_argument(
+        "--hash-algorithm",
+        type=str,
+        choices=[algorithm.value for algorithm in HashAlgorithm],
+        default=HashAlgorithm.SHA256.value,
+        help="Content digest algorithm for hashing modes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--digest-size",
+        type=int,
+        default=None,
+        help="Digest length in bytes (default: the algorithm's full length)",
+    )
+    parser.add_argument(
+        "--compare-hash-algorithms",
+        action="store_true",
+        help="Run an uncached hashing pass per digest algorithm and report MiB/s for each",
+    )
+    parser.add_argument(
+        "--hash-strategy",
+        type=str,
+        choices=[strategy.value for strategy in HashStrategy],
+        default=HashStrategy.READINTO.value,
+        help="How hashed files are read (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--compare-hash-strategies",
+        action="store_true",
+        help="Run an uncached hashing pass per read strategy and report MiB/s and peak RSS for each",
+    )
+    parser.add_argument(
+        "--low-footprint-io",
+        action="store_true",
+        help="Hash with O_NOATIME and page-cache hints that drop each file after reading",
+    )
+    parser.add_argument(
+        "--prefetch-next",
+        action="store_true",
+        help="Ask the kernel to read ahead the next queued file while one is hashed",
+    )
+    parser.add_argument(
+        "--tree-hash-threshold-mib",
+        type=float,
+        default=None,
+        help="Tree-hash files of at least this many MiB over parallel leaves",
+    )
+    parser.add_argument(
+        "--tree-leaf-mib",
+        type=float,
+        default=64,
+        help="Leaf size for --tree-hash-threshold-mib (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--verify-groups",
+        action="store_true",
+        help="With name_size, hash only identical/near-duplicate group members after grouping",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reuse stored per-folder results for unchanged directories (rerun with the same --config-dir)",
+    )
+    parser.add_argument(
+        "--checkpoint-seconds",
+        type=float,
+        default=None,
+        help="Write a resumable checkpoint at most every N seconds (default off)",
+    )
+    parser.add_argument(
+        "--shard-processes",
+        type=int,
+        default=None,
+        help="Scan top-level subtrees on N worker processes (default off)",
+    )
+    parser.add_argument(
+        "--remote-shard",
+        dest="remote_shards",
+        action="append",
+        default=[],
+        metavar="URL=SUBTREE[:PATH]",
+        help="Have the xfolder instance at URL scan SUBTREE of the target, found at PATH on that node (repeatable)",
+    )
+    parser.add_argument(
+        "--max-read-mib-per-second",
+        type=float,
+        default=None,
+        help="Limit hashed bytes per second (default unlimited)",
+    )
+    parser.add_argument(
+        "--max-opens-per-second",
+        type=int,
+        default=None,
+        help="Limit file stats and opens per second (default unlimited)",
+    )
+    parser.add_argument(
+        "--idle-io-priority",
+        action="store_true",
+        help="Run scan workers in the idle I/O scheduling class (Linux)",
+    )
+    parser.add_argument(
+        "--pause-load-average",
+        type=float,
+        default=None,
+        help="Pause stats and reads while the 1-minute load average is above this",
+    )
+    parser.add_argument(
+        "--pause-io-pressure",
+        type=float,
+        default=None,
+        help="Pause stats and reads while /proc/pressure/io 'some avg10' is above this percentage",
+    )
+    parser.add_argument(
+        "--chunk-avg-kib",
+        type=int,
+        default=1024,
+        help="Mean chunk size for --file-equality chunks (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--hash-schedule",
+        choices=[schedule.value for schedule in HashSchedule],
+        default=HashSchedule.FIFO.value,
+        help="Order in which queued files are hashed (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--per-device-concurrency",
+        type=int,
+        default=2,
+        help="Concurrent hash reads per device with --hash-schedule device (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--lazy-hashing",
+        action="store_true",
+        help="In sha256 mode, only hash files whose name and size collide with another file",
+    )
+    parser.add_argument(
+        "--no-sampled-full-hash",
+        action="store_true",
+        help="In sampled mode, stop at block digests instead of fully hashing sample matches",
+    )
     parser.add_argument(
         "--force-case-insensitive",
         action="store_true",
@@ -148,6 +344,14 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+def _parse_remote_shard(value: str) -> RemoteShard:
+    url, sep, rest = value.partition("=")
+    if not sep or not rest:
+        raise SystemExit(f"--remote-shard expects URL=SUBTREE[:PATH], got {value!r}")
+    subtree, _sep, path = rest.partition(":")
+    return RemoteShard(worker_url=url, subtree=subtree, path=Path(path) if path else None)
+
+
 def wait_for_completion(
     manager: ScanManager,
     job: ScanJob,
@@ -417,9 +621,30 @@ def summarize(job: ScanJob) -> Dict[str, Any]:
             if not prev or entry["rss_bytes"] > prev["rss_bytes"]:
                 phase_peaks[phase_name] = entry
 
+    walking_rate = None
+    walking_bytes_rate = None
+    walking_timing = job.phase_timings.get("walking")
+    if walking_timing and walking_timing.duration_seconds:
+        walking_rate = job.stats.get("files_scanned", 0) / walking_timing.duration_seconds
+        walking_bytes_rate = job.stats.get("bytes_scanned", 0) / walking_timing.duration_seconds
+
     return {
         "scan_id": job.scan_id,
         "root_path": str(job.request.root_path),
+        "additional_roots": [str(root) for root in job.request.additional_roots],
+        "walker": job.request.walker.value,
+        "walking_files_per_second": walking_rate,
+        "walking_bytes_per_second": walking_bytes_rate,
+        "hash_backend": job.request.hash_backend.value,
+        "file_equality": job.request.file_equality.value,
+        "hash_schedule": job.request.hash_schedule.value,
+        # Bytes actually read for hashing vs. what a full sha256 pass would read.
+        "bytes_hashed": job.stats.get("bytes_hashed", 0),
+        "hash_read_ratio": (
+            job.stats.get("bytes_hashed", 0) / job.stats["bytes_scanned"]
+            if job.stats.get("bytes_scanned")
+            else None
+        ),
         "started_at": job.started_at.isoformat(),
         "completed_at": job.completed_at.isoformat() if job.completed_at else None,
         "total_duration_seconds": total_duration,
@@ -434,6 +659,123 @@ def summarize(job: ScanJob) -> Dict[str, Any]:
     }
 
 
+def compare_walkers(request: ScanRequest) -> List[Dict[str, Any]]:
+    """Time the walking phase alone for every walker engine.
+
+    Each pass runs a bare ``FolderScanner`` in ``name_size`` mode without a
+    hash cache, so the figure isolates listing + stat throughput. The clock
+    stops when the scanner hands over to the aggregation phase.
+    """
+    results: List[Dict[str, Any]] = []
+    for engine in WalkerEngine:
+        walk_request = request.copy(update={"walker": engine, "file_equality": FileEqualityMode.NAME_SIZE})
+        marks: Dict[str, float] = {}
+
+        def _on_phase(name: str) -> None:
+            marks.setdefault(name, time.perf_counter())
+
+        scanner = FolderScanner(walk_request, phase_callback=_on_phase)
+        started = time.perf_counter()
+        result = scanner.scan()
+        walk_seconds = marks.get("aggregating", time.perf_counter()) - started
+        files = result.stats.get("files_scanned", 0)
+        results.append(
+            {
+                "walker": engine.value,
+                "files": files,
+                "folders": result.stats.get("folders_scanned", 0),
+                "walk_seconds": walk_seconds,
+                "files_per_second": files / walk_seconds if walk_seconds > 0 else None,
+            }
+        )
+    return results
+
+
+HASH_ALGORITHM_VARIANTS = [
+    (HashAlgorithm.SHA256, None),
+    (HashAlgorithm.SHA256, 16),
+    (HashAlgorithm.BLAKE2B, None),
+    (HashAlgorithm.BLAKE2B, 16),
+]
+
+
+def compare_hash_algorithms(request: ScanRequest) -> List[Dict[str, Any]]:
+    """Hash the whole tree once per digest algorithm/length.
+
+    Passes run without a hash cache and with eager hashing so every pass
+    reads the same bytes; the figure is digest throughput over the scan.
+    """
+    results: List[Dict[str, Any]] = []
+    for algorithm, digest_size in HASH_ALGORITHM_VARIANTS:
+        hash_request = request.copy(
+            update={
+                "file_equality": FileEqualityMode.SHA256,
+                "lazy_hashing": False,
+                "hash_algorithm": algorithm,
+                "digest_size": digest_size,
+            }
+        )
+        started = time.perf_counter()
+        result = FolderScanner(hash_request).scan()
+        seconds = time.perf_counter() - started
+        hashed = result.stats.get("bytes_hashed", 0)
+        results.append(
+            {
+                "algorithm": algorithm.value if digest_size is None else f"{algorithm.value}-{digest_size}",
+                "bytes_hashed": hashed,
+                "seconds": seconds,
+                "mebibytes_per_second": hashed / (1024 ** 2) / seconds if seconds > 0 else None,
+            }
+        )
+    return results
+
+
+def compare_hash_strategies(request: ScanRequest, sample_interval: float = 0.02) -> List[Dict[str, Any]]:
+    """Hash the whole tree once per read strategy, sampling RSS meanwhile.
+
+    ``peak_rss_delta_bytes`` is the highest RSS seen during the pass minus
+    the RSS right before it, which isolates buffer churn from the baseline.
+    """
+    results: List[Dict[str, Any]] = []
+    for strategy in HashStrategy:
+        hash_request = request.copy(
+            update={"file_equality": FileEqualityMode.SHA256, "lazy_hashing": False, "hash_strategy": strategy}
+        )
+        gc.collect()
+        baseline = read_resource_stats().process_rss_bytes or 0
+        peak = baseline
+        done = threading.Event()
+
+        def _sample() -> None:
+            nonlocal peak
+            while not done.is_set():
+                rss = read_resource_stats().process_rss_bytes or 0
+                peak = max(peak, rss)
+                done.wait(sample_interval)
+
+        sampler = threading.Thread(target=_sample, daemon=True)
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            result = FolderScanner(hash_request).scan()
+        finally:
+            seconds = time.perf_counter() - started
+            done.set()
+            sampler.join()
+        hashed = result.stats.get("bytes_hashed", 0)
+        results.append(
+            {
+                "strategy": strategy.value,
+                "bytes_hashed": hashed,
+                "seconds": seconds,
+                "mebibytes_per_second": hashed / (1024 ** 2) / seconds if seconds > 0 else None,
+                "peak_rss_bytes": peak,
+                "peak_rss_delta_bytes": max(0, peak - baseline),
+            }
+        )
+    return results
+
+
 def save_summary(summary: Dict[str, Any], job: ScanJob, directory: Path) -> Path:
     directory.mkdir(parents=True, exist_ok=True)
     started_at = job.started_at.isoformat().replace(":", "").replace("-", "").replace("+", "").replace(".", "")
@@ -449,6 +791,12 @@ def print_summary(summary: Dict[str, Any]) -> None:
     print(f"Root Path: {summary['root_path']}")
     if summary["total_duration_seconds"] is not None:
         print(f"Total Duration: {summary['total_duration_seconds']:.2f}s")
+    walking_rate = summary.get("walking_files_per_second")
+    if walking_rate is not None:
+        print(f"Walking throughput ({summary.get('walker')}): {walking_rate:,.0f} files/s")
+    bytes_rate = summary.get("walking_bytes_per_second")
+    if bytes_rate is not None:
+        print(f"Walking byte rate (hash backend {summary.get('hash_backend')}): {bytes_rate / (1024 ** 2):,.1f} MiB/s")
     stats = summary.get("stats") or {}
     print(
         "Stats: files={files} folders={folders} discovered={discovered}".format(
@@ -457,6 +805,71 @@ def print_summary(summary: Dict[str, Any]) -> None:
             discovered=stats.get("folders_discovered", 0),
         )
     )
+    if stats.get("files_hash_skipped"):
+        print(
+            "Lazy hashing skipped: {files} files / {mib:.1f} MiB".format(
+                files=stats.get("files_hash_skipped", 0),
+                mib=stats.get("bytes_hash_skipped", 0) / (1024 ** 2),
+            )
+        )
+    ratio = summary.get("hash_read_ratio")
+    if ratio is not None and summary.get("file_equality") != FileEqualityMode.NAME_SIZE.value:
+        print(
+            "Hash reads ({mode}): {read:.1f} MiB vs {full:.1f} MiB for full hashing ({ratio:.1%})".format(
+                mode=summary.get("file_equality"),
+                read=summary.get("bytes_hashed", 0) / (1024 ** 2),
+                full=stats.get("bytes_scanned", 0) / (1024 ** 2),
+                ratio=ratio,
+            )
+        )
+    stage_limits = {
+        key[: -len("_concurrency")]: value for key, value in stats.items() if key.endswith("_concurrency")
+    }
+    if stage_limits:
+        print(
+            "Stage concurrency: "
+            + ", ".join(f"{name}={value}" for name, value in sorted(stage_limits.items()))
+        )
+    if "verify_groups_checked" in stats:
+        print(
+            "Verification: {checked} groups checked, {changed} changed, {mib:.1f} MiB hashed".format(
+                checked=stats["verify_groups_checked"],
+                changed=stats.get("verify_groups_changed", 0),
+                mib=stats.get("verify_bytes_hashed", 0) / (1024 ** 2),
+            )
+        )
+    if "folders_reused" in stats:
+        print(
+            "Incremental: {folders} folder(s) reused, {files} file(s) / {mib:.1f} MiB not re-read".format(
+                folders=stats["folders_reused"],
+                files=stats.get("files_reused", 0),
+                mib=stats.get("bytes_reused", 0) / (1024 ** 2),
+            )
+        )
+    if "checkpoints_written" in stats:
+        print(
+            "Checkpoints: {count} written, {seconds:.2f}s, {mib:.1f} MiB".format(
+                count=stats["checkpoints_written"],
+                seconds=stats.get("checkpoint_ms", 0) / 1000,
+                mib=stats.get("checkpoint_bytes", 0) / (1024 ** 2),
+            )
+        )
+    if "throttle_wait_ms" in stats or "throttle_pauses" in stats:
+        print(
+            "Throttle: {wait:.1f}s rate-limited, {pauses} pause(s) for {paused:.1f}s".format(
+                wait=stats.get("throttle_wait_ms", 0) / 1000,
+                pauses=stats.get("throttle_pauses", 0),
+                paused=stats.get("throttle_paused_ms", 0) / 1000,
+            )
+        )
+    if "chunks_indexed" in stats:
+        print(f"Chunks indexed: {stats['chunks_indexed']}")
+    if "files_tree_hashed" in stats:
+        print(f"Tree-hashed files: {stats['files_tree_hashed']}")
+    if "hash_devices" in stats:
+        print(f"Device schedule: {stats['hash_devices']} device(s)")
+    if "hash_tail_ms" in stats:
+        print(f"Hash tail ({summary.get('hash_schedule')}): {stats['hash_tail_ms'] / 1000:.2f}s")
     print("Phase Timings:")
     for phase in summary["phase_timings"]:
         duration = phase["duration_seconds"]
@@ -544,6 +957,30 @@ def print_summary(summary: Dict[str, Any]) -> None:
             for stat in stats:
                 size_mb = stat["size_bytes"] / (1024 ** 2)
                 print(f"    - {stat['location']}: {size_mb:.2f} MiB ({stat['count']} allocs)")
+    walker_runs = summary.get("walker_comparison") or []
+    if walker_runs:
+        print("Walker comparison (walking phase only):")
+        for entry in walker_runs:
+            rate = entry.get("files_per_second")
+            rate_text = f"{rate:,.0f} files/s" if rate is not None else "n/a"
+            print(f"  - {entry['walker']}: {rate_text} ({entry['files']} files in {entry['walk_seconds']:.2f}s)")
+    algorithm_runs = summary.get("hash_algorithm_comparison") or []
+    if algorithm_runs:
+        print("Hash algorithm comparison (uncached full hashing):")
+        for entry in algorithm_runs:
+            rate = entry.get("mebibytes_per_second")
+            rate_text = f"{rate:,.1f} MiB/s" if rate is not None else "n/a"
+            print(f"  - {entry['algorithm']}: {rate_text} ({entry['seconds']:.2f}s)")
+    strategy_runs = summary.get("hash_strategy_comparison") or []
+    if strategy_runs:
+        print("Hash read strategy comparison (uncached full hashing):")
+        for entry in strategy_runs:
+            rate = entry.get("mebibytes_per_second")
+            rate_text = f"{rate:,.1f} MiB/s" if rate is not None else "n/a"
+            print(
+                f"  - {entry['strategy']}: {rate_text}, peak RSS {entry['peak_rss_bytes'] / (1024 ** 2):.1f} MiB "
+                f"(+{entry['peak_rss_delta_bytes'] / (1024 ** 2):.1f} MiB)"
+            )
     progress_samples = summary.get("progress_samples") or []
     if progress_samples:
         print(f"Progress samples captured: {len(progress_samples)}")
@@ -568,6 +1005,7 @@ def main() -> None:
 
     request = ScanRequest(
         root_path=target,
+        additional_roots=[root.expanduser().resolve() for root in args.additional_roots],
         include=[],
         exclude=[],
         similarity_threshold=args.similarity_threshold,
@@ -575,6 +1013,38 @@ def main() -> None:
         structure_policy=StructurePolicy(args.structure_policy),
         force_case_insensitive=args.force_case_insensitive,
         concurrency=args.concurrency,
+        adaptive_concurrency=args.adaptive_concurrency,
+        max_concurrency=args.max_concurrency,
+        walker=WalkerEngine(args.walker),
+        traversal_workers=args.traversal_workers,
+        hash_backend=HashBackend(args.hash_backend),
+        hash_processes=args.hash_processes,
+        lazy_hashing=args.lazy_hashing,
+        sampled_full_hash=not args.no_sampled_full_hash,
+        hash_algorithm=HashAlgorithm(args.hash_algorithm),
+        digest_size=args.digest_size,
+        hash_strategy=HashStrategy(args.hash_strategy),
+        low_footprint_io=args.low_footprint_io,
+        prefetch_next=args.prefetch_next,
+        hash_schedule=HashSchedule(args.hash_schedule),
+        per_device_concurrency=args.per_device_concurrency,
+        tree_hash_threshold=(
+            int(args.tree_hash_threshold_mib * 1024 ** 2) if args.tree_hash_threshold_mib is not None else None
+        ),
+        tree_leaf_size=int(args.tree_leaf_mib * 1024 ** 2),
+        chunk_avg_size=args.chunk_avg_kib * 1024,
+        verify_groups=args.verify_groups,
+        max_read_bytes_per_second=(
+            int(args.max_read_mib_per_second * 1024 ** 2) if args.max_read_mib_per_second is not None else None
+        ),
+        max_opens_per_second=args.max_opens_per_second,
+        idle_io_priority=args.idle_io_priority,
+        pause_load_average=args.pause_load_average,
+        pause_io_pressure=args.pause_io_pressure,
+        incremental=args.incremental,
+        checkpoint_interval_seconds=args.checkpoint_seconds,
+        shard_processes=args.shard_processes,
+        remote_shards=[_parse_remote_shard(value) for value in args.remote_shards],
         deletion_enabled=False,
         include_matrix=args.include_matrix,
         include_treemap=args.include_treemap,
@@ -665,6 +1135,12 @@ def main() -> None:
 
     summary = summarize(final_job)
     summary["structure_metrics"] = collect_structure_metrics(final_job)
+    if args.compare_walkers:
+        summary["walker_comparison"] = compare_walkers(request)
+    if args.compare_hash_algorithms:
+        summary["hash_algorithm_comparison"] = compare_hash_algorithms(request)
+    if args.compare_hash_strategies:
+        summary["hash_strategy_comparison"] = compare_hash_strategies(request)
     if progress_samples:
         summary["progress_samples"] = progress_samples
     if phase_profiler.records:
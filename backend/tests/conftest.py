@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_configure(config: pytest.Config) -> None:
+    # app.main opens its config directory and hash cache at import time;
+    # keep them under this run's temporary directory, out of the tree.
+    factory: pytest.TempPathFactory = config._tmp_path_factory  # set by pytest's tmp_path plugin
+    os.environ["XFS_CONFIG_PATH"] = str(factory.mktemp("xfs-config"))
@@ -251,6 +251,16 @@ def test_metrics_endpoint(monkeypatch):
     assert "metric" in response.text
 
 
+def test_worker_endpoints_require_worker_mode(monkeypatch, tmp_path):
+    client = TestClient(main_app.app)
+    assert client.get("/api/worker/shards/missing").status_code == 404
+
+    monkeypatch.setattr(main_app.config, "worker_enabled", True, raising=False)
+    assignment = {"request": {"root_path": str(tmp_path)}, "subtree": "media", "path": str(tmp_path)}
+    # No allowed roots are configured here, so every path is refused.
+    assert client.post("/api/worker/shards", json=assignment).status_code == 403
+
+
 def test_cancel_scan_endpoint_invokes_manager(monkeypatch):
     stub = _StubScanManager()
 
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import os
+import pickle
+from pathlib import Path
+
+import pytest
+
+from app import checkpoint as checkpoint_module
+from app import snapshots
+from app.checkpoint import LOG_FILE, ScanCheckpoint
+from app.config import AppConfig
+from app.models import FileEqualityMode, ScanRequest
+from app.scanner import FolderScanner
+from app.store import ScanManager
+
+from .utils import result_weights, wait_for_completion, write_file
+
+
+@pytest.fixture(autouse=True)
+def no_racy_window(monkeypatch) -> None:
+    monkeypatch.setattr(snapshots, "RACY_WINDOW_NS", -10 ** 12)
+
+
+def _tree(root: Path) -> None:
+    for name in ("a", "b", "c"):
+        write_file(root / name / "inner" / "file.txt", name.encode() * 10)
+        write_file(root / name / "top.txt", b"top")
+
+
+
+def _manager(tmp_path: Path) -> ScanManager:
+    config_root = tmp_path / "config"
+    app_config = AppConfig(
+        config_path=config_root,
+        cache_db_path=config_root / "cache.db",
+        log_stream_enabled=False,
+        metrics_enabled=False,
+    )
+    return ScanManager(app_config, executor_workers=1)
+
+
+def test_resume_skips_checkpointed_folders_after_a_torn_write(tmp_path: Path, monkeypatch) -> None:
+    root = tmp_path / "root"
+    _tree(root)
+    request = ScanRequest(root_path=root, file_equality=FileEqualityMode.SHA256, checkpoint_interval_seconds=60)
+    base = tmp_path / "checkpoints"
+    checkpoint = ScanCheckpoint.create(base, "scan1", request)
+    # Write after every folder.
+    monkeypatch.setattr(checkpoint_module, "MAX_CHECKPOINT_OVERHEAD", float("inf"))
+    checkpoint.interval_seconds = 0
+    checkpoint._next_due = 0
+    scanner = FolderScanner(request, checkpoint=checkpoint)
+    scanner.scan()
+    assert checkpoint.checkpoints_written >= 2
+    # Without incremental scans nothing keeps snapshots in memory.
+    assert scanner._snapshots == {}
+
+    # Keep the first record and half of the second, as a crash would.
+    log_path = base / "scan1" / LOG_FILE
+    data = log_path.read_bytes()
+    first = int.from_bytes(data[:8], "little")
+    kept = len(pickle.loads(data[8 : 8 + first]))
+    offset = 8 + first
+    log_path.write_bytes(data[: offset + 12])
+
+    listed = []
+    original = os.scandir
+
+    def tracking_scandir(path="."):
+        if root in Path(path).parents or Path(path) == root:
+            listed.append(path)
+        return original(path)
+
+    monkeypatch.setattr(os, "scandir", tracking_scandir)
+    resumed = ScanCheckpoint.open(base, "scan1")
+    result = FolderScanner(request, checkpoint=resumed).scan()
+
+    assert result.stats["checkpoint_folders_restored"] == kept
+    assert result.stats["folders_reused"] == kept
+    assert len(listed) == 7 - kept
+    assert log_path.stat().st_size > offset
+    monkeypatch.setattr(os, "scandir", original)
+    assert result_weights(result) == result_weights(FolderScanner(request).scan())
+
+
+def test_manager_lists_and_resumes_interrupted_scans(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    _tree(root)
+    request = ScanRequest(root_path=root, checkpoint_interval_seconds=1)
+
+    manager = _manager(tmp_path)
+    try:
+        job = manager.start_scan(request)
+        wait_for_completion(manager, job.scan_id)
+        # Finished scans leave nothing to resume.
+        assert manager.list_checkpoints() == []
+        assert "checkpointing" in [timing.phase for timing in manager.get_metrics(job.scan_id).phase_timings]
+    finally:
+        manager.shutdown()
+
+    # A process that died after checkpointing part of the tree.
+    checkpoint = ScanCheckpoint.create(tmp_path / "config" / "checkpoints", "deadbeef0001", request)
+    FolderScanner(request, checkpoint=checkpoint).scan(subtree="a")
+
+    manager = _manager(tmp_path)
+    try:
+        [info] = manager.list_checkpoints()
+        assert info.scan_id == "deadbeef0001"
+        assert info.folders_completed == 2
+        job = manager.resume_scan("deadbeef0001")
+        wait_for_completion(manager, job.scan_id)
+        assert job.scan_id == "deadbeef0001"
+        assert job.result.folders["."].file_count == 6
+        assert manager.list_checkpoints() == []
+    finally:
+        manager.shutdown()
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+from app.cache import FileHashCache
+from app.hashing import MAX_CHUNKS_PER_FILE, DigestSpec, decode_chunks, encode_chunks, hash_file
+from app.models import ScanRequest
+from app.scanner import FolderScanner, weighted_jaccard
+
+from .utils import write_file
+
+
+def _payload(size: int, seed: int = 7) -> bytes:
+    rng = random.Random(seed)
+    return bytes(rng.getrandbits(8) for _ in range(size))
+
+
+def _chunks(path: Path, spec: DigestSpec):
+    stat = path.stat()
+    outcome = hash_file(str(path), stat.st_size, stat.st_mtime, spec)
+    assert outcome.stable
+    return decode_chunks(outcome.digest)
+
+
+def test_chunk_boundaries_resynchronise_after_an_insertion(tmp_path: Path) -> None:
+    data = _payload(256 * 1024)
+    original = tmp_path / "a.bin"
+    edited = tmp_path / "b.bin"
+    original.write_bytes(data)
+    edited.write_bytes(data[:1000] + b"inserted" + data[1000:])
+    spec = DigestSpec(chunk_avg_size=8 * 1024)
+
+    before = _chunks(original, spec)
+    after = _chunks(edited, spec)
+
+    assert sum(length for _digest, length in before) == len(data)
+    assert all(length <= 8 * 8 * 1024 for _digest, length in before)
+    shared = {digest for digest, _ in before} & {digest for digest, _ in after}
+    assert len(shared) >= len(before) - 2
+    assert decode_chunks(encode_chunks(before)) == before
+    assert spec.tag_for(len(data)) == "sha256-runs8192"
+
+
+def test_chunks_mode_scores_shared_chunks_and_caches_chunk_lists(tmp_path: Path) -> None:
+    root = tmp_path / "backups"
+    data = _payload(200 * 1024)
+    write_file(root / "monday" / "vm.img", data)
+    write_file(root / "tuesday" / "vm.img", data[:5000] + b"one changed block" + data[5000:])
+    cache = FileHashCache(tmp_path / "cache.db")
+    request = ScanRequest(root_path=root, file_equality="chunks", chunk_avg_size=4096)
+
+    chunked = FolderScanner(request, cache=cache).scan()
+    rescan = FolderScanner(request, cache=cache).scan()
+    whole = FolderScanner(ScanRequest(root_path=root, file_equality="sha256")).scan()
+
+    def similarity(result) -> float:
+        return weighted_jaccard(result.fingerprints["monday"].file_weights, result.fingerprints["tuesday"].file_weights)
+
+    assert similarity(whole) == 0
+    assert similarity(chunked) > 0.8
+    assert chunked.stats["chunks_indexed"] > 2
+    assert all("#c:" in identity for identity in chunked.fingerprints["monday"].file_weights)
+    assert rescan.stats.get("bytes_hashed", 0) == 0
+    assert rescan.fingerprints["monday"].file_weights == chunked.fingerprints["monday"].file_weights
+
+
+def test_small_files_get_one_digest_and_large_files_longer_chunks(tmp_path: Path) -> None:
+    spec = DigestSpec(chunk_avg_size=4096)
+    small = tmp_path / "small.bin"
+    small.write_bytes(_payload(4 * 4096 - 1))
+    stat = small.stat()
+
+    outcome = hash_file(str(small), stat.st_size, stat.st_mtime, spec)
+
+    assert len(outcome.digest) == 64
+    assert spec.tag_for(stat.st_size) == "sha256"
+    assert spec.chunk_avg_for(4096 * MAX_CHUNKS_PER_FILE) == 4096
+    assert spec.chunk_avg_for(4096 * MAX_CHUNKS_PER_FILE + 1) == 8192
+    assert spec.tag_for(4096 * MAX_CHUNKS_PER_FILE * 3) == "sha256-runs16384"
+
+
+def test_lazy_chunks_mode_skips_files_with_unique_names(tmp_path: Path) -> None:
+    root = tmp_path / "backups"
+    data = _payload(64 * 1024)
+    write_file(root / "monday" / "vm.img", data)
+    write_file(root / "tuesday" / "vm.img", data[:5000] + b"one changed block" + data[5000:])
+    write_file(root / "monday" / "notes.bin", _payload(64 * 1024, seed=3))
+    request = ScanRequest(root_path=root, file_equality="chunks", chunk_avg_size=4096, lazy_hashing=True)
+
+    result = FolderScanner(request).scan()
+
+    assert result.stats["bytes_hashed"] == 2 * len(data) + len(b"one changed block")
+    assert "notes.bin:65536" in result.fingerprints["monday"].file_weights
+    monday = result.fingerprints["monday"].file_weights
+    tuesday = result.fingerprints["tuesday"].file_weights
+    assert sum(monday[identity] for identity in monday.keys() & tuesday.keys()) > len(data) // 2
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+
+from app.concurrency import ConcurrencyController
+from app.config import AppConfig
+from app.models import ScanRequest, ScanStatus
+from app.scanner import FolderScanner
+from app.store import ScanManager
+
+from .utils import write_file
+
+
+def _drive(controller: ConcurrencyController, operation, seconds: float, threads: int = 48) -> None:
+    deadline = time.perf_counter() + seconds
+
+    def _loop() -> None:
+        while time.perf_counter() < deadline:
+            with controller.slot():
+                operation()
+
+    workers = [threading.Thread(target=_loop) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def test_controller_grows_for_latency_bound_operations() -> None:
+    changes = []
+    controller = ConcurrencyController(
+        "stat", initial=1, minimum=1, maximum=32, window_seconds=0.02, on_change=lambda *args: changes.append(args)
+    )
+
+    _drive(controller, lambda: time.sleep(0.002), seconds=1.0)
+
+    assert controller.limit >= 8
+    assert changes and changes[-1][0] == "stat"
+
+
+def test_controller_backs_off_from_a_saturated_device() -> None:
+    device = threading.Semaphore(2)
+
+    def saturated() -> None:
+        with device:
+            time.sleep(0.002)
+
+    controller = ConcurrencyController("hash", initial=32, minimum=1, maximum=32, window_seconds=0.02)
+
+    _drive(controller, saturated, seconds=1.0)
+
+    assert controller.limit < 32
+
+
+def test_adaptive_scan_exposes_stage_concurrency(tmp_path: Path) -> None:
+    root = tmp_path / "tree"
+    for index in range(40):
+        write_file(root / f"d{index % 4}" / f"f{index}.bin", bytes([index]) * 32)
+    config_root = tmp_path / "config"
+    app_config = AppConfig(
+        config_path=config_root,
+        cache_db_path=config_root / "cache.db",
+        log_stream_enabled=False,
+        metrics_enabled=False,
+    )
+    request = ScanRequest(
+        root_path=root,
+        file_equality="sha256",
+        adaptive_concurrency=True,
+        concurrency=4,
+        max_concurrency=64,
+    )
+    baseline = FolderScanner(request.copy(update={"adaptive_concurrency": False})).scan()
+    manager = ScanManager(app_config, executor_workers=1)
+    try:
+        job = manager.start_scan(request)
+        deadline = time.time() + 10
+        while time.time() < deadline and job.status != ScanStatus.COMPLETED:
+            time.sleep(0.05)
+        assert job.status == ScanStatus.COMPLETED
+
+        metrics = manager.get_metrics(job.scan_id)
+        assert metrics.adaptive_concurrency is True
+        assert metrics.stage_concurrency == {"stat": job.stats["stat_concurrency"], "hash": job.stats["hash_concurrency"]}
+        assert 1 <= metrics.stage_concurrency["stat"] <= 64
+        assert job.result.stats["files_scanned"] == baseline.stats["files_scanned"] == 40
+    finally:
+        manager.shutdown()
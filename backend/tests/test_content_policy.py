@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+from app.models import ScanRequest
+from app.scanner import (
+    FolderScanner,
+    compute_fingerprint_diff,
+    compute_similarity_groups,
+    fingerprint_entries,
+    weighted_jaccard,
+)
+
+from .utils import write_file
+
+
+def _build_tree(root: Path) -> None:
+    write_file(root / "original" / "photos" / "beach.jpg", b"sand" * 100)
+    write_file(root / "original" / "notes.txt", b"remember the sunscreen")
+    write_file(root / "original" / "draft.txt", b"first draft")
+    write_file(root / "renamed" / "2024" / "IMG_0001.jpg", b"sand" * 100)
+    write_file(root / "renamed" / "notes-final.txt", b"remember the sunscreen")
+    write_file(root / "renamed" / "draft.txt", b"second draft")
+
+
+def test_content_policy_matches_renamed_and_moved_files(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    _build_tree(root)
+
+    relative = FolderScanner(ScanRequest(root_path=root, file_equality="sha256")).scan()
+    content = FolderScanner(
+        ScanRequest(root_path=root, file_equality="sha256", structure_policy="content")
+    ).scan()
+
+    def similarity(result) -> float:
+        return weighted_jaccard(
+            result.fingerprints["original"].file_weights, result.fingerprints["renamed"].file_weights
+        )
+
+    assert similarity(relative) < 0.1
+    assert similarity(content) > 0.9
+    groups = compute_similarity_groups(content.fingerprints, 0.9, structure_policy="content")
+    assert any({"original", "renamed"} <= {m.relative_path for m in group.members} for group in groups)
+
+    original = content.fingerprints["original"]
+    renamed = content.fingerprints["renamed"]
+    shared = set(original.file_weights) & set(renamed.file_weights)
+    # One string object per distinct identity, shared across fingerprints.
+    for identity in shared:
+        other = next(key for key in renamed.file_weights if key == identity)
+        assert other is identity
+    assert fingerprint_entries(original)["photos/beach.jpg"] == 400
+    # Ancestors link their subfolders' paths instead of copying them.
+    photos = content.fingerprints["original/photos"].locations
+    assert original.locations.children == (("photos", photos),)
+    assert content.fingerprints["."].locations.own == {}
+    beach = next(iter(photos.own))
+    assert content.fingerprints["."].locations.flatten()[beach] == "original/photos/beach.jpg"
+
+
+def test_content_diff_reports_moves_and_edits(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    _build_tree(root)
+    result = FolderScanner(
+        ScanRequest(root_path=root, file_equality="sha256", structure_policy="content")
+    ).scan()
+
+    diff = compute_fingerprint_diff(result.fingerprints["original"], result.fingerprints["renamed"])
+
+    assert [(m.from_path, m.to_path, m.bytes) for m in diff.moved] == [
+        ("notes.txt", "notes-final.txt", 22),
+        ("photos/beach.jpg", "2024/IMG_0001.jpg", 400),
+    ]
+    assert [(m.path, m.left_bytes, m.right_bytes) for m in diff.mismatched] == [("draft.txt", 11, 12)]
+    assert diff.only_left == [] and diff.only_right == []
+
+
+def test_content_policy_requires_a_hashing_mode(tmp_path: Path) -> None:
+    with pytest.raises(ValidationError):
+        ScanRequest(root_path=tmp_path, structure_policy="content")
+
+
+@pytest.mark.parametrize("policy", ["relative", "bag_of_files"])
+def test_path_policies_prefix_names_that_look_like_content(tmp_path: Path, policy: str) -> None:
+    root = tmp_path / "root"
+    write_file(root / "left" / "#tag.txt", b"same")
+    write_file(root / "right" / ":colon.txt", b"same")
+
+    result = FolderScanner(ScanRequest(root_path=root, file_equality="sha256", structure_policy=policy)).scan()
+
+    identities = sorted(identity.rsplit("#", 1)[0] for identity in result.fingerprints["."].file_weights)
+    assert identities == ["left/#tag.txt", "right/:colon.txt"]
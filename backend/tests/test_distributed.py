@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Iterator, List
+
+import pytest
+from pydantic import ValidationError
+
+from app import distributed
+from app.distributed import DistributedScanner, ShardWorker, decode_shard
+from app.models import (
+    FileEqualityMode,
+    RemoteShard,
+    ScanRequest,
+    ScanStatus,
+    ShardAssignment,
+    ShardStatus,
+    StructurePolicy,
+)
+from app.scanner import FolderScanner, compute_similarity_groups
+
+from .utils import make_hardlink, result_weights, write_file
+
+BACKEND_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _build_tree(root: Path) -> None:
+    for name in ("alpha", "beta", "gamma"):
+        write_file(root / "nodes" / name / "src" / "main.py", f"print('{name}')\n".encode() * 30)
+        write_file(root / "nodes" / name / "docs" / "readme.md", b"# docs\n" * 12)
+    write_file(root / "nodes" / "gamma" / "src" / "extra.py", b"x = 1\n" * 9)
+    write_file(root / "local" / "src" / "main.py", b"print('alpha')\n" * 30)
+    write_file(root / "top.txt", b"root file")
+
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def workers(tmp_path_factory: pytest.TempPathFactory) -> Iterator[List[str]]:
+    """Two xfolder instances on localhost standing in for storage nodes."""
+    processes = []
+    urls = []
+    for index in range(2):
+        port = _free_port()
+        env = dict(
+            os.environ,
+            XFS_CONFIG_PATH=str(tmp_path_factory.mktemp(f"worker{index}")),
+            XFS_WORKER_ENABLED="1",
+            # Every test's tmp_path lies below the session's base directory.
+            XFS_WORKER_ROOTS=str(tmp_path_factory.getbasetemp()),
+        )
+        processes.append(
+            subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+                cwd=BACKEND_ROOT,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        )
+        urls.append(f"http://127.0.0.1:{port}")
+    try:
+        for url in urls:
+            deadline = time.time() + 30
+            while True:
+                try:
+                    urllib.request.urlopen(f"{url}/api/health", timeout=1).close()
+                    break
+                except OSError:
+                    if time.time() > deadline:
+                        pytest.skip("worker instances did not start")
+                    time.sleep(0.2)
+        yield urls
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+@pytest.mark.parametrize(
+    "mode,policy",
+    [
+        (FileEqualityMode.NAME_SIZE, StructurePolicy.RELATIVE),
+        (FileEqualityMode.SHA256, StructurePolicy.CONTENT),
+    ],
+)
+def test_distributed_scan_matches_local_scan(tmp_path: Path, workers: List[str], mode, policy) -> None:
+    _build_tree(tmp_path)
+    local = FolderScanner(ScanRequest(root_path=tmp_path, file_equality=mode, structure_policy=policy)).scan()
+    request = ScanRequest(
+        root_path=tmp_path,
+        file_equality=mode,
+        structure_policy=policy,
+        remote_shards=[
+            RemoteShard(worker_url=workers[0], subtree="nodes/alpha"),
+            RemoteShard(worker_url=workers[1], subtree="nodes/beta"),
+            RemoteShard(worker_url=workers[1], subtree="nodes/gamma"),
+        ],
+    )
+    phases: List[str] = []
+    stats: dict = {}
+
+    result = DistributedScanner(request, stats_sink=stats, phase_callback=phases.append).scan()
+
+    assert result_weights(result) == result_weights(local)
+    assert list(result.folders) == list(local.folders)
+    assert result.folders["nodes/beta/src"].path == str(tmp_path / "nodes" / "beta" / "src")
+    assert result.fingerprints["."].folder.total_bytes == local.fingerprints["."].folder.total_bytes
+    assert result.stats["remote_shards"] == 3
+    assert result.stats["files_scanned"] == local.stats["files_scanned"]
+    assert stats["files_scanned"] == local.stats["files_scanned"]
+    assert phases == ["aggregating"]
+    groups = compute_similarity_groups(result.fingerprints, request.similarity_threshold)
+    expected = compute_similarity_groups(local.fingerprints, request.similarity_threshold)
+    assert sorted(sorted(m.relative_path for m in g.members) for g in groups) == sorted(
+        sorted(m.relative_path for m in g.members) for g in expected
+    )
+
+
+def test_worker_scans_subtree_mounted_elsewhere(tmp_path: Path, workers: List[str]) -> None:
+    _build_tree(tmp_path / "coordinator")
+    # The worker sees the same subtree under another mount point.
+    _build_tree(tmp_path / "mirror")
+    request = ScanRequest(
+        root_path=tmp_path / "coordinator",
+        remote_shards=[RemoteShard(worker_url=workers[0], subtree="nodes", path=tmp_path / "mirror" / "nodes")],
+    )
+
+    result = DistributedScanner(request).scan()
+
+    local = FolderScanner(ScanRequest(root_path=tmp_path / "coordinator")).scan()
+    assert result_weights(result) == result_weights(local)
+    assert result.folders["nodes/alpha"].path == str(tmp_path / "coordinator" / "nodes" / "alpha")
+
+
+def test_distributed_scan_accounts_hard_links(tmp_path: Path, workers: List[str]) -> None:
+    root = tmp_path / "root"
+    _build_tree(root)
+    write_file(root / "nodes" / "alpha" / "src" / "blob.bin", b"b" * 500)
+    make_hardlink(root / "nodes" / "alpha" / "src" / "blob.bin", root / "nodes" / "alpha" / "docs" / "blob.bin")
+    write_file(tmp_path / "outside" / "external.bin", b"e" * 300)
+    make_hardlink(tmp_path / "outside" / "external.bin", root / "nodes" / "beta" / "external.bin")
+    local = FolderScanner(ScanRequest(root_path=root)).scan()
+    request = ScanRequest(
+        root_path=root,
+        remote_shards=[
+            RemoteShard(worker_url=workers[0], subtree="nodes/alpha"),
+            RemoteShard(worker_url=workers[1], subtree="nodes/beta"),
+        ],
+    )
+
+    result = DistributedScanner(request).scan()
+
+    hardlinked = {key: info.hardlinked_bytes for key, info in result.folders.items()}
+    assert hardlinked == {key: info.hardlinked_bytes for key, info in local.folders.items()}
+    assert hardlinked["nodes/alpha/docs"] == 500
+    assert hardlinked["nodes/alpha"] == 0
+    assert hardlinked["."] == 300
+    assert result.stats["bytes_hardlinked"] == 500
+
+
+def test_unreachable_worker_fails_the_scan(tmp_path: Path) -> None:
+    _build_tree(tmp_path)
+    request = ScanRequest(
+        root_path=tmp_path,
+        remote_shards=[RemoteShard(worker_url=f"http://127.0.0.1:{_free_port()}", subtree="nodes")],
+    )
+    with pytest.raises(OSError):
+        DistributedScanner(request).scan()
+
+
+def test_failed_worker_stops_the_local_scan(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    class FailingWorker:
+        def __init__(self, base_url: str) -> None:
+            self.released: List[str] = []
+
+        def start(self, assignment: ShardAssignment) -> ShardStatus:
+            return ShardStatus(shard_id="s1", subtree=assignment.subtree, status=ScanStatus.RUNNING)
+
+        def status(self, shard_id: str) -> ShardStatus:
+            return ShardStatus(shard_id=shard_id, subtree="nodes", status=ScanStatus.FAILED, error="disk gone")
+
+        def release(self, shard_id: str) -> None:
+            self.released.append(shard_id)
+
+    monkeypatch.setattr(distributed, "RemoteWorker", FailingWorker)
+    for index in range(40):
+        write_file(tmp_path / "local" / f"file{index}.txt", b"data")
+    # At two stats a second the local part alone would take twenty seconds.
+    request = ScanRequest(
+        root_path=tmp_path,
+        max_opens_per_second=2,
+        remote_shards=[RemoteShard(worker_url="http://node-2:8080", subtree="nodes")],
+    )
+    started = time.monotonic()
+
+    with pytest.raises(RuntimeError, match="disk gone"):
+        DistributedScanner(request).scan()
+
+    assert time.monotonic() - started < 10
+
+
+def test_shard_worker_drops_expired_results(tmp_path: Path) -> None:
+    _build_tree(tmp_path)
+    worker = ShardWorker(allowed_roots=[tmp_path], result_ttl=0)
+    request = ScanRequest(root_path=tmp_path)
+
+    def run(subtree: str) -> str:
+        status = worker.start(ShardAssignment(request=request, subtree=subtree, path=tmp_path / subtree))
+        deadline = time.time() + 10
+        while worker.status(status.shard_id).status != ScanStatus.COMPLETED and time.time() < deadline:
+            time.sleep(0.05)
+        return status.shard_id
+
+    first = run("nodes/alpha")
+    second = run("nodes/beta")
+
+    with pytest.raises(KeyError):
+        worker.result(first)
+    assert decode_shard(worker.result(second), tmp_path).fingerprints
+
+
+def test_shard_worker_ships_own_fingerprints(tmp_path: Path) -> None:
+    _build_tree(tmp_path)
+    worker = ShardWorker(allowed_roots=[tmp_path])
+    request = ScanRequest(root_path=tmp_path)
+    status = worker.start(ShardAssignment(request=request, subtree="nodes/gamma", path=tmp_path / "nodes" / "gamma"))
+    deadline = time.time() + 10
+    while worker.status(status.shard_id).status != ScanStatus.COMPLETED and time.time() < deadline:
+        time.sleep(0.05)
+
+    shard = decode_shard(worker.result(status.shard_id), tmp_path)
+
+    assert set(shard.fingerprints) == {"nodes/gamma", "nodes/gamma/src", "nodes/gamma/docs"}
+    # Subfolders are not folded into their parent before shipping.
+    assert shard.fingerprints["nodes/gamma"].file_weights == {}
+    assert shard.folders["nodes/gamma/src"].file_count == 2
+    worker.release(status.shard_id)
+    with pytest.raises(KeyError):
+        worker.status(status.shard_id)
+
+
+def test_shard_worker_refuses_paths_outside_its_roots(tmp_path: Path) -> None:
+    _build_tree(tmp_path)
+    request = ScanRequest(root_path=tmp_path)
+    alpha = tmp_path / "nodes" / "alpha"
+    worker = ShardWorker(allowed_roots=[alpha])
+
+    with pytest.raises(PermissionError):
+        worker.start(ShardAssignment(request=request, subtree="nodes/beta", path=tmp_path / "nodes" / "beta"))
+    with pytest.raises(PermissionError):
+        worker.start(ShardAssignment(request=request, subtree="nodes/beta", path=alpha / ".." / "beta"))
+    with pytest.raises(PermissionError):
+        ShardWorker().start(ShardAssignment(request=request, subtree="nodes/alpha", path=alpha))
+    status = worker.start(ShardAssignment(request=request, subtree="nodes/alpha/src", path=alpha / "src"))
+    worker.release(status.shard_id)
+
+
+def test_remote_shards_are_validated(tmp_path: Path) -> None:
+    shard = RemoteShard(worker_url="http://node-2:8080/", subtree="./media\\photos/")
+    assert shard.worker_url == "http://node-2:8080"
+    assert shard.subtree == "media/photos"
+    with pytest.raises(ValidationError):
+        RemoteShard(worker_url="http://node-2:8080", subtree="../etc")
+    with pytest.raises(ValidationError):
+        ScanRequest(
+            root_path=tmp_path,
+            remote_shards=[
+                RemoteShard(worker_url="http://a", subtree="media"),
+                RemoteShard(worker_url="http://b", subtree="media/photos"),
+            ],
+        )
+    with pytest.raises(ValidationError):
+        ScanRequest(root_path=tmp_path, shard_processes=2, remote_shards=[shard])
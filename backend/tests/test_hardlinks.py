@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from app.analytics import build_similarity_matrix
+from app.config import AppConfig
+from app.domain import FolderInfo, GroupInfo
+from app.inodes import InodeSet
+from app.models import DeletionPlanPayload, FolderLabel, PairwiseSimilarity, ScanRequest
+from app.scanner import FolderScanner
+from app.store import ScanManager
+
+from .utils import make_hardlink, wait_for_completion, write_file
+
+
+def _build_tree(root: Path, outside: Path) -> None:
+    write_file(root / "a" / "shared.bin", b"s" * 1000)
+    write_file(root / "a" / "own.bin", b"o" * 200)
+    make_hardlink(root / "a" / "shared.bin", root / "b" / "shared.bin")
+    write_file(outside / "external.bin", b"e" * 300)
+    make_hardlink(outside / "external.bin", root / "c" / "deep" / "external.bin")
+
+
+def test_inode_set_groups_inodes_by_device() -> None:
+    inodes = InodeSet([(1, 10), (1, 11), (2, 10)])
+
+    assert inodes.add(1, 10) is False
+    assert inodes.add(3, 10) is True
+    assert (2, 10) in inodes
+    assert (2, 11) not in inodes
+    assert len(inodes) == 4
+    assert sorted(inodes) == [(1, 10), (1, 11), (2, 10), (3, 10)]
+
+
+def test_hardlinks_are_counted_once_and_reported(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    _build_tree(root, tmp_path / "outside")
+
+    result = FolderScanner(ScanRequest(root_path=root)).scan()
+
+    assert result.stats["files_hardlinked"] == 1
+    assert result.stats["bytes_hardlinked"] == 1000
+    assert result.folders["a"].total_bytes == 1200
+    assert result.folders["b"].total_bytes == 0
+    # "b" keeps the inode alive if only "a" goes; deleting the root frees it.
+    assert result.folders["a"].hardlinked_bytes == 1000
+    # The other link of "external.bin" lies outside the scan.
+    assert result.folders["c/deep"].hardlinked_bytes == 300
+    assert result.folders["c"].hardlinked_bytes == 300
+    assert result.folders["."].hardlinked_bytes == 300
+
+
+def test_matrix_leaves_hardlinked_bytes_out_of_reclaimable() -> None:
+    left = FolderInfo(path="/data/a", relative_path="a", total_bytes=1000, file_count=2, hardlinked_bytes=400)
+    right = FolderInfo(path="/data/b", relative_path="b", total_bytes=1000, file_count=2)
+    group = GroupInfo(
+        group_id="g1",
+        label=FolderLabel.IDENTICAL,
+        canonical_path="a",
+        members=[left, right],
+        pairwise_similarity=[PairwiseSimilarity(a=0, b=1, similarity=1.0)],
+        divergences=[],
+    )
+
+    entries = build_similarity_matrix([(FolderLabel.IDENTICAL, group)])
+
+    assert entries[0].reclaimable_bytes == 600
+    assert entries[0].left.hardlinked_bytes == 400
+
+
+def test_deletion_plan_counts_only_fully_planned_inodes(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    _build_tree(root, tmp_path / "outside")
+    config_root = tmp_path / "config"
+    manager = ScanManager(AppConfig(config_path=config_root, cache_db_path=config_root / "cache.db"))
+    try:
+        job = manager.start_scan(ScanRequest(root_path=root, deletion_enabled=True))
+        wait_for_completion(manager, job.scan_id)
+
+        only_a = manager.create_deletion_plan(job.scan_id, DeletionPlanPayload(paths=["a"]))
+        assert only_a.reclaimable_bytes == 200
+        assert only_a.hardlinked_bytes == 1000
+
+        both = manager.create_deletion_plan(job.scan_id, DeletionPlanPayload(paths=["a", "b", "a/shared.bin"]))
+        assert both.reclaimable_bytes == 1200
+        assert both.hardlinked_bytes == 0
+
+        external = manager.create_deletion_plan(job.scan_id, DeletionPlanPayload(paths=["c"]))
+        assert external.reclaimable_bytes == 0
+        assert external.hardlinked_bytes == 300
+    finally:
+        manager.shutdown()
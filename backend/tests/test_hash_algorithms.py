@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+from app.cache import FileHashCache
+from app.hashing import DigestSpec, hash_batch, hash_file
+from app.models import ScanRequest
+from app.scanner import FolderScanner
+
+from .utils import write_file
+
+
+def _digests(result, folder: str = "A") -> list:
+    return [identity.split("#", 1)[1] for identity in result.fingerprints[folder].file_weights]
+
+
+def test_blake2b_truncated_digests_in_identities(tmp_path: Path) -> None:
+    root = tmp_path / "tree"
+    write_file(root / "A" / "file.bin", b"payload")
+    request = ScanRequest(root_path=root, file_equality="sha256", hash_algorithm="blake2b", digest_size=16)
+
+    result = FolderScanner(request).scan()
+
+    assert _digests(result) == [hashlib.blake2b(b"payload", digest_size=16).hexdigest()]
+
+
+def test_truncated_sha256_rejects_oversized_digest(tmp_path: Path) -> None:
+    with pytest.raises(ValidationError):
+        ScanRequest(root_path=tmp_path, hash_algorithm="sha256", digest_size=48)
+
+
+def test_hash_cache_keeps_algorithms_apart(tmp_path: Path) -> None:
+    root = tmp_path / "tree"
+    write_file(root / "A" / "file.bin", b"payload")
+    cache = FileHashCache(tmp_path / "cache.db")
+
+    sha = FolderScanner(ScanRequest(root_path=root, file_equality="sha256"), cache=cache).scan()
+    blake = FolderScanner(
+        ScanRequest(root_path=root, file_equality="sha256", hash_algorithm="blake2b", digest_size=16),
+        cache=cache,
+    ).scan()
+
+    assert _digests(sha) == [hashlib.sha256(b"payload").hexdigest()]
+    assert _digests(blake) == [hashlib.blake2b(b"payload", digest_size=16).hexdigest()]
+    assert blake.stats["bytes_hashed"] == len(b"payload")
+
+
+def test_hash_cache_migrates_untagged_sha256_rows(tmp_path: Path) -> None:
+    db_path = tmp_path / "cache.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE file_hashes (device INTEGER, inode INTEGER, size INTEGER, mtime REAL, sha256 TEXT,"
+            " PRIMARY KEY (device, inode, size, mtime))"
+        )
+        conn.execute("INSERT INTO file_hashes VALUES (1, 2, 3, 4.0, 'abc')")
+
+    cache = FileHashCache(db_path)
+
+    assert cache.get((1, 2, 3, 4.0)) == "abc"
+    assert cache.get((1, 2, 3, 4.0), "blake2b") is None
+
+
+@pytest.mark.parametrize("strategy", ["read", "readinto", "mmap"])
+def test_hash_strategies_produce_identical_digests(tmp_path: Path, monkeypatch, strategy: str) -> None:
+    monkeypatch.setattr("app.hashing.MMAP_MIN_SIZE", 1024)
+    root = tmp_path / "tree"
+    payloads = {"empty.bin": b"", "small.bin": b"abc", "large.bin": bytes(range(256)) * 1200}
+    for name, payload in payloads.items():
+        write_file(root / "A" / name, payload)
+    request = ScanRequest(root_path=root, file_equality="sha256", hash_strategy=strategy)
+
+    result = FolderScanner(request).scan()
+
+    expected = {f"{name}#{hashlib.sha256(payload).hexdigest()}" for name, payload in payloads.items()}
+    assert set(result.fingerprints["A"].file_weights) == expected
+
+
+def test_adaptive_chunk_size_and_buffer_reuse() -> None:
+    from app.hashing import HASH_CHUNK_SIZE, MIN_HASH_CHUNK_SIZE, _thread_buffer, chunk_size_for
+
+    assert chunk_size_for(10) == MIN_HASH_CHUNK_SIZE
+    assert chunk_size_for(300 * 1024) == 512 * 1024
+    assert chunk_size_for(1 << 40) == HASH_CHUNK_SIZE
+    large = _thread_buffer(1024 * 1024)
+    small = _thread_buffer(MIN_HASH_CHUNK_SIZE)
+    assert small.obj is large.obj
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fadvise"), reason="posix_fadvise unavailable")
+def test_low_footprint_io_hints_and_prefetch(tmp_path: Path, monkeypatch) -> None:
+    root = tmp_path / "tree"
+    for index in range(4):
+        write_file(root / "A" / f"file{index}.bin", bytes([index]) * 1000)
+    advice = []
+    open_flags = []
+    real_fadvise = os.posix_fadvise
+    real_open = os.open
+
+    def recording_fadvise(fd, offset, length, hint):
+        advice.append(hint)
+        return real_fadvise(fd, offset, length, hint)
+
+    def recording_open(path, flags, *args, **kwargs):
+        open_flags.append(flags)
+        return real_open(path, flags, *args, **kwargs)
+
+    monkeypatch.setattr(os, "posix_fadvise", recording_fadvise)
+    monkeypatch.setattr(os, "open", recording_open)
+    request = ScanRequest(
+        root_path=root,
+        file_equality="sha256",
+        concurrency=1,
+        low_footprint_io=True,
+        prefetch_next=True,
+    )
+    result = FolderScanner(request).scan()
+
+    assert len(result.fingerprints["A"].file_weights) == 4
+    assert advice.count(os.POSIX_FADV_SEQUENTIAL) == 4
+    assert advice.count(os.POSIX_FADV_DONTNEED) == 4
+    if hasattr(os, "O_NOATIME"):
+        assert all(flags & os.O_NOATIME for flags in open_flags)
+
+    advice.clear()
+    jobs = [(str(root / "A" / f"file{index}.bin"), 1000, 0.0) for index in range(4)]
+    hash_batch(jobs, DigestSpec(prefetch=True))
+    assert advice.count(os.POSIX_FADV_WILLNEED) == 3
+
+
+def test_tree_digest_combines_parallel_leaves(tmp_path: Path) -> None:
+    leaf = 64 * 1024
+    payload = os.urandom(leaf * 3 + 100)
+    path = tmp_path / "image.bin"
+    path.write_bytes(payload)
+    stat = path.stat()
+    spec = DigestSpec(tree_threshold=1, tree_leaf_size=leaf)
+
+    outcome = hash_file(str(path), stat.st_size, stat.st_mtime, spec)
+
+    leaves = b"".join(hashlib.sha256(payload[offset : offset + leaf]).digest() for offset in range(0, len(payload), leaf))
+    expected = hashlib.sha256(f"tree:{leaf}:{len(payload)}".encode() + leaves).hexdigest()
+    assert outcome.digest == expected
+    assert outcome.bytes_read == len(payload)
+    assert spec.tag_for(len(payload)) == f"sha256-tree{leaf}"
+    assert spec.tag_for(leaf) == "sha256"
+
+
+def test_scan_tree_hashes_large_files_under_their_own_cache_tag(tmp_path: Path) -> None:
+    root = tmp_path / "tree"
+    payload = os.urandom(300 * 1024)
+    write_file(root / "A" / "disk.img", payload)
+    write_file(root / "B" / "disk.img", payload)
+    write_file(root / "A" / "small.txt", b"small")
+    cache = FileHashCache(tmp_path / "cache.db")
+    request = ScanRequest(
+        root_path=root, file_equality="sha256", tree_hash_threshold=200 * 1024, tree_leaf_size=64 * 1024
+    )
+
+    first = FolderScanner(request, cache=cache).scan()
+    second = FolderScanner(request, cache=cache).scan()
+    flat = FolderScanner(ScanRequest(root_path=root, file_equality="sha256"), cache=cache).scan()
+
+    assert first.stats["files_tree_hashed"] == 2
+    assert "disk.img#" + _digests(first, "B")[0] in first.fingerprints["A"].file_weights
+    assert second.stats.get("bytes_hashed", 0) == 0
+    assert hashlib.sha256(payload).hexdigest() in _digests(flat)
+    # small.txt was cached by the first scan; only the tree-hashed files are re-read.
+    assert flat.stats["bytes_hashed"] == 2 * len(payload)
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from app import snapshots
+from app.models import FileEqualityMode, ScanRequest
+from app.scanner import FolderScanner
+from app.snapshots import SnapshotStore
+
+from .utils import make_hardlink, result_weights, write_file
+
+
+@pytest.fixture(autouse=True)
+def no_racy_window(monkeypatch) -> None:
+    # Test trees are created moments before they are scanned.
+    monkeypatch.setattr(snapshots, "RACY_WINDOW_NS", -10 ** 12)
+
+
+def _scan(request: ScanRequest, store: SnapshotStore):
+    return FolderScanner(request, snapshots=store).scan()
+
+
+
+def test_unchanged_folders_are_not_listed_again(tmp_path: Path, monkeypatch) -> None:
+    root = tmp_path / "root"
+    write_file(root / "a" / "one.txt", b"one")
+    write_file(root / "a" / "deep" / "two.txt", b"two")
+    write_file(root / "b" / "three.txt", b"three")
+    request = ScanRequest(root_path=root, file_equality=FileEqualityMode.SHA256, incremental=True)
+    store = SnapshotStore.for_request(tmp_path / "snapshots", request)
+
+    first = _scan(request, store)
+    assert "folders_reused" not in first.stats
+
+    listed = []
+    original = os.scandir
+
+    def tracking_scandir(path="."):
+        if root in Path(path).parents or Path(path) == root:
+            listed.append(path)
+        return original(path)
+
+    monkeypatch.setattr(os, "scandir", tracking_scandir)
+    second = _scan(request, store)
+
+    assert listed == []
+    assert second.stats["folders_reused"] == 4
+    assert second.stats["files_reused"] == 3
+    assert result_weights(second) == result_weights(first)
+    assert second.folders["."].total_bytes == first.folders["."].total_bytes
+
+
+def test_changed_directory_is_rescanned(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    write_file(root / "a" / "one.txt", b"one")
+    write_file(root / "b" / "two.txt", b"two")
+    request = ScanRequest(root_path=root, incremental=True)
+    store = SnapshotStore.for_request(tmp_path / "snapshots", request)
+    _scan(request, store)
+
+    write_file(root / "b" / "new.txt", b"new file")
+    result = _scan(request, store)
+
+    # Only root and "a" are reused; "b" changed.
+    assert result.stats["folders_reused"] == 2
+    assert result.folders["b"].file_count == 2
+    assert result.folders["."].file_count == 3
+    assert FolderScanner(request.copy(update={"incremental": False})).scan().folders["."].file_count == 3
+
+
+def test_options_get_separate_snapshots(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    write_file(root / "a.txt", b"a")
+    base = tmp_path / "snapshots"
+    by_name = ScanRequest(root_path=root, incremental=True)
+    by_hash = by_name.copy(update={"file_equality": FileEqualityMode.SHA256})
+    assert SnapshotStore.for_request(base, by_name).db_path != SnapshotStore.for_request(base, by_hash).db_path
+
+    _scan(by_name, SnapshotStore.for_request(base, by_name))
+    result = _scan(by_hash, SnapshotStore.for_request(base, by_hash))
+    assert "folders_reused" not in result.stats
+    assert all(fp.folder.file_count for fp in result.fingerprints.values())
+
+
+def test_reused_hardlinks_are_not_counted_twice(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    write_file(root / "a" / "file.bin", b"x" * 100)
+    make_hardlink(root / "a" / "file.bin", root / "b" / "file.bin")
+    request = ScanRequest(root_path=root, incremental=True)
+    store = SnapshotStore.for_request(tmp_path / "snapshots", request)
+    first = _scan(request, store)
+
+    # Touch only "b" so "a", which owns the inode, is reused.
+    time.sleep(0.01)
+    write_file(root / "b" / "other.txt", b"o")
+    second = _scan(request, store)
+
+    assert second.stats["folders_reused"] >= 1
+    assert second.folders["a"].file_count == first.folders["a"].file_count == 1
+    assert second.folders["b"].file_count == 1
+    # "a" alone cannot free the inode, so its bytes stay hardlinked.
+    assert second.folders["a"].hardlinked_bytes == first.folders["a"].hardlinked_bytes == 100
+    assert second.folders["."].hardlinked_bytes == 0
+
+
+def test_incremental_rejects_lazy_hashing(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        ScanRequest(root_path=tmp_path, file_equality=FileEqualityMode.SHA256, lazy_hashing=True, incremental=True)
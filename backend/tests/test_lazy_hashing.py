@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.models import ScanRequest
+from app.scanner import FolderScanner, classify_groups, compute_similarity_groups
+
+from .utils import write_file
+
+
+def _build_tree(tmp_path: Path) -> Path:
+    root = tmp_path / "archive"
+    write_file(root / "A" / "shared.bin", b"same bytes")
+    write_file(root / "B" / "shared.bin", b"same bytes")
+    write_file(root / "A" / "clash.txt", b"version-1")
+    write_file(root / "B" / "clash.txt", b"version-2")
+    for index in range(5):
+        write_file(root / "A" / f"only-a-{index}.dat", b"a" * (index + 1))
+        write_file(root / "B" / f"only-b-{index}.dat", b"b" * (index + 1))
+    return root
+
+
+def _group_members(request: ScanRequest, result) -> list:
+    groups = compute_similarity_groups(result.fingerprints, 0.1, structure_policy=request.structure_policy)
+    classified = classify_groups(groups, 0.1, result.fingerprints)
+    return sorted(
+        (label.value, sorted(member.relative_path for member in group.members), round(similarity, 6))
+        for label, groups_for_label in classified.items()
+        for group, similarity in groups_for_label
+    )
+
+
+@pytest.mark.parametrize("structure_policy", ["relative", "bag_of_files"])
+def test_lazy_hashing_only_reads_colliding_files(tmp_path: Path, monkeypatch, structure_policy: str) -> None:
+    root = _build_tree(tmp_path)
+    eager_request = ScanRequest(root_path=root, file_equality="sha256", structure_policy=structure_policy)
+    lazy_request = eager_request.copy(update={"lazy_hashing": True})
+
+    eager = FolderScanner(eager_request).scan()
+    lazy_scanner = FolderScanner(lazy_request)
+    hashed = []
+    original = lazy_scanner._hash_file
+
+    def tracking_hash(path, size, mtime):
+        hashed.append(path.name)
+        return original(path, size, mtime)
+
+    monkeypatch.setattr(lazy_scanner, "_hash_file", tracking_hash)
+    lazy = lazy_scanner.scan()
+
+    assert sorted(hashed) == ["clash.txt", "clash.txt", "shared.bin", "shared.bin"]
+    assert lazy.stats["files_hash_skipped"] == 10
+    assert lazy.stats["files_scanned"] == eager.stats["files_scanned"] == 14
+    assert "only-a-0.dat:1" in lazy.fingerprints["A"].file_weights
+    assert any(identity.startswith("shared.bin#") for identity in lazy.fingerprints["A"].file_weights)
+    expected_groups = _group_members(eager_request, eager)
+    assert expected_groups
+    assert _group_members(lazy_request, lazy) == expected_groups
+
+
+def _build_media_tree(tmp_path: Path) -> Path:
+    root = tmp_path / "media"
+    same = bytes(range(100))
+    write_file(root / "A" / "copy.img", same)
+    write_file(root / "B" / "copy.img", same)
+    write_file(root / "A" / "head.img", b"x" + same[1:])
+    write_file(root / "B" / "head.img", b"y" + same[1:])
+    write_file(root / "A" / "middle.img", same[:20] + b"!" + same[21:])
+    write_file(root / "B" / "middle.img", same)
+    write_file(root / "A" / "note.txt", b"tiny")
+    write_file(root / "B" / "note.txt", b"tiny")
+    write_file(root / "A" / "unique.img", same)
+    return root
+
+
+def test_sampled_mode_cascades_to_full_hash_only_for_sample_matches(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr("app.hashing.SAMPLE_BLOCK_SIZE", 4)
+    root = _build_media_tree(tmp_path)
+    result = FolderScanner(ScanRequest(root_path=root, file_equality="sampled")).scan()
+
+    weights = result.fingerprints["A"].file_weights
+    levels = {identity.split("#", 1)[0].split(":", 1)[0]: identity for identity in weights}
+    assert levels["unique.img"] == "unique.img:100"
+    assert levels["head.img"].startswith("head.img#s:")
+    assert not levels["copy.img"].startswith("copy.img#s:")
+    assert not levels["middle.img"].startswith("middle.img#s:")
+    assert not levels["note.txt"].startswith("note.txt#s:")
+    b_weights = result.fingerprints["B"].file_weights
+    assert levels["copy.img"] in b_weights
+    assert levels["middle.img"] not in b_weights
+    assert levels["note.txt"] in b_weights
+    assert result.stats["files_sampled"] == 6
+    assert result.stats["bytes_hashed"] < result.stats["bytes_scanned"]
+
+
+def test_sampled_mode_can_stop_at_block_digests(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr("app.hashing.SAMPLE_BLOCK_SIZE", 4)
+    root = _build_media_tree(tmp_path)
+    request = ScanRequest(root_path=root, file_equality="sampled", sampled_full_hash=False)
+    result = FolderScanner(request).scan()
+
+    a_weights = result.fingerprints["A"].file_weights
+    middle = next(identity for identity in a_weights if identity.startswith("middle.img"))
+    assert middle.startswith("middle.img#s:")
+    assert middle in result.fingerprints["B"].file_weights
+    assert result.stats["bytes_hashed"] == 6 * 12 + 2 * 4
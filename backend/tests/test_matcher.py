@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import fnmatch
+import os
+from pathlib import Path
+
+import pytest
+
+from app.matcher import PathMatcher
+from app.models import ScanRequest
+from app.scanner import FolderScanner
+
+from .utils import write_file
+
+
+PATTERNS = [".git/**", "*.tmp", "Thumbs.db", "a*b", "[ab]*", "build/*", "?x"]
+PATHS = [
+    ".git",
+    ".git/objects/aa",
+    "src/.git/config",
+    "notes.tmp",
+    "deep/cache/file.tmp",
+    "Thumbs.db",
+    "photos/Thumbs.db",
+    "axb",
+    "a/b",
+    "bravo",
+    "build",
+    "build/out.o",
+    "xx",
+    "src/main.py",
+]
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_matcher_agrees_with_fnmatch(pattern: str) -> None:
+    matcher = PathMatcher(include=[pattern], exclude=[pattern])
+    for path in PATHS:
+        expected = fnmatch.fnmatch(path, pattern)
+        assert matcher.is_excluded(path) is expected, path
+        assert matcher.is_included(path) is expected, path
+
+
+def test_matcher_defaults_accept_everything() -> None:
+    matcher = PathMatcher()
+    assert matcher.accepts_file("any/file.txt")
+    assert not matcher.prunes_subtree("any")
+
+
+def test_matcher_only_prunes_fully_excluded_subtrees() -> None:
+    matcher = PathMatcher(exclude=[".git/**", "*.tmp", "cache/*/keep"])
+    assert matcher.prunes_subtree(".git")
+    assert matcher.prunes_subtree(".git/objects")
+    assert not matcher.prunes_subtree("src")
+    assert not matcher.prunes_subtree("cache")
+
+
+def test_scanner_skips_listing_pruned_subtrees(tmp_path: Path, monkeypatch) -> None:
+    root = tmp_path / "repo"
+    write_file(root / "src" / "main.py", b"print()")
+    write_file(root / ".git" / "objects" / "aa" / "blob", b"blob")
+    write_file(root / ".git" / "HEAD", b"ref")
+
+    listed = []
+    original = os.scandir
+
+    def tracking_scandir(path="."):
+        listed.append(Path(path).name)
+        return original(path)
+
+    monkeypatch.setattr(os, "scandir", tracking_scandir)
+    request = ScanRequest(root_path=root, exclude=[".git/**"], walker="scandir")
+    result = FolderScanner(request).scan()
+
+    assert ".git" not in listed
+    assert "objects" not in listed
+    assert result.folders[".git"].file_count == 0
+    assert result.stats["subtrees_pruned"] == 1
+    assert result.stats["folders_discovered"] == result.stats["folders_scanned"]
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from app.cache import FileHashCache
+from app.config import AppConfig
+from app.models import DeletionPlanPayload, FileEqualityMode, ScanRequest
+from app.multiroot import MultiRootScanner, root_labels, split_root_path
+from app.scanner import FolderScanner, compute_similarity_groups
+from app.store import ScanManager
+
+from .utils import wait_for_completion, write_file
+
+
+def _make_project(root: Path) -> None:
+    write_file(root / "src" / "main.py", b"print('hello')\n" * 50)
+    write_file(root / "src" / "util.py", b"def util():\n    return 1\n" * 40)
+    write_file(root / "README.md", b"# project\n" * 20)
+
+
+def test_cross_root_clones_are_grouped(tmp_path: Path) -> None:
+    _make_project(tmp_path / "data" / "projects" / "alpha")
+    _make_project(tmp_path / "archive" / "old" / "alpha-copy")
+    write_file(tmp_path / "archive" / "old" / "notes.txt", b"unrelated")
+    request = ScanRequest(
+        root_path=tmp_path / "data" / "projects",
+        additional_roots=[tmp_path / "archive" / "old"],
+        file_equality=FileEqualityMode.SHA256,
+        concurrency=4,
+    )
+
+    result = MultiRootScanner(request).scan()
+
+    assert {"projects", "projects/alpha", "old", "old/alpha-copy", "old/alpha-copy/src"} <= set(result.fingerprints)
+    assert result.folders["old/alpha-copy"].relative_path == "old/alpha-copy"
+    assert result.stats["roots"] == 2
+    assert result.stats["workers"] == 4
+    groups = compute_similarity_groups(result.fingerprints, request.similarity_threshold)
+    member_sets = [{member.relative_path for member in group.members} for group in groups]
+    assert {"projects/alpha", "old/alpha-copy"} in member_sets
+
+
+def test_each_root_matches_a_single_root_scan(tmp_path: Path) -> None:
+    _make_project(tmp_path / "one" / "alpha")
+    write_file(tmp_path / "two" / "beta" / "data.bin", b"x" * 4096)
+    request = ScanRequest(root_path=tmp_path / "one", additional_roots=[tmp_path / "two"])
+
+    combined = MultiRootScanner(request).scan()
+
+    for label, root in (("one", tmp_path / "one"), ("two", tmp_path / "two")):
+        single = FolderScanner(ScanRequest(root_path=root)).scan()
+        for key, fingerprint in single.fingerprints.items():
+            qualified = label if key == "." else f"{label}/{key}"
+            assert combined.fingerprints[qualified].file_weights == fingerprint.file_weights
+
+
+def test_roots_share_the_file_cache(tmp_path: Path) -> None:
+    _make_project(tmp_path / "left" / "alpha")
+    _make_project(tmp_path / "right" / "alpha")
+    cache = FileHashCache(tmp_path / "cache.db")
+    request = ScanRequest(
+        root_path=tmp_path / "left",
+        additional_roots=[tmp_path / "right"],
+        file_equality=FileEqualityMode.SHA256,
+    )
+
+    first = MultiRootScanner(request, cache=cache).scan()
+    second = MultiRootScanner(request, cache=cache).scan()
+
+    assert first.stats["bytes_hashed"] > 0
+    assert second.stats.get("bytes_hashed", 0) == 0
+
+
+def test_duplicate_root_names_get_distinct_labels(tmp_path: Path) -> None:
+    roots = [tmp_path / "a" / "photos", tmp_path / "b" / "photos", tmp_path / "c" / "photos"]
+    assert root_labels(roots) == ["photos", "photos-2", "photos-3"]
+
+    request = ScanRequest(root_path=roots[0], additional_roots=roots[1:])
+    assert split_root_path(request, "photos-2/2019/trip") == (roots[1].resolve(), "2019/trip")
+    assert split_root_path(request, "photos") == (roots[0].resolve(), ".")
+    with pytest.raises(ValueError):
+        split_root_path(request, "videos/2019")
+
+
+def test_overlapping_roots_are_rejected(tmp_path: Path) -> None:
+    with pytest.raises(ValidationError):
+        ScanRequest(root_path=tmp_path, additional_roots=[tmp_path / "inner"])
+    with pytest.raises(ValidationError):
+        ScanRequest(root_path=tmp_path / "a", additional_roots=[tmp_path / "b"], watch=True)
+
+
+def test_manager_plans_deletions_within_one_root(tmp_path: Path) -> None:
+    _make_project(tmp_path / "main" / "alpha")
+    _make_project(tmp_path / "backup" / "alpha")
+    config_root = tmp_path / "config"
+    manager = ScanManager(AppConfig(config_path=config_root, cache_db_path=config_root / "cache.db"))
+    request = ScanRequest(
+        root_path=tmp_path / "main",
+        additional_roots=[tmp_path / "backup"],
+        deletion_enabled=True,
+        include_treemap=True,
+    )
+    try:
+        job = manager.start_scan(request)
+        wait_for_completion(manager, job.scan_id)
+
+        members = [{member.relative_path for member in group.members} for group in manager.get_groups(job.scan_id)]
+        assert {"main", "backup"} in members or {"main/alpha", "backup/alpha"} in members
+        assert manager.get_treemap(job.scan_id).tree.total_bytes == job.result.fingerprints["main"].folder.total_bytes * 2
+
+        plan = manager.create_deletion_plan(job.scan_id, DeletionPlanPayload(paths=["backup/alpha"]))
+        assert plan.root == (tmp_path / "backup").resolve()
+        assert plan.queue == ["alpha"]
+        with pytest.raises(HTTPException):
+            manager.create_deletion_plan(job.scan_id, DeletionPlanPayload(paths=["backup/alpha", "main/alpha"]))
+    finally:
+        manager.shutdown()
+
+
+def test_same_name_and_size_across_roots_is_not_a_match(tmp_path: Path) -> None:
+    write_file(tmp_path / "a" / "proj" / "f.bin", b"a" * 100)
+    write_file(tmp_path / "b" / "proj" / "f.bin", b"b" * 100)
+    for options in ({"lazy_hashing": True}, {"file_equality": FileEqualityMode.SAMPLED}):
+        with pytest.raises(ValidationError):
+            ScanRequest(root_path=tmp_path / "a", additional_roots=[tmp_path / "b"], **options)
+
+    request = ScanRequest(
+        root_path=tmp_path / "a",
+        additional_roots=[tmp_path / "b"],
+        file_equality=FileEqualityMode.SHA256,
+    )
+    result = MultiRootScanner(request).scan()
+
+    assert result.fingerprints["a/proj"].file_weights != result.fingerprints["b/proj"].file_weights
+    groups = compute_similarity_groups(result.fingerprints, request.similarity_threshold)
+    assert not any({"a/proj", "b/proj"} <= {m.relative_path for m in group.members} for group in groups)
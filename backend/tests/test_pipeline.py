@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.models import ScanRequest
+from app.pipeline import PipelineStage
+from app.scanner import FolderScanner
+
+from .utils import make_hardlink, write_file
+
+
+def _build_tree(tmp_path: Path) -> Path:
+    root = tmp_path / "pipeline"
+    for branch in ("A", "B", "C"):
+        for index in range(12):
+            write_file(root / branch / f"sub{index % 3}" / f"file{index}.bin", bytes([index]) * (index + 1))
+    make_hardlink(root / "A" / "sub0" / "file0.bin", root / "C" / "sub0" / "alias.bin")
+    return root
+
+
+def test_pipeline_results_do_not_depend_on_worker_count(tmp_path: Path) -> None:
+    root = _build_tree(tmp_path)
+    results = [
+        FolderScanner(ScanRequest(root_path=root, file_equality="sha256", concurrency=workers)).scan()
+        for workers in (1, 8)
+    ]
+
+    serial, parallel = results
+    assert list(parallel.folders) == list(serial.folders)
+    for key, fingerprint in serial.fingerprints.items():
+        assert parallel.fingerprints[key].file_weights == fingerprint.file_weights
+    assert parallel.stats["files_scanned"] == serial.stats["files_scanned"] == 36
+    assert "sub0/alias.bin" not in "".join(parallel.fingerprints["C"].file_weights)
+
+
+def test_pipeline_surfaces_stage_failures(tmp_path: Path, monkeypatch) -> None:
+    root = _build_tree(tmp_path)
+    scanner = FolderScanner(ScanRequest(root_path=root, file_equality="sha256", concurrency=2))
+
+    def broken_hash(*_args, **_kwargs):
+        raise RuntimeError("disk went away")
+
+    monkeypatch.setattr(scanner, "_hash_file", broken_hash)
+    with pytest.raises(RuntimeError, match="disk went away"):
+        scanner.scan()
+
+
+def test_pipeline_stage_applies_backpressure() -> None:
+    release = threading.Event()
+    stage = PipelineStage("test", lambda _item: release.wait(), workers=1, capacity=1, on_error=lambda _exc: None)
+    stage.start()
+    stage.put("in-flight")
+    stage.put("queued")
+
+    blocked = threading.Thread(target=stage.put, args=("blocked",), daemon=True)
+    blocked.start()
+    blocked.join(timeout=0.2)
+    assert blocked.is_alive(), "put should block while the bounded queue is full"
+
+    release.set()
+    blocked.join(timeout=2)
+    stage.close()
+    stage.join()
+    assert not blocked.is_alive()
+
+
+def _scan_both_backends(root: Path):
+    thread = FolderScanner(ScanRequest(root_path=root, file_equality="sha256", concurrency=4)).scan()
+    process = FolderScanner(
+        ScanRequest(root_path=root, file_equality="sha256", hash_backend="process", hash_processes=2)
+    ).scan()
+    return thread, process
+
+
+def test_process_hash_backend_matches_thread_backend(tmp_path: Path) -> None:
+    thread, process = _scan_both_backends(_build_tree(tmp_path))
+
+    assert process.stats["hash_processes"] == 2
+    assert list(process.folders) == list(thread.folders)
+    for key, fingerprint in thread.fingerprints.items():
+        assert process.fingerprints[key].file_weights == fingerprint.file_weights
+
+
+@pytest.mark.skipif(os.geteuid() == 0, reason="root reads files whatever their mode")
+def test_process_hash_backend_reports_unreadable_files_like_threads(tmp_path: Path) -> None:
+    root = _build_tree(tmp_path)
+    (root / "A" / "sub1" / "locked.bin").write_bytes(b"secret")
+    (root / "A" / "sub1" / "locked.bin").chmod(0)
+
+    thread, process = _scan_both_backends(root)
+
+    assert [w.path for w in thread.warnings] == [root / "A" / "sub1" / "locked.bin"]
+    assert [(w.path, w.type, w.message) for w in process.warnings] == [
+        (w.path, w.type, w.message) for w in thread.warnings
+    ]
+
+
+def test_pipeline_stage_batches_queued_items() -> None:
+    batches = []
+    stage = PipelineStage("test", batches.append, workers=1, capacity=16, on_error=lambda _exc: None, batch_size=4)
+    for item in range(10):
+        stage.put(item)
+    stage.start()
+    stage.close()
+    stage.join()
+
+    assert [item for batch in batches for item in batch] == list(range(10))
+    assert all(1 <= len(batch) <= 4 for batch in batches)
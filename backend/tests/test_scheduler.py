@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from app.config import AppConfig
+from app.models import ScanRequest, ScanStatus
+from app.pipeline import CLOSED, PipelineStage
+from app.scanner import FolderScanner
+from app.scheduler import DeviceQueue, SizeQueue
+from app.store import ScanManager
+
+from .utils import write_file
+
+
+def _locate(item):
+    return item
+
+
+def test_device_queue_orders_by_inode_and_limits_each_device() -> None:
+    scheduler = DeviceQueue(capacity=16, per_device=1, locate=_locate)
+    for item in [(1, 30), (1, 10), (2, 5), (1, 20), (2, 1)]:
+        scheduler.put(item)
+
+    first = scheduler.get()
+    second = scheduler.get()
+    assert {first, second} == {(1, 10), (2, 1)}
+    with pytest.raises(queue.Empty):
+        scheduler.get(block=False)
+
+    scheduler.done((1, 10))
+    assert scheduler.get(block=False) == (1, 20)
+    scheduler.done((2, 1))
+    assert scheduler.get(block=False) == (2, 5)
+    assert scheduler.devices == 2
+
+
+def test_device_queue_drains_before_reporting_closed() -> None:
+    scheduler = DeviceQueue(capacity=4, per_device=1, locate=_locate)
+    scheduler.put((1, 1))
+    scheduler.put((1, 2))
+    scheduler.close()
+    assert scheduler.get() == (1, 1)
+
+    waiter_result = []
+    waiter = threading.Thread(target=lambda: waiter_result.append(scheduler.get()), daemon=True)
+    waiter.start()
+    waiter.join(timeout=0.2)
+    assert waiter.is_alive(), "second item must wait for the device slot"
+
+    scheduler.done((1, 1))
+    waiter.join(timeout=2)
+    assert waiter_result == [(1, 2)]
+    assert scheduler.get() is CLOSED
+
+
+def test_device_queue_caps_concurrent_handlers_per_device() -> None:
+    active = {1: 0, 2: 0}
+    peak = {1: 0, 2: 0}
+    lock = threading.Lock()
+
+    def handler(item) -> None:
+        device = item[0]
+        with lock:
+            active[device] += 1
+            peak[device] = max(peak[device], active[device])
+        time.sleep(0.01)
+        with lock:
+            active[device] -= 1
+
+    scheduler = DeviceQueue(capacity=64, per_device=2, locate=_locate)
+    stage = PipelineStage("hash", handler, 8, 64, lambda exc: None, stage_queue=scheduler)
+    stage.start()
+    for inode in range(20):
+        stage.put((1 + inode % 2, inode))
+    stage.close()
+    stage.join()
+    assert peak == {1: 2, 2: 2}
+
+
+def test_device_schedule_matches_fifo_scan(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    for branch in ("A", "B"):
+        for index in range(10):
+            write_file(root / branch / f"file{index}.bin", bytes([index]) * (index + 1))
+    fifo = FolderScanner(ScanRequest(root_path=root, file_equality="sha256", concurrency=4)).scan()
+    device = FolderScanner(
+        ScanRequest(
+            root_path=root,
+            file_equality="sha256",
+            concurrency=4,
+            hash_schedule="device",
+            per_device_concurrency=1,
+        )
+    ).scan()
+
+    assert device.stats["hash_devices"] == 1
+    for key, fingerprint in fifo.fingerprints.items():
+        assert device.fingerprints[key].file_weights == fingerprint.file_weights
+
+
+def test_size_queue_holds_jobs_until_closed_then_goes_largest_first() -> None:
+    scheduler = SizeQueue(capacity=10, size_of=lambda item: item[1])
+    for item in [("small", 1), ("huge", 500), ("medium", 40), ("tiny", 0)]:
+        scheduler.put(item)
+    with pytest.raises(queue.Empty):
+        scheduler.get(block=False)
+
+    scheduler.close()
+    order = []
+    while (item := scheduler.get()) is not CLOSED:
+        order.append(item[0])
+        scheduler.done(item)
+    assert order == ["huge", "medium", "small", "tiny"]
+
+
+def test_size_queue_releases_the_largest_once_its_window_is_full() -> None:
+    scheduler = SizeQueue(capacity=3, size_of=lambda item: item[1])
+    for item in [("small", 1), ("huge", 500), ("medium", 40)]:
+        scheduler.put(item)
+    assert scheduler.get(block=False)[0] == "huge"
+    # Two queued: held until the walk refills the window.
+    with pytest.raises(queue.Empty):
+        scheduler.get(block=False)
+
+    scheduler.put(("late", 900))
+    assert scheduler.get(block=False)[0] == "late"
+    scheduler.close()
+    assert [scheduler.get()[0], scheduler.get()[0]] == ["medium", "small"]
+
+
+def test_stage_queue_measures_the_tail_after_draining() -> None:
+    scheduler = SizeQueue(capacity=10, size_of=lambda item: item)
+    scheduler.put(1)
+    scheduler.put(2)
+    scheduler.close()
+    first, second = scheduler.get(), scheduler.get()
+    scheduler.done(second)
+    time.sleep(0.05)
+    scheduler.done(first)
+    assert scheduler.tail_seconds >= 0.04
+
+
+def test_largest_first_scan_reports_hash_tail(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    for index in range(12):
+        write_file(root / f"d{index % 3}" / f"f{index}.bin", bytes([index]) * (index * 1000 + 1))
+    config_root = tmp_path / "config"
+    app_config = AppConfig(
+        config_path=config_root,
+        cache_db_path=config_root / "cache.db",
+        log_stream_enabled=False,
+        metrics_enabled=False,
+    )
+    request = ScanRequest(root_path=root, file_equality="sha256", concurrency=4, hash_schedule="largest_first")
+    baseline = FolderScanner(request.copy(update={"hash_schedule": "fifo"})).scan()
+    manager = ScanManager(app_config, executor_workers=1)
+    try:
+        job = manager.start_scan(request)
+        deadline = time.time() + 10
+        while time.time() < deadline and job.status != ScanStatus.COMPLETED:
+            time.sleep(0.05)
+        assert job.status == ScanStatus.COMPLETED
+
+        metrics = manager.get_metrics(job.scan_id)
+        assert metrics.hash_schedule == "largest_first"
+        assert metrics.hash_tail_seconds is not None and metrics.hash_tail_seconds >= 0
+        for key, fingerprint in baseline.fingerprints.items():
+            assert job.result.fingerprints[key].file_weights == fingerprint.file_weights
+    finally:
+        manager.shutdown()
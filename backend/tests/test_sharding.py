@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+from app.cache import FileHashCache
+from app.models import FileEqualityMode, ScanRequest, StructurePolicy
+from app.scanner import FolderScanner
+from app.sharding import ShardedScanner
+
+from .utils import make_hardlink, result_weights, write_file
+
+
+def _build_tree(root: Path) -> None:
+    for name in ("alpha", "beta", "gamma"):
+        write_file(root / name / "src" / "main.py", f"print('{name}')\n".encode() * 30)
+        write_file(root / name / "docs" / "readme.md", b"# docs\n" * 12)
+    write_file(root / "gamma" / "src" / "extra.py", b"x = 1\n" * 9)
+    write_file(root / "top.txt", b"root file")
+    write_file(root / "node_modules" / "pkg" / "index.js", b"module.exports = {}")
+
+
+
+@pytest.mark.parametrize(
+    "mode,policy",
+    [
+        (FileEqualityMode.NAME_SIZE, StructurePolicy.RELATIVE),
+        (FileEqualityMode.SHA256, StructurePolicy.CONTENT),
+    ],
+)
+def test_sharded_scan_matches_single_process_scan(tmp_path: Path, mode, policy) -> None:
+    root = tmp_path / "root"
+    _build_tree(root)
+    request = ScanRequest(root_path=root, file_equality=mode, structure_policy=policy, exclude=["node_modules/**"])
+
+    single = FolderScanner(request).scan()
+    sharded = ShardedScanner(request.copy(update={"shard_processes": 2})).scan()
+
+    assert list(sharded.fingerprints) == list(single.fingerprints)
+    assert result_weights(sharded) == result_weights(single)
+    assert sharded.folders["."].total_bytes == single.folders["."].total_bytes
+    assert sharded.folders["."].file_count == single.folders["."].file_count
+    assert sharded.stats["shards"] == 3
+    assert sharded.stats["files_scanned"] == single.stats["files_scanned"]
+
+
+def test_shards_share_the_hash_cache(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    _build_tree(root)
+    cache = FileHashCache(tmp_path / "cache.db")
+    request = ScanRequest(root_path=root, file_equality=FileEqualityMode.SHA256, shard_processes=2)
+
+    first = ShardedScanner(request, cache=cache).scan()
+    second = ShardedScanner(request, cache=cache).scan()
+
+    assert first.stats["bytes_hashed"] > 0
+    assert second.stats.get("bytes_hashed", 0) == 0
+
+
+def test_links_between_shards_match_a_single_process_scan(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    write_file(root / "a" / "shared.bin", b"s" * 64)
+    make_hardlink(root / "a" / "shared.bin", root / "b" / "shared.bin")
+
+    write_file(tmp_path / "outside" / "external.bin", b"e" * 16)
+    make_hardlink(tmp_path / "outside" / "external.bin", root / "c" / "external.bin")
+
+    single = FolderScanner(ScanRequest(root_path=root)).scan()
+    result = ShardedScanner(ScanRequest(root_path=root, shard_processes=2)).scan()
+
+    assert result.stats["shard_shared_inodes"] == 1
+    assert result_weights(result) == result_weights(single)
+    for key, info in single.folders.items():
+        assert result.folders[key].total_bytes == info.total_bytes
+        assert result.folders[key].file_count == info.file_count
+        assert result.folders[key].hardlinked_bytes == info.hardlinked_bytes
+    assert result.folders["."].total_bytes == 64 + 16
+    assert result.folders["a"].hardlinked_bytes == 64
+    assert result.folders["."].hardlinked_bytes == 16
+
+
+def test_sharding_rejects_tree_wide_modes(tmp_path: Path) -> None:
+    with pytest.raises(ValidationError):
+        ScanRequest(root_path=tmp_path, file_equality=FileEqualityMode.SHA256, lazy_hashing=True, shard_processes=2)
+    with pytest.raises(ValidationError):
+        ScanRequest(root_path=tmp_path, incremental=True, shard_processes=2)
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from app import throttle
+from app.models import FileEqualityMode, ScanRequest
+from app.scanner import FolderScanner
+from app.throttle import IOThrottle, TokenBucket
+
+from .utils import write_file
+
+
+def test_token_bucket_enforces_average_rate() -> None:
+    bucket = TokenBucket(rate=1000, burst=100)
+    started = time.monotonic()
+    waited = sum(bucket.acquire(100) for _ in range(4))
+    elapsed = time.monotonic() - started
+    # The first 100 tokens are the burst; the other 300 take 0.3s.
+    assert 0.25 <= waited <= 0.4
+    assert elapsed >= 0.25
+
+
+def test_read_limit_slows_hashing_and_reports_wait(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    for index in range(4):
+        write_file(root / f"file{index}.bin", bytes([index]) * 64 * 1024)
+
+    stats = {}
+    request = ScanRequest(
+        root_path=root,
+        file_equality=FileEqualityMode.SHA256,
+        max_read_bytes_per_second=512 * 1024,
+    )
+    started = time.monotonic()
+    result = FolderScanner(request, stats_sink=stats).scan()
+    elapsed = time.monotonic() - started
+
+    assert result.stats["bytes_hashed"] == 4 * 64 * 1024
+    # 256 KiB at 512 KiB/s with a one-second burst: the bucket never runs dry.
+    assert elapsed < 2
+    assert "throttle_wait_ms" not in stats
+
+    stats = {}
+    request = request.copy(update={"max_read_bytes_per_second": 128 * 1024})
+    FolderScanner(request, stats_sink=stats).scan()
+    # 128 KiB of burst, the remaining 128 KiB at 128 KiB/s.
+    assert stats["throttle_wait_ms"] >= 800
+
+
+def test_pressure_threshold_pauses_until_load_drops(monkeypatch) -> None:
+    loads = iter([9.0, 9.0, 0.5])
+    monkeypatch.setattr(throttle, "read_load_1m", lambda: next(loads, 0.5))
+    monkeypatch.setattr(throttle, "PRESSURE_POLL_SECONDS", 0.01)
+    states = {}
+    gate = IOThrottle(max_load=4.0, on_state=lambda key, value: states.__setitem__(key, value))
+
+    gate.operation()
+
+    assert states["throttle_pauses"] == 1
+    assert states["throttle_paused"] == 0
+    assert states["throttle_load_x100"] == 50
+    assert states["throttle_paused_ms"] >= 10
+
+
+def test_idle_priority_is_reported_once_per_thread(monkeypatch) -> None:
+    calls = []
+    monkeypatch.setattr(throttle, "set_idle_io_priority", lambda: calls.append(1) or True)
+    states = {}
+    gate = IOThrottle(idle_priority=True, on_state=lambda key, value: states.__setitem__(key, value))
+
+    gate.prepare_thread()
+    gate.prepare_thread()
+
+    assert calls == [1]
+    assert states["throttle_ioprio_idle"] == 1
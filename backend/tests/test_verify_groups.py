@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from app.config import AppConfig
+from app.models import FolderLabel, ScanRequest, ScanStatus
+from app.store import ScanManager
+
+from .utils import write_file
+
+
+def _run(tmp_path: Path, request: ScanRequest):
+    config_root = tmp_path / "config"
+    app_config = AppConfig(
+        config_path=config_root,
+        cache_db_path=config_root / "cache.db",
+        log_stream_enabled=False,
+        metrics_enabled=False,
+    )
+    manager = ScanManager(app_config, executor_workers=1)
+    try:
+        job = manager.start_scan(request)
+        deadline = time.time() + 10
+        while time.time() < deadline and job.status != ScanStatus.COMPLETED:
+            time.sleep(0.05)
+        assert job.status == ScanStatus.COMPLETED
+        return job, manager.get_progress(job.scan_id)
+    finally:
+        manager.shutdown()
+
+
+def _member_sets(job, label: FolderLabel):
+    return [{member.relative_path for member in info.members} for info in job.group_infos[label]]
+
+
+def test_verification_hashes_only_group_members_and_relabels(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    # Same names and sizes, different bytes: a false positive for name_size.
+    write_file(root / "fake_a" / "photo.jpg", b"a" * 400)
+    write_file(root / "fake_b" / "photo.jpg", b"b" * 400)
+    write_file(root / "real_a" / "doc.txt", b"same document")
+    write_file(root / "real_b" / "doc.txt", b"same document")
+    write_file(root / "unrelated" / "big.bin", b"z" * 5000)
+
+    plain, _ = _run(tmp_path, ScanRequest(root_path=root))
+    assert {"fake_a", "fake_b"} in _member_sets(plain, FolderLabel.IDENTICAL)
+
+    job, progress = _run(tmp_path, ScanRequest(root_path=root, verify_groups=True))
+
+    identical = _member_sets(job, FolderLabel.IDENTICAL)
+    assert {"real_a", "real_b"} in identical
+    assert all("fake_a" not in members for label in FolderLabel for members in _member_sets(job, label))
+    assert job.stats["verify_groups_changed"] >= 1
+    assert job.stats["verify_bytes_hashed"] == 2 * 400 + 2 * len(b"same document")
+    assert "verifying" in job.phase_sequence
+    assert [phase.name for phase in progress.phases][-1] == "verifying"
+    # Content digests are only used to regroup; the scan's fingerprints
+    # keep one kind of identity, so diffs between any folders line up.
+    assert job.result.fingerprints["real_a"].file_weights == {"doc.txt:13": 13}
+    assert all("#" not in identity for fp in job.result.fingerprints.values() for identity in fp.file_weights)
+
+
+def test_verification_maps_keys_to_their_root(tmp_path: Path) -> None:
+    write_file(tmp_path / "a" / "fake" / "photo.jpg", b"a" * 400)
+    write_file(tmp_path / "b" / "fake" / "photo.jpg", b"b" * 400)
+    write_file(tmp_path / "a" / "real" / "doc.txt", b"same document")
+    write_file(tmp_path / "b" / "real" / "doc.txt", b"same document")
+    # Same names under the first root, which a misrouted key would pick up.
+    write_file(tmp_path / "a" / "a" / "fake" / "photo.jpg", b"a" * 400)
+
+    job, _ = _run(
+        tmp_path,
+        ScanRequest(root_path=tmp_path / "a", additional_roots=[tmp_path / "b"], verify_groups=True),
+    )
+
+    identical = _member_sets(job, FolderLabel.IDENTICAL)
+    assert {"a/real", "b/real"} in identical
+    assert all(not {"a/fake", "b/fake"} <= members for label in FolderLabel for members in _member_sets(job, label))
+    assert job.stats["verify_bytes_hashed"] >= 2 * 400
+
+
+def test_verification_hashes_known_files_of_nested_members(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    for side, payload in (("left", b"l"), ("right", b"r")):
+        write_file(root / side / "Same" / "Doc.TXT", b"same document")
+        write_file(root / side / "differ" / "photo.jpg", payload * 400)
+
+    job, _ = _run(tmp_path, ScanRequest(root_path=root, verify_groups=True, force_case_insensitive=True))
+
+    assert _member_sets(job, FolderLabel.IDENTICAL) == [{"left/Same", "right/Same"}]
+    # Each file is hashed once, for the outermost member holding it.
+    assert job.stats["verify_bytes_hashed"] == 2 * 400 + 2 * len(b"same document")
+    assert not [warning for warning in job.warnings if warning.type.value == "io_error"]
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.models import ScanRequest, WalkerEngine
+from app.scanner import FolderScanner
+
+from .utils import make_hardlink, write_file
+
+
+def _build_tree(tmp_path: Path) -> Path:
+    root = tmp_path / "tree"
+    write_file(root / "A" / "one.txt", b"one")
+    write_file(root / "A" / "nested" / "two.bin", b"two" * 10)
+    write_file(root / "B" / "one.txt", b"one")
+    write_file(root / "B" / "nested" / "two.bin", b"two" * 10)
+    write_file(root / "skip" / "ignored.txt", b"ignored")
+    make_hardlink(root / "A" / "one.txt", root / "C" / "linked.txt")
+    os.symlink(root / "A" / "one.txt", root / "B" / "link.txt")
+    os.symlink(root / "A", root / "dir_link")
+    return root
+
+
+@pytest.mark.parametrize("file_equality", ["name_size", "sha256"])
+def test_walker_engines_produce_identical_results(tmp_path: Path, file_equality: str) -> None:
+    root = _build_tree(tmp_path)
+    results = {}
+    for engine in WalkerEngine:
+        request = ScanRequest(
+            root_path=root,
+            exclude=["skip"],
+            file_equality=file_equality,
+            walker=engine,
+        )
+        results[engine] = FolderScanner(request).scan()
+
+    baseline = results[WalkerEngine.OS_WALK]
+    for engine in (WalkerEngine.SCANDIR, WalkerEngine.PARALLEL):
+        candidate = results[engine]
+        assert list(candidate.fingerprints) == list(baseline.fingerprints)
+        for key, fingerprint in baseline.fingerprints.items():
+            assert candidate.fingerprints[key].file_weights == fingerprint.file_weights
+        assert candidate.stats["files_scanned"] == baseline.stats["files_scanned"] == 4
+        assert "skip" not in candidate.fingerprints
+
+
+def test_scandir_walker_stats_each_file_once(tmp_path: Path, monkeypatch) -> None:
+    root = _build_tree(tmp_path)
+    calls = []
+    original = os.stat
+
+    def counting_stat(path, *args, **kwargs):
+        calls.append(os.fspath(path))
+        return original(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, "stat", counting_stat)
+    request = ScanRequest(root_path=root, walker=WalkerEngine.SCANDIR)
+    FolderScanner(request).scan()
+
+    file_calls = [path for path in calls if path.endswith((".txt", ".bin"))]
+    assert file_calls == []
+
+
+def test_parallel_walker_tracks_folder_stats(tmp_path: Path) -> None:
+    root = tmp_path / "wide"
+    for outer in range(6):
+        for inner in range(4):
+            write_file(root / f"d{outer}" / f"e{inner}" / "leaf.txt", f"{outer}-{inner}".encode())
+    write_file(root / "node_modules" / "pkg" / "index.js", b"ignored")
+
+    request = ScanRequest(
+        root_path=root,
+        walker=WalkerEngine.PARALLEL,
+        traversal_workers=4,
+        exclude=["node_modules"],
+    )
+    result = FolderScanner(request).scan()
+
+    assert result.stats["folders_discovered"] == result.stats["folders_scanned"] == 31
+    assert result.stats["traversal_workers"] == 4
+    assert not any(key.startswith("node_modules") for key in result.fingerprints)
+
+
+def test_parallel_walker_honours_stop_event(tmp_path: Path) -> None:
+    root = _build_tree(tmp_path)
+    stop_event = threading.Event()
+    stop_event.set()
+    request = ScanRequest(root_path=root, walker=WalkerEngine.PARALLEL, traversal_workers=2)
+
+    result = FolderScanner(request, stop_event=stop_event).scan()
+
+    assert result.stats["files_scanned"] == 0
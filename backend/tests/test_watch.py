@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+
+from app.config import AppConfig
+from app.inotify import InotifyWatcher, WatchBatch, collapse_batch, inotify_available
+from app.models import FileEqualityMode, FolderLabel, ScanRequest, ScanStatus
+from app.scanner import FolderScanner, compute_similarity_groups, find_similar_pairs
+from app.store import ScanManager
+from app.watch import ScanWatch
+
+from .utils import result_weights, write_file
+
+
+needs_inotify = pytest.mark.skipif(not inotify_available(), reason="inotify is not available")
+
+
+
+def _watch(request: ScanRequest):
+    result = FolderScanner(request).scan()
+    pairs = find_similar_pairs(result.fingerprints, request.similarity_threshold)
+    published = []
+    watch = ScanWatch(request, result, pairs, publish=published.append)
+    return result, watch, published
+
+
+def _members(groups):
+    return sorted(sorted(member.relative_path for member in group.members) for group in groups)
+
+
+def test_folder_update_matches_a_full_rescan(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    write_file(root / "a" / "x" / "one.txt", b"one")
+    write_file(root / "b" / "x" / "one.txt", b"one")
+    write_file(root / "b" / "x" / "two.txt", b"two two")
+    request = ScanRequest(root_path=root, file_equality=FileEqualityMode.SHA256, watch=True)
+    result, watch, published = _watch(request)
+
+    write_file(root / "a" / "x" / "two.txt", b"two two")
+    changed = watch.apply(WatchBatch(folders={"a/x"}, events=1))
+
+    assert changed == [".", "a", "a/x"]
+    fresh = FolderScanner(request).scan()
+    assert result_weights(result) == result_weights(fresh)
+    assert result.folders["."].total_bytes == fresh.folders["."].total_bytes
+    assert _members(published[-1]) == _members(compute_similarity_groups(fresh.fingerprints, 0.8))
+    assert ["a", "b"] in _members(published[-1])
+    assert watch.stats["watch_folders_rescanned"] == 1
+
+
+def test_updates_leave_the_previous_result_untouched(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    write_file(root / "a" / "one.txt", b"one")
+    request = ScanRequest(root_path=root, watch=True)
+    result, watch, _published = _watch(request)
+    fingerprints, folders = result.fingerprints, result.folders
+    weights = dict(fingerprints["."].file_weights)
+
+    write_file(root / "a" / "two.txt", b"two")
+    watch.apply(WatchBatch(folders={"a"}, events=1))
+
+    # A reader still holding the old dictionaries sees the old tree.
+    assert fingerprints["."].file_weights == weights
+    assert folders["."].total_bytes == 3
+    assert result.fingerprints is not fingerprints
+    assert result.folders["."].total_bytes == 6
+
+
+def test_subtree_events_add_and_remove_folders(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    write_file(root / "keep" / "file.txt", b"keep")
+    write_file(root / "gone" / "deep" / "file.txt", b"gone")
+    request = ScanRequest(root_path=root, watch=True)
+    result, watch, published = _watch(request)
+
+    shutil.rmtree(root / "gone")
+    write_file(root / "copy" / "file.txt", b"keep")
+    watch.apply(WatchBatch(subtrees={"gone", "copy"}, folders={"gone/deep"}, events=3))
+
+    fresh = FolderScanner(request).scan()
+    assert set(result.fingerprints) == set(fresh.fingerprints) == {".", "keep", "copy"}
+    assert result_weights(result) == result_weights(fresh)
+    assert _members(published[-1]) == _members(compute_similarity_groups(fresh.fingerprints, 0.8))
+    assert ["copy", "keep"] in _members(published[-1])
+
+
+def test_overflow_rescans_the_whole_root() -> None:
+    batch = collapse_batch(WatchBatch(folders={"a"}, subtrees={"b"}, overflow=True))
+    assert batch.subtrees == {"."}
+    assert not batch.folders
+    nested = collapse_batch(WatchBatch(folders={"a/b", "c"}, subtrees={"a", "a/x"}))
+    assert nested.subtrees == {"a"}
+    assert nested.folders == {"c"}
+
+
+@needs_inotify
+def test_overflow_watches_directories_created_meanwhile(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    write_file(root / "keep" / "file.txt", b"keep")
+    request = ScanRequest(root_path=root, watch=True)
+    _result, watch, _published = _watch(request)
+    watcher = InotifyWatcher(root)
+    try:
+        watcher.add_tree("keep")
+        watch._watcher = watcher
+        # Created while the kernel queue overflowed, so never reported.
+        (root / "late" / "inner").mkdir(parents=True)
+
+        watch.apply(WatchBatch(overflow=True, events=1))
+
+        assert watcher.watch_count == 4
+        write_file(root / "late" / "inner" / "file.txt", b"late")
+        assert "late/inner" in watcher.wait(2.0, settle=0.1).folders
+    finally:
+        watcher.close()
+
+
+@needs_inotify
+def test_inotify_reports_files_and_new_directories(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    (root / "a").mkdir(parents=True)
+    watcher = InotifyWatcher(root)
+    try:
+        watcher.add_tree()
+        assert watcher.watch_count == 2
+        write_file(root / "a" / "file.txt", b"data")
+        (root / "new" / "inner").mkdir(parents=True)
+        batch = watcher.wait(2.0, settle=0.1)
+        assert "a" in batch.folders
+        assert "new" in batch.subtrees
+        # The new directory and its child are watched too.
+        assert watcher.watch_count == 4
+    finally:
+        watcher.close()
+
+
+@needs_inotify
+def test_manager_keeps_groups_live(tmp_path: Path) -> None:
+    root = tmp_path / "root"
+    write_file(root / "original" / "data.bin", b"d" * 2048)
+    write_file(root / "other" / "notes.txt", b"notes")
+    config_root = tmp_path / "config"
+    app_config = AppConfig(
+        config_path=config_root,
+        cache_db_path=config_root / "cache.db",
+        log_stream_enabled=False,
+        metrics_enabled=False,
+    )
+    manager = ScanManager(app_config, executor_workers=1)
+    updates = []
+    manager.add_update_listener(lambda scan_id, folders: updates.append((scan_id, folders)))
+    try:
+        job = manager.start_scan(ScanRequest(root_path=root, watch=True))
+        deadline = time.time() + 10
+        while time.time() < deadline and not manager.is_watching(job.scan_id):
+            time.sleep(0.05)
+        assert job.status == ScanStatus.COMPLETED
+        assert manager.get_progress(job.scan_id).watching
+        assert job.group_infos[FolderLabel.IDENTICAL] == []
+
+        shutil.copytree(root / "original", root / "copy")
+        deadline = time.time() + 10
+        while time.time() < deadline and not job.group_infos[FolderLabel.IDENTICAL]:
+            time.sleep(0.05)
+
+        members = {member.relative_path for member in job.group_infos[FolderLabel.IDENTICAL][0].members}
+        assert members == {"original", "copy"}
+        assert updates and updates[-1][0] == job.scan_id
+        assert "copy" in updates[-1][1]
+
+        manager.cancel_scan(job.scan_id)
+        assert not manager.is_watching(job.scan_id)
+        assert job.status == ScanStatus.COMPLETED
+    finally:
+        manager.shutdown()
+
+
+def test_watch_rejects_verify_groups(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        ScanRequest(root_path=tmp_path, watch=True, verify_groups=True)
@@ -1,7 +1,13 @@
 from __future__ import annotations
 
 import os
+import time
 from pathlib import Path
+from typing import Dict
+
+from app.models import ScanStatus
+from app.scanner import ScanResult
+from app.store import ScanManager
 
 
 def write_file(path: Path, data: bytes) -> None:
@@ -12,3 +18,18 @@ def write_file(path: Path, data: bytes) -> None:
 def make_hardlink(source: Path, target: Path) -> None:
     target.parent.mkdir(parents=True, exist_ok=True)
     os.link(source, target)
+
+
+def result_weights(result: ScanResult) -> Dict[str, Dict[str, int]]:
+    """Every folder's file weights, for comparing two scans of one tree."""
+    return {key: dict(fp.file_weights) for key, fp in result.fingerprints.items()}
+
+
+def wait_for_completion(manager: ScanManager, scan_id: str, timeout: float = 10.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        progress = manager.get_progress(scan_id)
+        if progress.status == ScanStatus.COMPLETED:
+            return
+        time.sleep(0.05)
+    raise TimeoutError("scan did not complete in time")
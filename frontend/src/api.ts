@@ -3,15 +3,37 @@ import axios from "axios";
 export type ScanStatus = "pending" | "running" | "cancelled" | "completed" | "failed";
 export type FolderLabel = "identical" | "near_duplicate" | "partial_overlap";
 
+export interface RemoteShard {
+  worker_url: string;
+  subtree: string;
+  path?: string | null;
+}
+
 export interface ScanRequest {
   root_path: string;
+  additional_roots?: string[];
   include?: string[];
   exclude?: string[];
-  file_equality?: "name_size" | "sha256";
+  file_equality?: "name_size" | "sha256" | "sampled" | "chunks";
+  hash_algorithm?: "sha256" | "blake2b";
+  digest_size?: number;
   similarity_threshold?: number;
   force_case_insensitive?: boolean;
-  structure_policy?: "relative" | "bag_of_files";
+  structure_policy?: "relative" | "bag_of_files" | "content";
   concurrency?: number;
+  adaptive_concurrency?: boolean;
+  max_concurrency?: number;
+  verify_groups?: boolean;
+  max_read_bytes_per_second?: number | null;
+  max_opens_per_second?: number | null;
+  idle_io_priority?: boolean;
+  pause_load_average?: number | null;
+  pause_io_pressure?: number | null;
+  incremental?: boolean;
+  watch?: boolean;
+  checkpoint_interval_seconds?: number | null;
+  shard_processes?: number | null;
+  remote_shards?: RemoteShard[];
   deletion_enabled?: boolean;
   include_matrix?: boolean;
   include_treemap?: boolean;
@@ -38,6 +60,7 @@ export interface ScanProgress {
   phases?: PhaseProgress[];
   include_matrix: boolean;
   include_treemap: boolean;
+  watching?: boolean;
 }
 
 export interface PhaseProgress {
@@ -60,6 +83,7 @@ export interface FolderRecord {
   total_bytes: number;
   file_count: number;
   unstable: boolean;
+  hardlinked_bytes?: number;
 }
 
 export interface PairwiseSimilarity {
@@ -95,12 +119,19 @@ export interface MismatchEntry {
   right_bytes: number;
 }
 
+export interface MovedEntry {
+  from_path: string;
+  to_path: string;
+  bytes: number;
+}
+
 export interface GroupDiff {
   left: FolderRecord;
   right: FolderRecord;
   only_left: DiffEntry[];
   only_right: DiffEntry[];
   mismatched: MismatchEntry[];
+  moved?: MovedEntry[];
 }
 
 export interface FolderEntry {
@@ -159,6 +190,7 @@ export interface DeletionPlan {
   plan_id: string;
   token: string;
   reclaimable_bytes: number;
+  hardlinked_bytes?: number;
   queue: string[];
   root: string;
   quarantine_root: string;
@@ -135,7 +135,10 @@ function FolderSummary({
 
 function DiffOverview({ diff }: { diff: GroupDiff }) {
   const hasChanges =
-    diff.only_left.length > 0 || diff.only_right.length > 0 || diff.mismatched.length > 0;
+    diff.only_left.length > 0 ||
+    diff.only_right.length > 0 ||
+    diff.mismatched.length > 0 ||
+    (diff.moved?.length ?? 0) > 0;
   if (!hasChanges) {
     return <p className="muted">Folders match exactly.</p>;
   }
@@ -157,6 +160,13 @@ function DiffOverview({ diff }: { diff: GroupDiff }) {
           variant="changed"
         />
       ) : null}
+      {diff.moved?.length ? (
+        <DiffList
+          title="Moved or renamed"
+          entries={diff.moved.map((entry) => ({ label: `${entry.from_path} → ${entry.to_path}`, bytes: entry.bytes }))}
+          variant="changed"
+        />
+      ) : null}
     </div>
   );
 }
@@ -68,6 +68,8 @@ export function ScanForm({ onSubmit, busy }: ScanFormProps) {
           >
             <option value="name_size">Name + Size</option>
             <option value="sha256">SHA-256 Hash</option>
+            <option value="sampled">Sampled Blocks + SHA-256</option>
+            <option value="chunks">Content-Defined Chunks</option>
           </select>
         </div>
         <div className="input-group">
@@ -93,6 +95,7 @@ export function ScanForm({ onSubmit, busy }: ScanFormProps) {
           >
             <option value="relative">Relative Paths</option>
             <option value="bag_of_files">Bag of Files</option>
+            <option value="content">Content Only (rename-aware)</option>
           </select>
         </div>
         <div className="input-group">
@@ -101,7 +104,7 @@ export function ScanForm({ onSubmit, busy }: ScanFormProps) {
             id="concurrency"
             type="number"
             min={1}
-            max={32}
+            max={256}
             value={form.concurrency ?? ""}
             placeholder="auto"
             onChange={(event) =>